@@ -0,0 +1,107 @@
+"""
+Benchmark de los índices de hashes frente al recorrido lineal para rechazar casi-duplicados.
+
+Genera hashes de 64 bits en grupos de variantes cercanas (como frames
+parecidos de un mismo plano), los deduplica con ambos métodos y comprueba
+que se conservan exactamente los mismos.
+
+Uso:
+    python -m benchmarks.bench_hash_index [--count 20000] [--cutoff 5]
+"""
+import time
+import argparse
+
+import numpy as np
+import imagehash
+
+from utils.hash_index import BKTree, MultiIndexHash, hamming_distance, hash_to_int
+
+
+def generate_hashes(count, group_size=8, flips=3, seed=0):
+    """
+    Genera hashes de 64 bits agrupados en variantes de un mismo hash base.
+
+    Args:
+        count: Número de hashes
+        group_size: Variantes por hash base
+        flips: Bits invertidos como máximo en cada variante
+        seed: Semilla
+
+    Returns:
+        Lista de enteros
+    """
+    rng = np.random.default_rng(seed)
+    hashes = []
+    while len(hashes) < count:
+        base = int(rng.integers(0, 2 ** 63, dtype=np.int64)) << 1 | int(rng.integers(0, 2))
+        for _ in range(group_size):
+            variant = base
+            for bit in rng.choice(64, size=int(rng.integers(0, flips + 1)), replace=False):
+                variant ^= 1 << int(bit)
+            hashes.append(variant)
+    return hashes[:count]
+
+
+def dedupe_linear(hashes, cutoff):
+    kept = []
+    for h in hashes:
+        if not any(hamming_distance(h, other) < cutoff for other in kept):
+            kept.append(h)
+    return kept
+
+
+def dedupe_imagehash(hashes, cutoff):
+    """Recorrido lineal con objetos ImageHash, como hacía keyframes."""
+    objects = [
+        imagehash.ImageHash(np.unpackbits(np.frombuffer(h.to_bytes(8, 'big'), dtype=np.uint8)).astype(bool).reshape(8, 8))
+        for h in hashes
+    ]
+    kept = []
+    for h in objects:
+        if not any((h - other) < cutoff for other in kept):
+            kept.append(h)
+    return [hash_to_int(h) for h in kept]
+
+
+def dedupe_bktree(hashes, cutoff):
+    tree = BKTree()
+    return [h for h in hashes if tree.add_if_new(h, cutoff - 1)]
+
+
+def dedupe_multi_index(hashes, cutoff):
+    index = MultiIndexHash(cutoff - 1)
+    return [h for h in hashes if index.add_if_new(h)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--count', type=int, default=20000)
+    parser.add_argument('--cutoff', type=int, default=5)
+    parser.add_argument('--imagehash-count', type=int, default=3000,
+                        help="Hashes for the (slow) ImageHash linear scan")
+    args = parser.parse_args()
+
+    hashes = generate_hashes(args.count)
+    results = {}
+    for name, dedupe, subset in (
+        ('imagehash linear', dedupe_imagehash, hashes[:args.imagehash_count]),
+        ('int linear', dedupe_linear, hashes),
+        ('bk-tree', dedupe_bktree, hashes),
+        ('multi-index', dedupe_multi_index, hashes),
+    ):
+        start = time.perf_counter()
+        kept = dedupe(subset, args.cutoff)
+        elapsed = time.perf_counter() - start
+        results[name] = (len(subset), kept)
+        print(f"{name:>17}: {len(subset)} hashes -> {len(kept)} kept in {elapsed:.3f}s "
+              f"({len(subset) / elapsed:.0f} hashes/s)")
+
+    linear = results['int linear'][1]
+    same_prefix = results['imagehash linear'][1] == dedupe_linear(hashes[:args.imagehash_count], args.cutoff)
+    print(f"imagehash scan matches int scan: {same_prefix}")
+    for name in ('bk-tree', 'multi-index'):
+        print(f"{name} matches linear scan: {results[name][1] == linear}")
+
+
+if __name__ == "__main__":
+    main()
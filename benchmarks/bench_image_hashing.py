@@ -0,0 +1,59 @@
+"""
+Benchmark de dHash/pHash por lotes frente a imagehash frame a frame.
+
+Comprueba además que ambos producen exactamente los mismos hashes.
+
+Uso:
+    python -m benchmarks.bench_image_hashing [--count 2000] [--size 320x240]
+"""
+import time
+import argparse
+
+import numpy as np
+import imagehash
+from PIL import Image, ImageFilter
+
+from utils.hash_index import hash_to_int
+from utils.image_hashing import HASH_METHODS, hash_batch, hash_thumbnail, thumbnail_size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--count', type=int, default=2000)
+    parser.add_argument('--size', default='320x240')
+    parser.add_argument('--hash-size', type=int, default=8)
+    args = parser.parse_args()
+
+    width, height = map(int, args.size.split('x'))
+    rng = np.random.default_rng(0)
+    frames = [
+        Image.fromarray(rng.integers(0, 256, (height, width, 3), dtype=np.uint8)).filter(ImageFilter.BoxBlur(6))
+        for _ in range(min(args.count, 64))
+    ]
+    frames = [frames[i % len(frames)] for i in range(args.count)]
+
+    for method in HASH_METHODS:
+        reference = getattr(imagehash, method)
+        start = time.perf_counter()
+        expected = [hash_to_int(reference(frame, args.hash_size)) for frame in frames]
+        legacy = time.perf_counter() - start
+
+        start = time.perf_counter()
+        thumb_width, thumb_height = thumbnail_size(method, args.hash_size)
+        thumbnails = np.empty((len(frames), thumb_height, thumb_width), dtype=np.uint8)
+        for frame, out in zip(frames, thumbnails):
+            hash_thumbnail(frame, method, args.hash_size, out)
+        resized = time.perf_counter() - start
+        values = hash_batch(thumbnails, method, args.hash_size)
+        total = time.perf_counter() - start
+
+        exact = values.tolist() == expected
+        print(
+            f"{method}: imagehash {legacy:.3f}s, batch {total:.3f}s "
+            f"(thumbnails {resized:.3f}s, hashing {total - resized:.4f}s) "
+            f"for {len(frames)} frames, {'identical' if exact else 'MISMATCH'}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,393 @@
+"""
+Suite de benchmarks de las rutas críticas sobre un dataset sintético.
+
+Mide la búsqueda de tags, la carga y aplicación de cambios del Bulk Tag
+Editor, el redimensionado, el fondo blanco, la fusión y la extracción de
+keyframes. Las operaciones que modifican archivos trabajan sobre una copia
+nueva en cada repetición (la copia no se cronometra). El resultado se
+guarda en JSON con el commit, la máquina y los parámetros, y con --compare
+se compara con el JSON de otro commit.
+
+Uso:
+    python -m benchmarks.bench_suite [--images 200] [--repeat 3] [--output resultados.json]
+                                     [--compare base.json] [--dataset CARPETA] [--only search resize ...]
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+
+from benchmarks.synthetic_dataset import MANIFEST_FILE, generate_dataset, tag_name
+
+RESULTS_VERSION = 1
+
+# Diferencia relativa de la mediana a partir de la cual --compare marca un cambio
+COMPARE_TOLERANCE = 0.10
+
+# Lado objetivo del benchmark de redimensionado
+RESIZE_RESOLUTION = (768, 768)
+
+# Tags prohibidos y desmarcados en los benchmarks del Bulk Tag Editor
+BULK_BANNED_RANKS = range(20, 40)
+BULK_UNCHECKED_COUNT = 10
+
+
+def git_revision():
+    """
+    Commit actual del repositorio.
+
+    Returns:
+        Tupla (hash o None, True si hay cambios sin commit)
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=root, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        status = subprocess.run(
+            ['git', 'status', '--porcelain', '--untracked-files=no'],
+            cwd=root, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None, False
+    return commit, bool(status)
+
+
+def fresh_copy(source, scratch, name):
+    """Copia source a scratch/name, borrando la copia anterior."""
+    target = os.path.join(scratch, name)
+    if os.path.exists(target):
+        shutil.rmtree(target)
+    shutil.copytree(source, target)
+    return target
+
+
+def fresh_dir(scratch, name):
+    """Crea scratch/name vacío."""
+    target = os.path.join(scratch, name)
+    if os.path.exists(target):
+        shutil.rmtree(target)
+    os.makedirs(target)
+    return target
+
+
+def bench_search(dataset, scratch, workers):
+    """find_files_with_phrase con dos tags frecuentes y uno negado."""
+    from utils.file_operations import find_files_with_phrase
+
+    folder = os.path.join(dataset, 'images')
+    terms = f"{tag_name(0)}, {tag_name(3)}, -{tag_name(50)}"
+
+    def setup():
+        return None
+
+    def run(_):
+        return len(find_files_with_phrase(folder, terms, False))
+
+    return setup, run
+
+
+class _BulkEditor:
+    """Bulk Tag Editor sin ventana, con su archivo de tags guardadas protegido."""
+
+    def __init__(self):
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        from PySide6.QtWidgets import QApplication
+        from core.job_manager import JOB_TYPE_IO, PRIORITY_NORMAL, Job, JobManager
+        from tabs.bulk_tag_editor import bulk_tag_editor_tab
+
+        self.app = QApplication.instance() or QApplication([])
+        self.module = bulk_tag_editor_tab
+        self.tab = bulk_tag_editor_tab.BulkTagEditorTab()
+        self.job = Job(JobManager(), 0, "benchmark", None, (), {}, JOB_TYPE_IO, PRIORITY_NORMAL)
+        self.banned = {tag_name(rank) for rank in BULK_BANNED_RANKS}
+
+    def load(self, folder):
+        """Ejecuta read_tags_job sobre una carpeta."""
+        self.tab.folder_path = folder
+        return self.tab.read_tags_job(self.job, folder, False, self.banned)
+
+    def apply(self, folder, file_tags, unchecked):
+        """Ejecuta rewrite_files_job y restaura el archivo de tags guardadas."""
+        # rewrite_files_job guarda las tags eliminadas en el archivo de la aplicación
+        saved_tags_file = self.module.SAVED_TAGS_FILE
+        previous = None
+        if os.path.exists(saved_tags_file):
+            with open(saved_tags_file, 'rb') as f:
+                previous = f.read()
+        try:
+            backup_folder = self.tab.create_backup(folder)
+            return self.tab.rewrite_files_job(self.job, file_tags, unchecked, self.banned, backup_folder)
+        finally:
+            if previous is None:
+                if os.path.exists(saved_tags_file):
+                    os.remove(saved_tags_file)
+            else:
+                with open(saved_tags_file, 'wb') as f:
+                    f.write(previous)
+
+
+def bench_bulk_load_tags(dataset, scratch, workers):
+    """Lectura y recuento de tags del Bulk Tag Editor (load_tags)."""
+    editor = _BulkEditor()
+    folder = os.path.join(dataset, 'tag_files')
+
+    def setup():
+        return None
+
+    def run(_):
+        return len(editor.load(folder)[0])
+
+    return setup, run
+
+
+def bench_bulk_apply_changes(dataset, scratch, workers):
+    """Reescritura de archivos del Bulk Tag Editor (apply_changes) con backup."""
+    editor = _BulkEditor()
+
+    def setup():
+        folder = fresh_copy(os.path.join(dataset, 'tag_files'), scratch, 'bulk_apply')
+        _, tag_data, file_tags = editor.load(folder)
+        most_common = sorted(tag_data, key=tag_data.get, reverse=True)
+        unchecked = set(most_common[5:5 + BULK_UNCHECKED_COUNT])
+        return folder, file_tags, unchecked
+
+    def run(state):
+        modified, errors, _ = editor.apply(*state)
+        if errors:
+            raise RuntimeError(f"{errors} files failed")
+        return modified
+
+    return setup, run
+
+
+def bench_resize(dataset, scratch, workers):
+    """resize_images con fondo blanco."""
+    from utils.image_operations import resize_images
+
+    def setup():
+        return fresh_copy(os.path.join(dataset, 'images'), scratch, 'resize')
+
+    def run(folder):
+        resize_images(folder, RESIZE_RESOLUTION, add_white_bg=True, max_workers=workers, resume=False)
+        return sum(1 for name in os.listdir(folder) if not name.endswith('.txt'))
+
+    return setup, run
+
+
+def bench_white_background(dataset, scratch, workers):
+    """add_white_background_to_images."""
+    from utils.image_operations import add_white_background_to_images
+
+    def setup():
+        return fresh_copy(os.path.join(dataset, 'images'), scratch, 'white_background')
+
+    def run(folder):
+        add_white_background_to_images(folder, max_workers=workers, resume=False)
+        return sum(1 for name in os.listdir(folder) if name.endswith('.png'))
+
+    return setup, run
+
+
+def bench_fuse(dataset, scratch, workers):
+    """fuse_directories de dos directorios en horizontal."""
+    from utils.fusion import fuse_directories
+
+    directories = [os.path.join(dataset, 'fuse', 'dir_1'), os.path.join(dataset, 'fuse', 'dir_2')]
+
+    def setup():
+        return fresh_dir(scratch, 'fuse_output')
+
+    def run(output_dir):
+        return fuse_directories(
+            directories, output_dir, "{description_dir_1}, {description_dir_2}", max_workers=workers
+        )
+
+    return setup, run
+
+
+def _keyframe_benchmark(dataset, scratch, extensions):
+    """extract_keyframes de todas las animaciones con las extensiones dadas."""
+    from utils.keyframes import extract_keyframes
+
+    animations = os.path.join(dataset, 'animations')
+    sources = sorted(name for name in os.listdir(animations) if name.lower().endswith(extensions))
+    if not sources:
+        return None
+
+    def setup():
+        output_dir = fresh_dir(scratch, 'keyframes_output')
+        targets = []
+        for name in sources:
+            target = os.path.join(output_dir, os.path.splitext(name)[0])
+            os.makedirs(target)
+            targets.append((os.path.join(animations, name), target))
+        return targets
+
+    def run(targets):
+        return sum(len(extract_keyframes(source, target)) for source, target in targets)
+
+    return setup, run
+
+
+def bench_keyframes_gif(dataset, scratch, workers):
+    """Keyframes de los GIF."""
+    return _keyframe_benchmark(dataset, scratch, ('.gif',))
+
+
+def bench_keyframes_webm(dataset, scratch, workers):
+    """Keyframes de los WebM (requiere ffmpeg y ffprobe)."""
+    if shutil.which('ffmpeg') is None or shutil.which('ffprobe') is None:
+        return None
+    return _keyframe_benchmark(dataset, scratch, ('.webm',))
+
+
+# Nombre -> función que devuelve (setup, run) o None si no se puede medir aquí.
+# run devuelve el número de elementos procesados.
+BENCHMARKS = {
+    'search': bench_search,
+    'bulk_load_tags': bench_bulk_load_tags,
+    'bulk_apply_changes': bench_bulk_apply_changes,
+    'resize': bench_resize,
+    'white_background': bench_white_background,
+    'fuse': bench_fuse,
+    'keyframes_gif': bench_keyframes_gif,
+    'keyframes_webm': bench_keyframes_webm,
+}
+
+
+def measure(benchmark, dataset, scratch, workers, repeat):
+    """
+    Ejecuta un benchmark `repeat` veces.
+
+    Returns:
+        Diccionario con los tiempos, el mejor, la mediana y los elementos por segundo,
+        o {'skipped': motivo}
+    """
+    functions = benchmark(dataset, scratch, workers)
+    if functions is None:
+        return {'skipped': 'not available in this environment'}
+    setup, run = functions
+    times = []
+    items = 0
+    for _ in range(repeat):
+        state = setup()
+        start = time.perf_counter()
+        items = run(state)
+        times.append(time.perf_counter() - start)
+    median = statistics.median(times)
+    return {
+        'times': times,
+        'best': min(times),
+        'median': median,
+        'items': items,
+        'items_per_second': items / median if median > 0 else None,
+    }
+
+
+def compare(baseline, results):
+    """
+    Imprime la mediana de cada benchmark frente a la de otro resultado.
+
+    Args:
+        baseline: Diccionario de resultados anterior
+        results: Diccionario de resultados actual
+    """
+    print(f"\nCompared with {baseline.get('commit') or 'unknown commit'}:")
+    print(f"{'benchmark':<20} {'before ms':>12} {'after ms':>12} {'ratio':>8}")
+    for name, current in results['results'].items():
+        previous = baseline.get('results', {}).get(name, {})
+        if 'median' not in current or 'median' not in previous:
+            print(f"{name:<20} {'-':>12} {'-':>12} {'n/a':>8}")
+            continue
+        ratio = current['median'] / previous['median']
+        if ratio > 1 + COMPARE_TOLERANCE:
+            verdict = 'slower'
+        elif ratio < 1 - COMPARE_TOLERANCE:
+            verdict = 'faster'
+        else:
+            verdict = ''
+        print(
+            f"{name:<20} {previous['median'] * 1000:>12.1f} {current['median'] * 1000:>12.1f} "
+            f"{ratio:>7.2f}x {verdict}".rstrip()
+        )
+    if baseline.get('dataset') != results['dataset']:
+        print("Warning: the datasets differ; the comparison is not like for like")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--images', type=int, default=200)
+    parser.add_argument('--vocabulary', type=int, default=2000)
+    parser.add_argument('--gifs', type=int, default=4)
+    parser.add_argument('--videos', type=int, default=2)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--dataset', help="Dataset folder to reuse (generated there if missing)")
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS))
+    parser.add_argument('--output', help="JSON file for the results")
+    parser.add_argument('--compare', help="JSON results of another commit")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    scratch = tempfile.mkdtemp(prefix='bench_suite_')
+    dataset = args.dataset or os.path.join(scratch, 'dataset')
+    try:
+        manifest_path = os.path.join(dataset, MANIFEST_FILE)
+        if os.path.exists(manifest_path):
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        else:
+            start = time.perf_counter()
+            manifest = generate_dataset(
+                dataset, args.images, args.vocabulary, gifs=args.gifs, videos=args.videos, seed=args.seed
+            )
+            print(f"Generated dataset in {time.perf_counter() - start:.1f}s: {dataset}")
+
+        commit, dirty = git_revision()
+        results = {
+            'version': RESULTS_VERSION,
+            'commit': commit,
+            'dirty': dirty,
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'workers': args.workers,
+            'repeat': args.repeat,
+            'dataset': manifest,
+            'results': {},
+        }
+
+        print(f"{'benchmark':<20} {'best ms':>10} {'median ms':>10} {'items':>7} {'items/s':>9}")
+        for name in args.only or BENCHMARKS:
+            result = measure(BENCHMARKS[name], dataset, scratch, args.workers, args.repeat)
+            results['results'][name] = result
+            if 'skipped' in result:
+                print(f"{name:<20} skipped: {result['skipped']}")
+            else:
+                print(
+                    f"{name:<20} {result['best'] * 1000:>10.1f} {result['median'] * 1000:>10.1f} "
+                    f"{result['items']:>7} {result['items_per_second'] or 0:>9.1f}"
+                )
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to {args.output}")
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            compare(json.load(f), results)
+
+
+if __name__ == "__main__":
+    main()
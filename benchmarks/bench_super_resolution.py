@@ -0,0 +1,76 @@
+"""
+Benchmark de la super-resolución por tiles con un modelo ONNX sustituto.
+
+El modelo sustituto amplía x2 por vecino más próximo, así que la salida
+cosida a partir de los tiles debe coincidir exactamente con un
+Image.resize(NEAREST) de la imagen completa.
+
+Uso:
+    python -m benchmarks.bench_super_resolution [--size 1024] [--tile-size 192] [--workers 4]
+"""
+import os
+import argparse
+import tempfile
+
+import numpy as np
+from PIL import Image
+
+from utils.super_resolution import DEFAULT_TILE_OVERLAP, DEFAULT_TILE_SIZE, SuperResolutionUpscaler
+
+
+def build_standin_model(path, scale=2):
+    """
+    Genera un modelo ONNX mínimo (Resize nearest) con alto y ancho dinámicos.
+
+    Args:
+        path: Ruta donde guardar el modelo
+        scale: Factor de escala
+    """
+    import onnx
+    from onnx import TensorProto, helper
+
+    scales = helper.make_tensor('scales', TensorProto.FLOAT, [4], [1.0, 1.0, float(scale), float(scale)])
+    node = helper.make_node('Resize', ['input', '', 'scales'], ['output'], mode='nearest')
+    graph = helper.make_graph(
+        [node],
+        'standin_sr',
+        [helper.make_tensor_value_info('input', TensorProto.FLOAT, [1, 3, 'height', 'width'])],
+        [helper.make_tensor_value_info('output', TensorProto.FLOAT, [1, 3, None, None])],
+        initializer=[scales]
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid('', 13)])
+    model.ir_version = 8
+    onnx.save(model, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--size', type=int, default=1024)
+    parser.add_argument('--tile-size', type=int, default=DEFAULT_TILE_SIZE)
+    parser.add_argument('--overlap', type=int, default=DEFAULT_TILE_OVERLAP)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    img = Image.fromarray(rng.integers(0, 256, (args.size, args.size, 3), dtype=np.uint8))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = os.path.join(tmp, 'standin_x2.onnx')
+        build_standin_model(model_path)
+        upscaler = SuperResolutionUpscaler(
+            model_path, tile_size=args.tile_size, overlap=args.overlap, max_workers=args.workers
+        )
+        result = upscaler.upscale(img)
+
+    expected = img.resize(result.size, Image.NEAREST)
+    exact = np.array_equal(np.asarray(result), np.asarray(expected))
+    print(
+        f"{args.size}x{args.size} -> {result.width}x{result.height}: "
+        f"{upscaler.tiles_processed} tiles, {upscaler.tiles_per_second:.1f} tiles/s, "
+        f"{upscaler.inference_seconds:.2f}s, {upscaler.max_workers} workers, "
+        f"stitching {'exact' if exact else 'MISMATCH'}"
+    )
+
+
+if __name__ == "__main__":
+    main()
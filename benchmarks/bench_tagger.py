@@ -0,0 +1,114 @@
+"""
+Benchmark del servicio de tagging ONNX con un modelo sustituto.
+
+El modelo sustituto promedia cada canal de la imagen y proyecta las tres
+medias sobre los tags con una matriz fija seguida de una sigmoide, así
+que es determinista y basta con onnx y onnxruntime para ejecutarlo.
+
+Uso:
+    python -m benchmarks.bench_tagger [--images 256] [--size 640] [--batch-sizes 1 8 32] [--workers 4]
+"""
+import os
+import csv
+import time
+import argparse
+import tempfile
+
+import numpy as np
+from PIL import Image
+
+from utils.tag_probabilities import TAG_CATEGORY_CHARACTER, TAG_CATEGORY_GENERAL, TAG_CATEGORY_RATING
+from utils.tagger import (
+    TAGGER_MODEL_FILE, TAGGER_TAGS_FILE, TaggerService, list_tagger_images, resolve_tagger_model
+)
+
+
+def build_standin_tagger(directory, tag_count=64, input_size=448, seed=0):
+    """
+    Genera un tagger ONNX mínimo y su selected_tags.csv.
+
+    Args:
+        directory: Carpeta donde guardar model.onnx y selected_tags.csv
+        tag_count: Número de tags (los 4 primeros son de rating)
+        input_size: Lado de la entrada NHWC del modelo
+        seed: Semilla de los pesos
+    """
+    import onnx
+    from onnx import TensorProto, helper
+
+    rng = np.random.default_rng(seed)
+    weights = rng.normal(0, 0.05, (3, tag_count)).astype(np.float32)
+    nodes = [
+        helper.make_node('ReduceMean', ['input'], ['means'], axes=[1, 2], keepdims=0),
+        helper.make_node('Sub', ['means', 'center'], ['centered']),
+        helper.make_node('MatMul', ['centered', 'weights'], ['logits']),
+        helper.make_node('Sigmoid', ['logits'], ['output']),
+    ]
+    graph = helper.make_graph(
+        nodes,
+        'standin_tagger',
+        [helper.make_tensor_value_info('input', TensorProto.FLOAT, ['batch', input_size, input_size, 3])],
+        [helper.make_tensor_value_info('output', TensorProto.FLOAT, ['batch', tag_count])],
+        initializer=[
+            helper.make_tensor('center', TensorProto.FLOAT, [1], [127.5]),
+            helper.make_tensor('weights', TensorProto.FLOAT, [3, tag_count], weights.ravel()),
+        ]
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid('', 13)])
+    model.ir_version = 8
+    onnx.save(model, os.path.join(directory, TAGGER_MODEL_FILE))
+
+    with open(os.path.join(directory, TAGGER_TAGS_FILE), 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['tag_id', 'name', 'category', 'count'])
+        for i in range(tag_count):
+            if i < 4:
+                category = TAG_CATEGORY_RATING
+            elif i < tag_count - 8:
+                category = TAG_CATEGORY_GENERAL
+            else:
+                category = TAG_CATEGORY_CHARACTER
+            writer.writerow([i, f"tag_{i}", category, tag_count - i])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--images', type=int, default=256)
+    parser.add_argument('--size', type=int, default=640)
+    parser.add_argument('--input-size', type=int, default=448)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        model_dir = os.path.join(tmp, 'model')
+        images_dir = os.path.join(tmp, 'images')
+        os.makedirs(model_dir)
+        os.makedirs(images_dir)
+        build_standin_tagger(model_dir, input_size=args.input_size)
+        for i in range(args.images):
+            pixels = rng.integers(0, 256, (args.size, args.size * 3 // 4, 3), dtype=np.uint8)
+            Image.fromarray(pixels).save(os.path.join(images_dir, f"{i}.jpg"), quality=90)
+        paths = list_tagger_images(images_dir)
+
+        start = time.perf_counter()
+        service = TaggerService(*resolve_tagger_model(model_dir))
+        service.start()
+        print(f"service start: {time.perf_counter() - start:.2f}s")
+        try:
+            for batch_size in args.batch_sizes:
+                for workers in sorted({1, args.workers}):
+                    start = time.perf_counter()
+                    summary = service.tag(paths, batch_size=batch_size, num_workers=workers)
+                    elapsed = time.perf_counter() - start
+                    print(
+                        f"batch {batch_size:3d}, {workers} loader workers: "
+                        f"{summary['tagged'] / elapsed:7.1f} images/s ({elapsed:.2f}s)"
+                    )
+        finally:
+            service.close()
+
+
+if __name__ == "__main__":
+    main()
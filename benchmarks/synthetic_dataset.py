@@ -0,0 +1,329 @@
+"""
+Generador de datasets sintéticos para los benchmarks.
+
+Crea imágenes de varios tamaños y modos con captions cuyos tags siguen una
+distribución de Zipf (unos pocos tags muy frecuentes y una cola larga, como
+en un dataset real), archivos de tags de una línea por tag para el Bulk Tag
+Editor, dos directorios para Fuse Characters y animaciones GIF con frames
+repetidos. Los WebM se generan con FFmpeg si está instalado.
+
+Estructura:
+    raíz/
+        images/       Imágenes (RGB en JPEG, el resto en PNG) + captions separados por comas
+        tag_files/    Un tag "namespace:tag" por línea
+        fuse/dir_1/   Imágenes + captions para fusionar
+        fuse/dir_2/
+        animations/   GIF y WebM
+        manifest.json Parámetros usados
+
+Uso:
+    python -m benchmarks.synthetic_dataset SALIDA [--images 500] [--vocabulary 2000] [--gifs 4] [--videos 2]
+"""
+import os
+import json
+import shutil
+import argparse
+import subprocess
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+# Tamaños (ancho, alto) y modos de las imágenes
+DEFAULT_SIZES = ((512, 512), (832, 1216), (1216, 832))
+DEFAULT_MODES = ('RGB', 'RGBA', 'LA', 'P')
+
+# Vocabulario de tags y exponente de la distribución de Zipf
+DEFAULT_VOCABULARY = 2000
+DEFAULT_ZIPF_EXPONENT = 1.1
+
+# Tags por caption (mínimo, máximo)
+DEFAULT_TAGS_PER_CAPTION = (8, 30)
+
+# Namespaces de los archivos de tags del Bulk Tag Editor
+TAG_NAMESPACES = ('general', 'general', 'general', 'character', 'artist')
+
+# Animaciones: frames por GIF (cada frame se repite GIF_FRAME_REPEAT veces)
+DEFAULT_GIF_FRAMES = 24
+GIF_FRAME_REPEAT = 3
+DEFAULT_ANIMATION_SIZE = (480, 360)
+DEFAULT_VIDEO_SECONDS = 4
+
+MANIFEST_FILE = 'manifest.json'
+
+
+def tag_name(rank):
+    """Nombre del tag de un rango; el ancho fijo evita que un tag contenga a otro."""
+    return f"tag_{rank:05d}"
+
+
+class ZipfTags:
+    """Muestreador de tags con probabilidad proporcional a 1 / rango^exponente."""
+
+    def __init__(self, vocabulary=DEFAULT_VOCABULARY, exponent=DEFAULT_ZIPF_EXPONENT):
+        """
+        Args:
+            vocabulary: Número de tags distintos
+            exponent: Exponente de la distribución
+        """
+        weights = 1.0 / np.arange(1, vocabulary + 1) ** exponent
+        self.probabilities = weights / weights.sum()
+        self.vocabulary = vocabulary
+
+    def sample(self, rng, count):
+        """
+        Elige tags distintos.
+
+        Args:
+            rng: numpy.random.Generator
+            count: Número de tags
+
+        Returns:
+            Lista de rangos ordenados de más a menos frecuente
+        """
+        count = min(count, self.vocabulary)
+        return sorted(rng.choice(self.vocabulary, size=count, replace=False, p=self.probabilities).tolist())
+
+
+def make_image(rng, size, mode):
+    """
+    Genera una imagen con gradientes suaves (se codifica rápido y comprime como una real).
+
+    Args:
+        rng: numpy.random.Generator
+        size: Tupla (ancho, alto)
+        mode: 'RGB', 'RGBA', 'LA' o 'P' (paleta con un color transparente)
+
+    Returns:
+        PIL.Image
+    """
+    width, height = size
+    x = np.arange(width, dtype=np.float32)
+    y = np.arange(height, dtype=np.float32)[:, None]
+    rgb = np.empty((height, width, 3), dtype=np.uint8)
+    for channel in range(3):
+        fx, fy = rng.uniform(20, 120, 2).astype(np.float32)
+        phase = np.float32(rng.uniform(0, 2 * np.pi))
+        wave = np.sin(x / fx + y / fy + phase)
+        rgb[..., channel] = wave * 127 + 128
+    if mode == 'RGB':
+        return Image.fromarray(rgb)
+    if mode == 'P':
+        img = Image.fromarray(rgb).quantize(64, method=Image.Quantize.FASTOCTREE)
+        img.info['transparency'] = 0
+        return img
+
+    # Alfa radial: opaco en el centro y transparente en las esquinas
+    distance = np.hypot((x - width / 2) / width, (y - height / 2) / height)
+    alpha = np.clip(255 * (1.2 - 2 * distance), 0, 255).astype(np.uint8)
+    rgba = Image.fromarray(np.dstack([rgb, alpha]))
+    return rgba if mode == 'RGBA' else rgba.convert('LA')
+
+
+def save_image(img, path_without_extension):
+    """Guarda en JPEG las imágenes RGB y en PNG el resto; devuelve la ruta."""
+    if img.mode == 'RGB':
+        path = path_without_extension + '.jpg'
+        img.save(path, quality=90)
+    else:
+        path = path_without_extension + '.png'
+        img.save(path, compress_level=1)
+    return path
+
+
+def generate_images(directory, count, tags, rng, sizes=DEFAULT_SIZES, modes=DEFAULT_MODES,
+                    tags_per_caption=DEFAULT_TAGS_PER_CAPTION, prefix='image'):
+    """
+    Genera imágenes con su caption separado por comas.
+
+    Args:
+        directory: Carpeta de salida
+        count: Número de imágenes
+        tags: ZipfTags
+        rng: numpy.random.Generator
+        sizes: Tamaños posibles
+        modes: Modos posibles
+        tags_per_caption: Tupla (mínimo, máximo) de tags por caption
+        prefix: Prefijo de los nombres de archivo
+
+    Returns:
+        Número de tags escritos en total
+    """
+    os.makedirs(directory, exist_ok=True)
+    total_tags = 0
+    for index in range(count):
+        size = sizes[rng.integers(len(sizes))]
+        mode = modes[rng.integers(len(modes))]
+        base = os.path.join(directory, f"{prefix}_{index:06d}")
+        save_image(make_image(rng, size, mode), base)
+        ranks = tags.sample(rng, int(rng.integers(tags_per_caption[0], tags_per_caption[1] + 1)))
+        with open(base + '.txt', 'w', encoding='utf-8') as f:
+            f.write(", ".join(tag_name(rank) for rank in ranks))
+        total_tags += len(ranks)
+    return total_tags
+
+
+def generate_tag_files(directory, count, tags, rng, tags_per_caption=DEFAULT_TAGS_PER_CAPTION):
+    """
+    Genera archivos de tags con un "namespace:tag" por línea (formato del Bulk Tag Editor).
+
+    Args:
+        directory: Carpeta de salida
+        count: Número de archivos
+        tags: ZipfTags
+        rng: numpy.random.Generator
+        tags_per_caption: Tupla (mínimo, máximo) de tags por archivo
+    """
+    os.makedirs(directory, exist_ok=True)
+    for index in range(count):
+        ranks = tags.sample(rng, int(rng.integers(tags_per_caption[0], tags_per_caption[1] + 1)))
+        lines = [f"{TAG_NAMESPACES[rank % len(TAG_NAMESPACES)]}:{tag_name(rank)}" for rank in ranks]
+        with open(os.path.join(directory, f"tags_{index:06d}.txt"), 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+
+
+def generate_gif(path, rng, frames=DEFAULT_GIF_FRAMES, size=DEFAULT_ANIMATION_SIZE):
+    """
+    Genera un GIF con un rectángulo que se mueve cada GIF_FRAME_REPEAT frames.
+
+    Args:
+        path: Ruta del GIF
+        rng: numpy.random.Generator
+        frames: Número de frames
+        size: Tupla (ancho, alto)
+    """
+    background = make_image(rng, size, 'RGB')
+    images = []
+    for index in range(frames):
+        frame = background.copy()
+        step = index // GIF_FRAME_REPEAT
+        left = (step * 37) % (size[0] - size[0] // 4)
+        top = (step * 23) % (size[1] - size[1] // 4)
+        ImageDraw.Draw(frame).rectangle(
+            [left, top, left + size[0] // 4, top + size[1] // 4], fill=(255, 255, 255)
+        )
+        images.append(frame.quantize(128, method=Image.Quantize.FASTOCTREE))
+    images[0].save(path, save_all=True, append_images=images[1:], duration=80, loop=0)
+
+
+def generate_video(path, seconds=DEFAULT_VIDEO_SECONDS, size=DEFAULT_ANIMATION_SIZE):
+    """
+    Genera un WebM VP9 con el patrón de prueba de FFmpeg.
+
+    Args:
+        path: Ruta del WebM
+        seconds: Duración
+        size: Tupla (ancho, alto)
+
+    Returns:
+        True si se generó, False si FFmpeg no está disponible o falló
+    """
+    if shutil.which('ffmpeg') is None:
+        return False
+    result = subprocess.run(
+        [
+            'ffmpeg', '-y', '-loglevel', 'error',
+            '-f', 'lavfi', '-i', f"testsrc2=size={size[0]}x{size[1]}:rate=24",
+            '-t', str(seconds), '-c:v', 'libvpx-vp9', '-b:v', '500k', '-g', '24',
+            path
+        ],
+        capture_output=True
+    )
+    return result.returncode == 0
+
+
+def generate_dataset(root, images=500, vocabulary=DEFAULT_VOCABULARY, exponent=DEFAULT_ZIPF_EXPONENT,
+                     sizes=DEFAULT_SIZES, modes=DEFAULT_MODES, tags_per_caption=DEFAULT_TAGS_PER_CAPTION,
+                     fuse_images=16, gifs=4, gif_frames=DEFAULT_GIF_FRAMES, videos=2,
+                     video_seconds=DEFAULT_VIDEO_SECONDS, seed=0):
+    """
+    Genera un dataset sintético completo en root.
+
+    Args:
+        root: Carpeta de salida
+        images: Imágenes en images/ y archivos en tag_files/
+        vocabulary: Número de tags distintos
+        exponent: Exponente de la distribución de Zipf
+        sizes: Tamaños de las imágenes
+        modes: Modos de las imágenes
+        tags_per_caption: Tupla (mínimo, máximo) de tags por caption
+        fuse_images: Imágenes en cada directorio de fuse/
+        gifs: Número de GIF
+        gif_frames: Frames por GIF
+        videos: Número de WebM (se omiten sin FFmpeg)
+        video_seconds: Duración de cada WebM
+        seed: Semilla
+
+    Returns:
+        Diccionario del manifiesto (también se guarda en root/manifest.json)
+    """
+    rng = np.random.default_rng(seed)
+    tags = ZipfTags(vocabulary, exponent)
+
+    caption_tags = generate_images(
+        os.path.join(root, 'images'), images, tags, rng, sizes, modes, tags_per_caption
+    )
+    generate_tag_files(os.path.join(root, 'tag_files'), images, tags, rng, tags_per_caption)
+    for k in (1, 2):
+        generate_images(
+            os.path.join(root, 'fuse', f"dir_{k}"), fuse_images, tags, rng, sizes, modes,
+            tags_per_caption, prefix=f"char{k}"
+        )
+
+    animations = os.path.join(root, 'animations')
+    os.makedirs(animations, exist_ok=True)
+    for index in range(gifs):
+        generate_gif(os.path.join(animations, f"anim_{index:03d}.gif"), rng, gif_frames)
+    generated_videos = sum(
+        generate_video(os.path.join(animations, f"video_{index:03d}.webm"), video_seconds)
+        for index in range(videos)
+    )
+
+    manifest = {
+        'seed': seed,
+        'images': images,
+        'caption_tags': caption_tags,
+        'vocabulary': vocabulary,
+        'zipf_exponent': exponent,
+        'sizes': [list(size) for size in sizes],
+        'modes': list(modes),
+        'tags_per_caption': list(tags_per_caption),
+        'fuse_images': fuse_images,
+        'gifs': gifs,
+        'gif_frames': gif_frames,
+        'videos': generated_videos,
+        'video_seconds': video_seconds,
+    }
+    with open(os.path.join(root, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def parse_size(text):
+    """Convierte 'ANCHOxALTO' en una tupla."""
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('output')
+    parser.add_argument('--images', type=int, default=500)
+    parser.add_argument('--vocabulary', type=int, default=DEFAULT_VOCABULARY)
+    parser.add_argument('--exponent', type=float, default=DEFAULT_ZIPF_EXPONENT)
+    parser.add_argument('--sizes', type=parse_size, nargs='+', default=list(DEFAULT_SIZES))
+    parser.add_argument('--modes', nargs='+', default=list(DEFAULT_MODES), choices=DEFAULT_MODES)
+    parser.add_argument('--fuse-images', type=int, default=16)
+    parser.add_argument('--gifs', type=int, default=4)
+    parser.add_argument('--videos', type=int, default=2)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    manifest = generate_dataset(
+        args.output, args.images, args.vocabulary, args.exponent, tuple(args.sizes), tuple(args.modes),
+        fuse_images=args.fuse_images, gifs=args.gifs, videos=args.videos, seed=args.seed
+    )
+    print(json.dumps(manifest, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+"""
+Gestor central de trabajos en segundo plano.
+
+Las pestañas envían aquí sus operaciones largas en lugar de ejecutarlas en
+el hilo de la interfaz. Cada trabajo tiene un tipo con su propio límite de
+concurrencia (así dos extracciones con ffmpeg no compiten por los mismos
+núcleos mientras una búsqueda sigue respondiendo), una prioridad para
+elegir el siguiente de la cola, señales de progreso y un evento de
+cancelación que las funciones de utils ya aceptan como cancel_event.
+Los trabajos cuya función no consulta cancel_event se envían con
+cancellable=False: solo se pueden cancelar mientras esperan en la cola.
+"""
+import os
+import time
+import logging
+import itertools
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from PySide6.QtCore import QObject, QTimer, Signal
+
+logger = logging.getLogger(__name__)
+
+# Tipos de trabajo
+JOB_TYPE_IO = 'io'                  # Búsquedas y operaciones de archivos
+JOB_TYPE_CPU = 'cpu'                # Procesado de imágenes en paralelo
+JOB_TYPE_INFERENCE = 'inference'    # Modelos ONNX (tagger, super-resolución)
+JOB_TYPE_EXTERNAL = 'external'      # Procesos externos (ffmpeg, accelerate)
+
+# Trabajos de cada tipo que pueden ejecutarse a la vez. Los de CPU, inferencia
+# y procesos externos ya reparten su trabajo entre todos los núcleos.
+DEFAULT_JOB_LIMITS = {
+    JOB_TYPE_IO: 2,
+    JOB_TYPE_CPU: 1,
+    JOB_TYPE_INFERENCE: 1,
+    JOB_TYPE_EXTERNAL: 1,
+}
+
+# Prioridades (menor valor, antes sale de la cola)
+PRIORITY_HIGH = 0       # Acciones interactivas (búsquedas, cargar tags)
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2        # Lotes largos de carpetas completas
+
+# Estados de un trabajo
+JOB_STATE_QUEUED = 'queued'
+JOB_STATE_RUNNING = 'running'
+JOB_STATE_DONE = 'done'
+JOB_STATE_FAILED = 'failed'
+JOB_STATE_CANCELLED = 'cancelled'
+
+JOB_FINISHED_STATES = (JOB_STATE_DONE, JOB_STATE_FAILED, JOB_STATE_CANCELLED)
+
+# Segundos que se espera al cerrar a que paren los trabajos en marcha
+SHUTDOWN_TIMEOUT = 10
+
+
+class JobCancelled(Exception):
+    """Se emite por failed cuando un trabajo se cancela antes de empezar."""
+    pass
+
+
+class Job(QObject):
+    """
+    Trabajo enviado al JobManager.
+
+    La función recibe el propio Job como primer argumento para leer
+    cancel_event y max_workers y para notificar el progreso. Las señales se
+    emiten desde el hilo del pool y Qt las entrega en el hilo de la interfaz.
+    """
+
+    progress = Signal(int, int)
+    status = Signal(str)
+    completed = Signal(object)
+    failed = Signal(object)
+    state_changed = Signal(str)
+
+    def __init__(self, manager, job_id, title, function, args, kwargs, job_type, priority, cancellable=True):
+        super().__init__()
+        self._manager = manager
+        self.id = job_id
+        self.title = title
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.job_type = job_type
+        self.priority = priority
+        self.cancellable = cancellable
+        self.state = JOB_STATE_QUEUED
+        self.done = 0
+        self.total = 0
+        self.status_text = ""
+        self.max_workers = 1
+        self.cancel_event = threading.Event()
+
+    @property
+    def finished(self):
+        """True si el trabajo terminó, falló o se canceló."""
+        return self.state in JOB_FINISHED_STATES
+
+    @property
+    def can_cancel(self):
+        """True si cancelar tiene efecto: el trabajo está en cola o su función consulta cancel_event."""
+        return self.state == JOB_STATE_QUEUED or (self.cancellable and not self.finished)
+
+    def cancel(self):
+        """Cancela el trabajo; si ya está en marcha, la función decide cuándo parar."""
+        self.cancel_event.set()
+        self._manager.cancel(self)
+
+    def report_progress(self, done, total):
+        """
+        Notifica el progreso.
+
+        Args:
+            done: Unidades terminadas
+            total: Unidades totales
+        """
+        self.done = done
+        self.total = total
+        self.progress.emit(done, total)
+
+    def report_status(self, text):
+        """
+        Notifica un texto de estado (velocidad, fase, ...).
+
+        Args:
+            text: Texto que se muestra en el panel de trabajos
+        """
+        self.status_text = text
+        self.status.emit(text)
+
+    def _set_state(self, state):
+        self.state = state
+        self.state_changed.emit(state)
+
+
+class JobManager(QObject):
+    """
+    Cola de trabajos con prioridades sobre un pool de hilos compartido.
+
+    Un trabajo sale de la cola cuando su tipo tiene un hueco libre; entre los
+    que pueden empezar se elige el de mayor prioridad y, a igual prioridad,
+    el más antiguo.
+    """
+
+    job_added = Signal(object)
+
+    def __init__(self, limits=None):
+        """
+        Args:
+            limits: Diccionario opcional {tipo: trabajos simultáneos} que
+                sustituye a los valores de DEFAULT_JOB_LIMITS
+        """
+        super().__init__()
+        self.limits = dict(DEFAULT_JOB_LIMITS, **(limits or {}))
+        self.jobs = []
+        self._pending = []
+        self._running = defaultdict(int)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._shut_down = False
+        self._executor = ThreadPoolExecutor(
+            max_workers=sum(self.limits.values()), thread_name_prefix='job'
+        )
+
+    def submit(self, title, function, *args, job_type=JOB_TYPE_CPU, priority=PRIORITY_NORMAL,
+               cancellable=True, **kwargs):
+        """
+        Encola un trabajo.
+
+        Args:
+            title: Descripción que se muestra en el panel de trabajos
+            function: Función function(job, *args, **kwargs); su resultado se emite por completed
+            *args: Argumentos de la función
+            job_type: Tipo del trabajo (JOB_TYPE_*)
+            priority: Prioridad (PRIORITY_*)
+            cancellable: False si la función no consulta cancel_event; entonces
+                solo se puede cancelar mientras espera en la cola
+            **kwargs: Argumentos con nombre de la función
+
+        Returns:
+            Job; sus señales deben conectarse antes de volver al bucle de eventos
+        """
+        if job_type not in self.limits:
+            raise ValueError(f"Unknown job type: {job_type}")
+        job = Job(self, next(self._ids), title, function, args, kwargs, job_type, priority, cancellable)
+        with self._lock:
+            self.jobs.append(job)
+            self._pending.append(job)
+            self._pending.sort(key=lambda pending: (pending.priority, pending.id))
+        logger.info(f"Queued job #{job.id} '{title}' ({job_type}, priority {priority})")
+        self.job_added.emit(job)
+        # Arranca en la siguiente vuelta del bucle de eventos, cuando quien lo
+        # envió ya ha conectado sus señales
+        QTimer.singleShot(0, self._dispatch)
+        return job
+
+    def cancel(self, job):
+        """
+        Cancela un trabajo; si aún estaba en la cola no llega a ejecutarse.
+
+        Args:
+            job: Job a cancelar
+        """
+        job.cancel_event.set()
+        with self._lock:
+            if job not in self._pending:
+                return
+            self._pending.remove(job)
+        logger.info(f"Cancelled queued job #{job.id} '{job.title}'")
+        job._set_state(JOB_STATE_CANCELLED)
+        job.failed.emit(JobCancelled(f"{job.title} was cancelled before it started"))
+
+    def cancel_all(self):
+        """Cancela todos los trabajos en cola o en marcha."""
+        for job in list(self.jobs):
+            if not job.finished:
+                job.cancel()
+
+    def clear_finished(self):
+        """Olvida los trabajos terminados."""
+        with self._lock:
+            self.jobs = [job for job in self.jobs if not job.finished]
+
+    def active_count(self):
+        """Número de trabajos en cola o en marcha."""
+        return sum(1 for job in self.jobs if not job.finished)
+
+    def _worker_budget(self, job_type):
+        """Hilos que puede usar cada trabajo de un tipo sin saturar la CPU."""
+        return max(1, (os.cpu_count() or 1) // self.limits[job_type])
+
+    def _dispatch(self):
+        """Arranca los trabajos de la cola cuyo tipo tenga huecos libres."""
+        started = []
+        with self._lock:
+            if self._shut_down:
+                return
+            for job in list(self._pending):
+                if self._running[job.job_type] >= self.limits[job.job_type]:
+                    continue
+                self._pending.remove(job)
+                self._running[job.job_type] += 1
+                job.max_workers = self._worker_budget(job.job_type)
+                started.append(job)
+        for job in started:
+            self._executor.submit(self._run, job)
+
+    def _run(self, job):
+        job._set_state(JOB_STATE_RUNNING)
+        logger.info(f"Started job #{job.id} '{job.title}' with {job.max_workers} workers")
+        try:
+            result = job.function(job, *job.args, **job.kwargs)
+        except Exception as e:
+            if job.cancellable and job.cancel_event.is_set():
+                logger.info(f"Job #{job.id} '{job.title}' stopped after cancellation: {e}")
+                job._set_state(JOB_STATE_CANCELLED)
+            else:
+                logger.error(f"Job #{job.id} '{job.title}' failed: {e}", exc_info=True)
+                job._set_state(JOB_STATE_FAILED)
+            job.failed.emit(e)
+        else:
+            cancelled = job.cancellable and job.cancel_event.is_set()
+            job._set_state(JOB_STATE_CANCELLED if cancelled else JOB_STATE_DONE)
+            logger.info(f"Finished job #{job.id} '{job.title}' ({job.state})")
+            job.completed.emit(result)
+        finally:
+            with self._lock:
+                self._running[job.job_type] -= 1
+                self._idle.notify_all()
+            self._dispatch()
+
+    def shutdown(self, timeout=SHUTDOWN_TIMEOUT):
+        """
+        Cancela todos los trabajos y espera un tiempo limitado a los que están en marcha.
+
+        Args:
+            timeout: Segundos que se espera a que paren los trabajos en marcha
+
+        Returns:
+            Lista de trabajos que seguían en marcha al agotarse la espera
+        """
+        self.cancel_all()
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            self._shut_down = True
+            running = sum(self._running.values())
+            if running:
+                logger.info(f"Waiting up to {timeout} s for {running} running jobs to stop")
+            while any(self._running.values()):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._idle.wait(remaining)
+        # El pool tiene un hilo por hueco de trabajo y _dispatch solo envía
+        # trabajos con hueco libre, así que no quedan futures esperando en
+        # su cola; cancel_futures (Python 3.9+) no hace falta
+        self._executor.shutdown(wait=False)
+
+        abandoned = [job for job in self.jobs if not job.finished]
+        for job in abandoned:
+            logger.warning(f"Abandoned job #{job.id} '{job.title}' still running at shutdown")
+        return abandoned
+
+
+_job_manager = None
+
+
+def get_job_manager():
+    """
+    Devuelve el gestor de trabajos de la aplicación, creándolo la primera vez.
+
+    Returns:
+        JobManager
+    """
+    global _job_manager
+    if _job_manager is None:
+        _job_manager = JobManager()
+    return _job_manager
+
+
+def shutdown_job_manager():
+    """
+    Detiene el gestor de trabajos si se llegó a crear.
+
+    Returns:
+        Lista de trabajos abandonados en marcha (ver JobManager.shutdown)
+    """
+    global _job_manager
+    abandoned = []
+    if _job_manager is not None:
+        abandoned = _job_manager.shutdown()
+        _job_manager = None
+    return abandoned
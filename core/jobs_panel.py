@@ -0,0 +1,145 @@
+"""
+Panel de la ventana principal con los trabajos en segundo plano.
+"""
+import logging
+from PySide6.QtWidgets import (
+    QWidget, QTreeWidget, QTreeWidgetItem, QPushButton, QLabel, QVBoxLayout, QHBoxLayout, QProgressBar
+)
+from PySide6.QtCore import Qt
+
+from core.job_manager import JOB_STATE_QUEUED
+
+logger = logging.getLogger(__name__)
+
+# Columnas del árbol de trabajos
+COLUMN_TITLE = 0
+COLUMN_TYPE = 1
+COLUMN_STATE = 2
+COLUMN_PROGRESS = 3
+
+
+class JobsPanel(QWidget):
+    """Lista de trabajos del JobManager con su estado, progreso y cancelación."""
+
+    def __init__(self, manager):
+        """
+        Args:
+            manager: JobManager cuyos trabajos se muestran
+        """
+        super().__init__()
+        self.manager = manager
+        self.items = {}
+        self.progress_bars = {}
+        self.setup_ui()
+        for job in manager.jobs:
+            self.add_job(job)
+        manager.job_added.connect(self.add_job)
+
+    def setup_ui(self):
+        """Configura la interfaz de usuario."""
+        self.summary_label = QLabel("Jobs: none running")
+
+        self.tree = QTreeWidget()
+        self.tree.setColumnCount(4)
+        self.tree.setHeaderLabels(["Job", "Type", "State", "Progress"])
+        self.tree.setRootIsDecorated(False)
+        self.tree.setColumnWidth(COLUMN_TITLE, 360)
+        self.tree.itemSelectionChanged.connect(self.update_cancel_enabled)
+
+        self.cancel_button = QPushButton("Cancel Selected")
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.clicked.connect(self.cancel_selected)
+
+        self.clear_button = QPushButton("Clear Finished")
+        self.clear_button.clicked.connect(self.clear_finished)
+
+        hlayout = QHBoxLayout()
+        hlayout.addWidget(self.summary_label, 1)
+        hlayout.addWidget(self.cancel_button)
+        hlayout.addWidget(self.clear_button)
+
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addLayout(hlayout)
+        layout.addWidget(self.tree)
+        self.setLayout(layout)
+
+    def add_job(self, job):
+        """Añade una fila para un trabajo nuevo."""
+        item = QTreeWidgetItem([job.title, job.job_type, job.state, ""])
+        item.setData(COLUMN_TITLE, Qt.UserRole, job.id)
+        self.tree.addTopLevelItem(item)
+
+        progress_bar = QProgressBar()
+        progress_bar.setMaximum(max(job.total, 1))
+        progress_bar.setValue(job.done)
+        self.tree.setItemWidget(item, COLUMN_PROGRESS, progress_bar)
+
+        self.items[job.id] = (job, item)
+        self.progress_bars[job.id] = progress_bar
+        job.state_changed.connect(lambda state, job_id=job.id: self.on_state_changed(job_id, state))
+        job.progress.connect(lambda done, total, job_id=job.id: self.on_progress(job_id, done, total))
+        job.status.connect(lambda text, job_id=job.id: self.on_status(job_id, text))
+        self.update_summary()
+
+    def on_state_changed(self, job_id, state):
+        """Actualiza el estado de un trabajo."""
+        if job_id not in self.items:
+            return
+        job, item = self.items[job_id]
+        item.setText(COLUMN_STATE, state)
+        if job.finished and job.total == 0:
+            # Trabajos sin progreso: la barra se llena al terminar
+            self.progress_bars[job_id].setValue(self.progress_bars[job_id].maximum())
+        self.update_summary()
+        self.update_cancel_enabled()
+
+    def on_progress(self, job_id, done, total):
+        """Actualiza la barra de progreso de un trabajo."""
+        if job_id in self.progress_bars:
+            self.progress_bars[job_id].setMaximum(max(total, 1))
+            self.progress_bars[job_id].setValue(done)
+
+    def on_status(self, job_id, text):
+        """Muestra el texto de estado de un trabajo en curso."""
+        if job_id in self.items:
+            job, item = self.items[job_id]
+            item.setText(COLUMN_STATE, f"{job.state}: {text}" if text else job.state)
+
+    def update_summary(self):
+        """Resume cuántos trabajos hay en marcha y en cola."""
+        jobs = [job for job, _ in self.items.values() if not job.finished]
+        queued = sum(1 for job in jobs if job.state == JOB_STATE_QUEUED)
+        if not jobs:
+            self.summary_label.setText("Jobs: none running")
+        else:
+            self.summary_label.setText(f"Jobs: {len(jobs) - queued} running, {queued} queued")
+
+    def selected_jobs(self):
+        """Trabajos seleccionados en el árbol."""
+        return [
+            self.items[item.data(COLUMN_TITLE, Qt.UserRole)][0]
+            for item in self.tree.selectedItems()
+        ]
+
+    def update_cancel_enabled(self):
+        """Habilita Cancel solo si hay seleccionados trabajos que se puedan cancelar."""
+        self.cancel_button.setEnabled(any(job.can_cancel for job in self.selected_jobs()))
+
+    def cancel_selected(self):
+        """Cancela los trabajos seleccionados."""
+        for job in self.selected_jobs():
+            if job.can_cancel:
+                logger.info(f"Cancel requested for job #{job.id} '{job.title}'")
+                job.cancel()
+        self.update_cancel_enabled()
+
+    def clear_finished(self):
+        """Quita del panel los trabajos terminados."""
+        self.manager.clear_finished()
+        for job_id, (job, item) in list(self.items.items()):
+            if job.finished:
+                self.tree.takeTopLevelItem(self.tree.indexOfTopLevelItem(item))
+                del self.items[job_id]
+                del self.progress_bars[job_id]
+        self.update_summary()
@@ -1,22 +1,32 @@
 """
 Ventana principal de la aplicación.
 """
+import time
 import logging
+import importlib
 from PySide6.QtWidgets import (
-    QWidget, QTabWidget, QVBoxLayout, QApplication, QStyleFactory
+    QWidget, QTabWidget, QVBoxLayout, QApplication, QStyleFactory, QSplitter
 )
 from PySide6.QtGui import QPalette
 from PySide6.QtCore import Qt
 
-from tabs.search_tags.search_tags_tab import SearchTagsTab
-from tabs.upscale_image.upscale_image_tab import UpscaleImageTab
-from tabs.fuse_characters.fuse_characters_tab import FuseCharactersTab
-from tabs.keyframes.keyframes_tab import KeyframesTab
-from tabs.tag_images.tag_images_tab import TagImagesTab
-from tabs.bulk_tag_editor.bulk_tag_editor_tab import BulkTagEditorTab
+from core.job_manager import get_job_manager
+from core.jobs_panel import JobsPanel
 
 logger = logging.getLogger(__name__)
 
+# Pestañas: (atributo de MainWindow, módulo, clase, título). El módulo se
+# importa y la pestaña se construye la primera vez que se activa.
+TABS = [
+    ('search_tags_tab', 'tabs.search_tags.search_tags_tab', 'SearchTagsTab', "Search Tags"),
+    ('upscale_image_tab', 'tabs.upscale_image.upscale_image_tab', 'UpscaleImageTab', "Upscale Image"),
+    ('fuse_characters_tab', 'tabs.fuse_characters.fuse_characters_tab', 'FuseCharactersTab', "Fuse Characters"),
+    ('keyframes_tab', 'tabs.keyframes.keyframes_tab', 'KeyframesTab', "KeyFrames"),
+    ('tag_images_tab', 'tabs.tag_images.tag_images_tab', 'TagImagesTab', "Tag Images"),
+    ('bulk_tag_editor_tab', 'tabs.bulk_tag_editor.bulk_tag_editor_tab', 'BulkTagEditorTab', "Bulk Tag Editor"),
+    ('dedupe_tab', 'tabs.dedupe.dedupe_tab', 'DedupeTab', "Dedupe"),
+]
+
 
 class MainWindow(QWidget):
     """Ventana principal de la aplicación con sistema de pestañas."""
@@ -32,27 +42,53 @@ class MainWindow(QWidget):
         # Crear el widget de pestañas
         self.tabs = QTabWidget()
 
-        # Crear las pestañas
-        self.search_tags_tab = SearchTagsTab()
-        self.upscale_image_tab = UpscaleImageTab()
-        self.fuse_characters_tab = FuseCharactersTab()
-        self.keyframes_tab = KeyframesTab()
-        self.tag_images_tab = TagImagesTab()
-        self.bulk_tag_editor_tab = BulkTagEditorTab()
-
-        # Añadir pestañas al widget
-        self.tabs.addTab(self.search_tags_tab, "Search Tags")
-        self.tabs.addTab(self.upscale_image_tab, "Upscale Image")
-        self.tabs.addTab(self.fuse_characters_tab, "Fuse Characters")
-        self.tabs.addTab(self.keyframes_tab, "KeyFrames")
-        self.tabs.addTab(self.tag_images_tab, "Tag Images")
-        self.tabs.addTab(self.bulk_tag_editor_tab, "Bulk Tag Editor")
+        # Añadir un contenedor vacío por pestaña; se rellena en load_tab
+        for attribute, _, _, title in TABS:
+            setattr(self, attribute, None)
+            container = QWidget()
+            container_layout = QVBoxLayout()
+            container_layout.setContentsMargins(0, 0, 0, 0)
+            container.setLayout(container_layout)
+            self.tabs.addTab(container, title)
+        self.tabs.currentChanged.connect(self.load_tab)
+        self.load_tab(self.tabs.currentIndex())
+
+        # Panel de trabajos en segundo plano bajo las pestañas
+        self.jobs_panel = JobsPanel(get_job_manager())
+
+        splitter = QSplitter(Qt.Vertical)
+        splitter.addWidget(self.tabs)
+        splitter.addWidget(self.jobs_panel)
+        splitter.setStretchFactor(0, 1)
+        splitter.setSizes([600, 150])
 
         # Layout principal
         main_layout = QVBoxLayout()
-        main_layout.addWidget(self.tabs)
+        main_layout.addWidget(splitter)
         self.setLayout(main_layout)
 
+    def load_tab(self, index):
+        """
+        Construye una pestaña si aún no se había activado.
+
+        Args:
+            index: Índice de la pestaña en el QTabWidget
+
+        Returns:
+            Widget de la pestaña
+        """
+        attribute, module_name, class_name, title = TABS[index]
+        tab = getattr(self, attribute)
+        if tab is not None:
+            return tab
+        started = time.perf_counter()
+        module = importlib.import_module(module_name)
+        tab = getattr(module, class_name)()
+        self.tabs.widget(index).layout().addWidget(tab)
+        setattr(self, attribute, tab)
+        logger.info(f"Loaded tab '{title}' in {(time.perf_counter() - started) * 1000:.0f} ms")
+        return tab
+
     def apply_fusion_theme(self, app):
         """
         Aplica el tema Fusion a la aplicación.
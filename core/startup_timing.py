@@ -0,0 +1,148 @@
+"""
+Medición del arranque de la aplicación.
+
+Mientras está activo, un buscador al principio de sys.meta_path mide cuánto
+tarda en cargarse cada módulo (tiempo propio y acumulado con sus
+dependencias, como `python -X importtime`). Al terminar el arranque se
+registra en el log la duración de cada fase y los imports más lentos, para
+poder seguir el tiempo de arranque en frío entre versiones.
+"""
+import sys
+import time
+import logging
+import threading
+from importlib.abc import MetaPathFinder
+from importlib.machinery import ExtensionFileLoader, SourceFileLoader, SourcelessFileLoader
+
+logger = logging.getLogger(__name__)
+
+# Imports que se listan en el informe
+REPORT_TOP_IMPORTS = 15
+
+# Solo se envuelven los loaders de archivos; los de módulos builtin y
+# congelados se comparan por identidad dentro de importlib
+TIMED_LOADERS = (SourceFileLoader, SourcelessFileLoader, ExtensionFileLoader)
+
+
+class _TimedLoader:
+    """Envuelve un loader y mide create_module + exec_module del módulo."""
+
+    def __init__(self, loader, timer):
+        self._loader = loader
+        self._timer = timer
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        self._timer._enter(spec.name)
+        try:
+            return self._loader.create_module(spec)
+        except BaseException:
+            self._timer._exit(spec.name)
+            raise
+
+    def exec_module(self, module):
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self._timer._exit(module.__spec__.name)
+
+
+class StartupTimer(MetaPathFinder):
+    """
+    Cronómetro del arranque por fases y por módulo importado.
+
+    Uso: start() antes de los imports pesados, mark(fase) al terminar cada
+    fase y report() cuando la ventana ya se ha mostrado.
+    """
+
+    def __init__(self):
+        self.imports = {}
+        self.phases = []
+        self._started = None
+        self._last_mark = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Empieza a medir e instala el buscador de módulos."""
+        self._started = self._last_mark = time.perf_counter()
+        sys.meta_path.insert(0, self)
+
+    def stop(self):
+        """Retira el buscador; los módulos ya medidos se conservan."""
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def mark(self, phase):
+        """
+        Cierra una fase del arranque.
+
+        Args:
+            phase: Nombre de la fase que acaba de terminar
+        """
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last_mark))
+        self._last_mark = now
+
+    def find_spec(self, fullname, path, target=None):
+        """Busca el módulo con el resto de buscadores y envuelve su loader."""
+        if self not in sys.meta_path:
+            return None
+        for finder in sys.meta_path[sys.meta_path.index(self) + 1:]:
+            find_spec = getattr(finder, 'find_spec', None)
+            if find_spec is None:
+                continue
+            spec = find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        if isinstance(spec.loader, TIMED_LOADERS):
+            spec.loader = _TimedLoader(spec.loader, self)
+        return spec
+
+    def _stack(self):
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    def _enter(self, name):
+        # [nombre, inicio, tiempo de los imports anidados]
+        self._stack().append([name, time.perf_counter(), 0.0])
+
+    def _exit(self, name):
+        stack = self._stack()
+        if not stack or stack[-1][0] != name:
+            return
+        _, started, nested = stack.pop()
+        cumulative = time.perf_counter() - started
+        if stack:
+            stack[-1][2] += cumulative
+        with self._lock:
+            self.imports[name] = (cumulative - nested, cumulative)
+
+    def report(self, top=REPORT_TOP_IMPORTS):
+        """
+        Registra en el log el informe del arranque y retira el buscador.
+
+        Args:
+            top: Número de imports más lentos (por tiempo acumulado) que se listan
+
+        Returns:
+            Texto del informe
+        """
+        self.stop()
+        total = time.perf_counter() - self._started
+        phases = ", ".join(f"{phase} {seconds * 1000:.0f} ms" for phase, seconds in self.phases)
+        lines = [
+            f"Startup took {total * 1000:.0f} ms ({phases}); {len(self.imports)} modules imported",
+            "import time: self [ms] | cumulative [ms] | module",
+        ]
+        slowest = sorted(self.imports.items(), key=lambda item: item[1][1], reverse=True)[:top]
+        for name, (own, cumulative) in slowest:
+            lines.append(f"import time: {own * 1000:9.1f} | {cumulative * 1000:9.1f} | {name}")
+        text = "\n".join(lines)
+        logger.info(text)
+        return text
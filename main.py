@@ -1,12 +1,12 @@
 """
 Punto de entrada principal de la aplicación Dataset Maker.
 """
+import os
 import sys
 import logging
-from PySide6.QtWidgets import QApplication
 
 from config.logging_config import setup_logging, get_logger
-from core.main_window import MainWindow
+from core.startup_timing import StartupTimer
 
 # Configurar logging
 setup_logging()
@@ -17,21 +17,52 @@ def main():
     """Función principal de la aplicación."""
     try:
         logger.info("Starting Dataset Maker App")
-        
+        timer = StartupTimer()
+        timer.start()
+
+        # Los imports pesados se hacen aquí y no al cargar el módulo: los
+        # procesos hijos de multiprocessing (spawn) vuelven a importar este
+        # archivo y no necesitan Qt ni las pestañas
+        from PySide6.QtWidgets import QApplication
+        from core.job_manager import shutdown_job_manager
+        from core.main_window import MainWindow
+        timer.mark("imports")
+
         app = QApplication(sys.argv)
-        
+        timer.mark("QApplication")
+
         window = MainWindow()
         window.apply_fusion_theme(app)
+        timer.mark("main window")
+
         window.show()
-        
+        app.processEvents()
+        timer.mark("first paint")
+        timer.report()
+
         logger.info("Application started successfully")
         
-        sys.exit(app.exec())
+        exit_code = app.exec()
+        abandoned = shutdown_job_manager()
+        shutdown_tagger_service()
+        if abandoned:
+            # El intérprete esperaría a los hilos del pool al salir; los
+            # trabajos que no pararon a tiempo se abandonan
+            logging.shutdown()
+            os._exit(exit_code)
+        sys.exit(exit_code)
     except Exception as e:
         logger.critical(f"Fatal error starting application: {e}", exc_info=True)
         sys.exit(1)
 
 
+def shutdown_tagger_service():
+    """Detiene el proceso del tagger ONNX si alguna pestaña llegó a arrancarlo."""
+    tagger = sys.modules.get('utils.tagger')
+    if tagger is not None:
+        tagger.shutdown_tagger_service()
+
+
 if __name__ == "__main__":
     main()
 
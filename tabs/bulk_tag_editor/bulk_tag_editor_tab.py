@@ -15,11 +15,16 @@ from PySide6.QtWidgets import (
 )
 from PySide6.QtCore import Qt
 
+from core.job_manager import JOB_TYPE_IO, PRIORITY_HIGH, JobCancelled, get_job_manager
+
 logger = logging.getLogger(__name__)
 
 # Archivo para guardar tags eliminadas
 SAVED_TAGS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "bulk_tag_editor_saved_tags.json")
 
+# Archivos procesados entre avisos de progreso
+PROGRESS_INTERVAL = 200
+
 
 class BulkTagEditorTab(QWidget):
     """Pestaña para editar tags masivamente en archivos de caption."""
@@ -29,6 +34,7 @@ class BulkTagEditorTab(QWidget):
         self.folder_path = ""
         self.tag_data = {}  # {(namespace, tag): count}
         self.file_tags = {}  # {file_path: [list of (namespace, tag)]}
+        self.job = None
         self.setup_ui()
 
     def setup_ui(self):
@@ -306,18 +312,21 @@ class BulkTagEditorTab(QWidget):
                     f"Error al cargar tags anteriores: {str(e)}"
                 )
 
-    def scan_txt_files(self):
+    def scan_txt_files(self, folder_path, recursive):
         """
-        Escanea archivos .txt en la carpeta seleccionada.
+        Escanea archivos .txt en una carpeta.
+        
+        Args:
+            folder_path: Carpeta a escanear
+            recursive: Si True, incluye las subcarpetas
         
         Returns:
             Lista de rutas de archivos .txt encontrados
         """
-        if not self.folder_path or not os.path.exists(self.folder_path):
+        if not folder_path or not os.path.exists(folder_path):
             return []
         
         txt_files = []
-        recursive = self.recursive_checkbox.isChecked()
         
         def scan_directory(directory):
             try:
@@ -332,30 +341,50 @@ class BulkTagEditorTab(QWidget):
             except Exception as e:
                 logger.error(f"Error escaneando {directory}: {e}")
         
-        scan_directory(self.folder_path)
+        scan_directory(folder_path)
         logger.info(f"Encontrados {len(txt_files)} archivos .txt")
         return txt_files
 
     def load_tags(self):
-        """Carga y agrega tags de todos los archivos .txt."""
+        """Carga y agrega en segundo plano los tags de todos los archivos .txt."""
         if not self.folder_path:
             QMessageBox.warning(self, "Sin Carpeta", "Por favor selecciona una carpeta primero.")
             return
         
-        # Limpiar datos anteriores
-        self.tag_data = defaultdict(int)
-        self.file_tags = {}
+        self.job = get_job_manager().submit(
+            f"Cargar tags de {os.path.basename(self.folder_path)}",
+            self.read_tags_job,
+            self.folder_path,
+            self.recursive_checkbox.isChecked(),
+            self.get_banned_tags(),
+            job_type=JOB_TYPE_IO,
+            priority=PRIORITY_HIGH,
+            cancellable=False
+        )
+        self.job.completed.connect(self.on_tags_loaded)
+        self.job.failed.connect(self.on_job_failed)
+        self.set_busy(True)
+
+    def read_tags_job(self, job, folder_path, recursive, banned_tags):
+        """
+        Trabajo del JobManager que lee y cuenta los tags de los archivos .txt.
         
-        txt_files = self.scan_txt_files()
-        if not txt_files:
-            QMessageBox.information(self, "Sin Archivos", "No se encontraron archivos .txt en la carpeta seleccionada.")
-            return
+        Args:
+            job: Job en ejecución
+            folder_path: Carpeta a escanear
+            recursive: Si True, incluye las subcarpetas
+            banned_tags: Set de tags prohibidos normalizados
+            
+        Returns:
+            Tupla (archivos .txt, {(namespace, tag): count}, {file_path: [(namespace, tag)]})
+        """
+        tag_data = defaultdict(int)
+        file_tags = {}
         
-        banned_tags = self.get_banned_tags()
-        min_count = self.min_count_spinbox.value()
+        txt_files = self.scan_txt_files(folder_path, recursive)
         
         # Procesar cada archivo
-        for file_path in txt_files:
+        for index, file_path in enumerate(txt_files, start=1):
             try:
                 # Intentar leer con UTF-8, con fallback
                 try:
@@ -383,15 +412,29 @@ class BulkTagEditorTab(QWidget):
                         
                         if not is_banned:
                             key = (namespace, tag)  # Mantener tag original con espacios
-                            self.tag_data[key] += 1
+                            tag_data[key] += 1
                             file_tag_list.append(key)
                 
-                self.file_tags[file_path] = file_tag_list
+                file_tags[file_path] = file_tag_list
                 
             except Exception as e:
                 logger.error(f"Error leyendo archivo {file_path}: {e}")
+            
+            if index % PROGRESS_INTERVAL == 0 or index == len(txt_files):
+                job.report_progress(index, len(txt_files))
+        
+        return txt_files, tag_data, file_tags
+
+    def on_tags_loaded(self, result):
+        """Muestra los tags cargados en el árbol."""
+        self.set_busy(False)
+        txt_files, self.tag_data, self.file_tags = result
+        if not txt_files:
+            QMessageBox.information(self, "Sin Archivos", "No se encontraron archivos .txt en la carpeta seleccionada.")
+            return
         
         # Filtrar por frecuencia mínima
+        min_count = self.min_count_spinbox.value()
         filtered_tags = {
             k: v for k, v in self.tag_data.items()
             if v >= min_count
@@ -407,6 +450,19 @@ class BulkTagEditorTab(QWidget):
             f"Tags únicos mostrados: {len(filtered_tags)}"
         )
 
+    def on_job_failed(self, error):
+        """Muestra el error de un trabajo de la pestaña."""
+        self.set_busy(False)
+        if not isinstance(error, JobCancelled):
+            QMessageBox.critical(self, "Error", f"Error en segundo plano: {str(error)}")
+
+    def set_busy(self, busy):
+        """Deshabilita las acciones mientras hay un trabajo de la pestaña en marcha."""
+        for button in (self.load_button, self.dry_run_button, self.apply_button, self.rename_button):
+            button.setEnabled(not busy)
+        if not busy:
+            self.job = None
+
     def populate_tree(self, tag_data):
         """Pobla el QTreeWidget con tags agrupados por namespace."""
         self.tree.clear()
@@ -565,11 +621,38 @@ class BulkTagEditorTab(QWidget):
             if reply != QMessageBox.Yes:
                 return
         
-        # Procesar archivos
+        self.job = get_job_manager().submit(
+            f"Aplicar cambios de tags en {os.path.basename(self.folder_path)}",
+            self.rewrite_files_job,
+            dict(self.file_tags),
+            unchecked_tags,
+            banned_tags,
+            backup_folder,
+            job_type=JOB_TYPE_IO,
+            cancellable=False
+        )
+        self.job.completed.connect(self.on_changes_applied)
+        self.job.failed.connect(self.on_job_failed)
+        self.set_busy(True)
+
+    def rewrite_files_job(self, job, file_tags, unchecked_tags, banned_tags, backup_folder):
+        """
+        Trabajo del JobManager que reescribe los archivos sin los tags eliminados.
+        
+        Args:
+            job: Job en ejecución
+            file_tags: {file_path: [(namespace, tag)]}
+            unchecked_tags: Set de tuplas (namespace, tag) no marcadas
+            banned_tags: Set de tags prohibidos normalizados
+            backup_folder: Carpeta de backup o None
+            
+        Returns:
+            Tupla (archivos modificados, errores, carpeta de backup)
+        """
         modified_count = 0
         error_count = 0
         
-        for file_path, file_tag_list in self.file_tags.items():
+        for index, (file_path, file_tag_list) in enumerate(file_tags.items(), start=1):
             try:
                 # Hacer backup si existe la carpeta
                 if backup_folder:
@@ -601,9 +684,18 @@ class BulkTagEditorTab(QWidget):
             except Exception as e:
                 logger.error(f"Error procesando {file_path}: {e}")
                 error_count += 1
+            
+            if index % PROGRESS_INTERVAL == 0 or index == len(file_tags):
+                job.report_progress(index, len(file_tags))
         
         # Guardar tags eliminadas
         self.save_removed_tags(unchecked_tags, banned_tags)
+        return modified_count, error_count, backup_folder
+
+    def on_changes_applied(self, result):
+        """Muestra el resultado de aplicar los cambios y recarga los tags."""
+        self.set_busy(False)
+        modified_count, error_count, backup_folder = result
         
         # Mostrar resultado
         message = f"Proceso completado.\n"
@@ -677,7 +769,7 @@ class BulkTagEditorTab(QWidget):
         # Ejemplo: abcdef0123456789.png.txt -> abcdef0123456789.txt
         md5_pattern = re.compile(r'^([a-f0-9]{32})\.([a-zA-Z0-9]+)\.txt$', re.IGNORECASE)
         
-        txt_files = self.scan_txt_files()
+        txt_files = self.scan_txt_files(self.folder_path, self.recursive_checkbox.isChecked())
         files_to_rename = []
         for f in txt_files:
             basename = os.path.basename(f)
@@ -0,0 +1 @@
+# Dedupe tab module
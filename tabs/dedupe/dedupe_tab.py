@@ -0,0 +1,331 @@
+"""
+Pestaña de búsqueda de imágenes duplicadas.
+"""
+import os
+import logging
+from PySide6.QtWidgets import (
+    QWidget, QPushButton, QLabel, QVBoxLayout, QHBoxLayout, QFileDialog, QMessageBox,
+    QCheckBox, QComboBox, QSpinBox, QProgressBar, QTreeWidget, QTreeWidgetItem, QSplitter
+)
+from PySide6.QtGui import QPixmap
+from PySide6.QtCore import Qt
+
+from core.job_manager import JOB_TYPE_CPU, JobCancelled, get_job_manager
+from utils.dedupe import DEFAULT_MAX_DISTANCE, find_exact_duplicates, find_near_duplicates
+from utils.file_operations import CAPTION_EXTENSIONS, delete_paired_files, move_paired_files
+from utils.image_hashing import HASH_DHASH, HASH_PHASH
+
+logger = logging.getLogger(__name__)
+
+# Modos de búsqueda
+DEDUPE_MODE_PERCEPTUAL = 'perceptual'
+DEDUPE_MODE_EXACT = 'exact'
+
+
+class DedupeTab(QWidget):
+    """Pestaña para encontrar imágenes duplicadas o casi duplicadas y quedarse con una por grupo."""
+
+    def __init__(self):
+        super().__init__()
+        self.folder_path = ""
+        self.job = None
+        self.setup_ui()
+
+    def setup_ui(self):
+        """Configura la interfaz de usuario."""
+        self.select_folder_button = QPushButton("Select Folder")
+        self.select_folder_button.clicked.connect(self.select_folder)
+        self.folder_label = QLabel("No folder selected")
+
+        self.subfolders_checkbox = QCheckBox("Search in Subfolders")
+
+        self.mode_label = QLabel("Mode:")
+        self.mode_combo = QComboBox()
+        self.mode_combo.addItem("Similar images", DEDUPE_MODE_PERCEPTUAL)
+        self.mode_combo.addItem("Identical files", DEDUPE_MODE_EXACT)
+        self.mode_combo.currentIndexChanged.connect(self.update_perceptual_options_enabled)
+
+        self.method_label = QLabel("Hash:")
+        self.method_combo = QComboBox()
+        self.method_combo.addItem("dHash (fast)", HASH_DHASH)
+        self.method_combo.addItem("pHash (robust)", HASH_PHASH)
+
+        self.distance_label = QLabel("Max Distance:")
+        self.distance_spinbox = QSpinBox()
+        self.distance_spinbox.setRange(0, 16)
+        self.distance_spinbox.setValue(DEFAULT_MAX_DISTANCE)
+        self.distance_spinbox.setToolTip("Maximum number of differing hash bits (0 = identical hashes)")
+
+        self.workers_label = QLabel("Workers:")
+        self.workers_spinbox = QSpinBox()
+        self.workers_spinbox.setRange(1, os.cpu_count() or 1)
+        self.workers_spinbox.setValue(os.cpu_count() or 1)
+
+        self.find_button = QPushButton("Find Duplicates")
+        self.find_button.clicked.connect(self.find_duplicates)
+
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.clicked.connect(self.cancel_search)
+
+        self.progress_bar = QProgressBar()
+        self.result_label = QLabel("Clusters Found: 0")
+
+        self.tree = QTreeWidget()
+        self.tree.setColumnCount(1)
+        self.tree.setHeaderLabels(["Duplicate Clusters"])
+        self.tree.itemClicked.connect(self.display_image_preview)
+
+        self.image_label = QLabel()
+        self.image_label.setFixedSize(400, 400)
+        self.image_label.setAlignment(Qt.AlignCenter)
+        self.image_label.setStyleSheet("border: 1px solid black;")
+
+        self.keep_first_button = QPushButton("Keep Best Of Each")
+        self.keep_first_button.setToolTip("Select every image except the suggested one (listed first) of each cluster")
+        self.keep_first_button.clicked.connect(self.select_all_but_first)
+
+        self.deselect_all_button = QPushButton("Deselect All")
+        self.deselect_all_button.clicked.connect(self.deselect_all)
+
+        self.delete_button = QPushButton("Delete Selected")
+        self.delete_button.clicked.connect(self.delete_files)
+
+        self.move_button = QPushButton("Move Selected")
+        self.move_button.clicked.connect(self.move_files)
+
+        # Layouts
+        top_layout = QHBoxLayout()
+        top_layout.addWidget(self.select_folder_button)
+        top_layout.addWidget(self.folder_label, 1)
+        top_layout.addWidget(self.subfolders_checkbox)
+
+        options_layout = QHBoxLayout()
+        options_layout.addWidget(self.mode_label)
+        options_layout.addWidget(self.mode_combo)
+        options_layout.addWidget(self.method_label)
+        options_layout.addWidget(self.method_combo)
+        options_layout.addWidget(self.distance_label)
+        options_layout.addWidget(self.distance_spinbox)
+        options_layout.addWidget(self.workers_label)
+        options_layout.addWidget(self.workers_spinbox)
+        options_layout.addWidget(self.find_button, 1)
+        options_layout.addWidget(self.cancel_button)
+
+        progress_layout = QHBoxLayout()
+        progress_layout.addWidget(self.progress_bar, 1)
+        progress_layout.addWidget(self.result_label)
+
+        splitter = QSplitter(Qt.Horizontal)
+        splitter.addWidget(self.tree)
+        splitter.addWidget(self.image_label)
+        splitter.setSizes([300, 400])
+
+        actions_layout = QHBoxLayout()
+        actions_layout.addWidget(self.keep_first_button)
+        actions_layout.addWidget(self.deselect_all_button)
+        actions_layout.addWidget(self.delete_button)
+        actions_layout.addWidget(self.move_button)
+
+        tab_layout = QVBoxLayout()
+        tab_layout.addLayout(top_layout)
+        tab_layout.addLayout(options_layout)
+        tab_layout.addLayout(progress_layout)
+        tab_layout.addWidget(splitter)
+        tab_layout.addLayout(actions_layout)
+        self.setLayout(tab_layout)
+
+    def select_folder(self):
+        """Selecciona la carpeta del dataset."""
+        folder_selected = QFileDialog.getExistingDirectory(self, "Select Folder")
+        if folder_selected:
+            self.folder_path = folder_selected
+            self.folder_label.setText(folder_selected)
+            logger.info(f"Selected folder: {folder_selected}")
+
+    def update_perceptual_options_enabled(self):
+        """Las opciones de hash solo aplican a la búsqueda de imágenes parecidas."""
+        perceptual = self.mode_combo.currentData() == DEDUPE_MODE_PERCEPTUAL
+        self.method_combo.setEnabled(perceptual)
+        self.distance_spinbox.setEnabled(perceptual)
+
+    def find_duplicates(self):
+        """Lanza la búsqueda de duplicados en segundo plano."""
+        if not self.folder_path:
+            QMessageBox.warning(self, "No Folder Selected", "Please select a folder first.")
+            return
+
+        self.job = get_job_manager().submit(
+            f"Find duplicates in {os.path.basename(self.folder_path)}",
+            find_duplicates_job,
+            self.mode_combo.currentData(),
+            self.folder_path,
+            self.subfolders_checkbox.isChecked(),
+            self.method_combo.currentData(),
+            self.distance_spinbox.value(),
+            self.workers_spinbox.value(),
+            job_type=JOB_TYPE_CPU
+        )
+        self.job.progress.connect(self.on_progress)
+        self.job.completed.connect(self.on_completed)
+        self.job.failed.connect(self.on_failed)
+
+        self.progress_bar.setValue(0)
+        self.find_button.setEnabled(False)
+        self.cancel_button.setEnabled(True)
+
+    def cancel_search(self):
+        """Cancela la búsqueda; los hashes perceptuales ya calculados quedan en caché."""
+        if self.job is not None:
+            self.job.cancel()
+            self.cancel_button.setEnabled(False)
+            logger.info("Duplicate search cancel requested")
+
+    def on_progress(self, done, total):
+        """Actualiza la barra de progreso."""
+        self.progress_bar.setMaximum(total)
+        self.progress_bar.setValue(done)
+
+    def on_completed(self, clusters):
+        """Muestra los clusters encontrados."""
+        self.reset_controls()
+        self.update_treeview(clusters)
+
+    def on_failed(self, error):
+        """Muestra un error que detuvo la búsqueda."""
+        self.reset_controls()
+        if not isinstance(error, JobCancelled):
+            QMessageBox.critical(self, "Error", f"An error occurred: {str(error)}")
+
+    def reset_controls(self):
+        """Restaura los botones al terminar la búsqueda."""
+        self.find_button.setEnabled(True)
+        self.cancel_button.setEnabled(False)
+        self.job = None
+
+    def update_treeview(self, clusters):
+        """
+        Muestra un nodo por cluster con sus imágenes como hijos.
+
+        La primera imagen de cada cluster (la sugerida para conservar) queda
+        sin marcar y el resto marcadas.
+        """
+        self.tree.clear()
+        for number, cluster in enumerate(clusters, start=1):
+            parent = QTreeWidgetItem([f"Cluster {number} ({len(cluster)} images)"])
+            for position, path in enumerate(cluster):
+                child = QTreeWidgetItem([path])
+                child.setCheckState(0, Qt.Unchecked if position == 0 else Qt.Checked)
+                parent.addChild(child)
+            self.tree.addTopLevelItem(parent)
+            parent.setExpanded(True)
+        self.result_label.setText(f"Clusters Found: {len(clusters)}")
+        self.image_label.clear()
+
+    def iter_file_items(self):
+        """Recorre los elementos de archivo de todos los clusters."""
+        root = self.tree.invisibleRootItem()
+        for i in range(root.childCount()):
+            cluster = root.child(i)
+            for j in range(cluster.childCount()):
+                yield cluster.child(j), j
+
+    def select_all_but_first(self):
+        """Marca todas las imágenes salvo la primera de cada cluster."""
+        for item, position in self.iter_file_items():
+            item.setCheckState(0, Qt.Unchecked if position == 0 else Qt.Checked)
+
+    def deselect_all(self):
+        """Desmarca todas las imágenes."""
+        for item, _ in self.iter_file_items():
+            item.setCheckState(0, Qt.Unchecked)
+
+    def get_selected_items(self):
+        """Obtiene las imágenes marcadas."""
+        return [item.text(0) for item, _ in self.iter_file_items() if item.checkState(0) == Qt.Checked]
+
+    def remove_items(self, file_paths):
+        """Quita del árbol las imágenes procesadas y los clusters que ya no tienen duplicados."""
+        removed = set(file_paths)
+        root = self.tree.invisibleRootItem()
+        for i in reversed(range(root.childCount())):
+            cluster = root.child(i)
+            for j in reversed(range(cluster.childCount())):
+                if cluster.child(j).text(0) in removed:
+                    cluster.removeChild(cluster.child(j))
+            if cluster.childCount() < 2:
+                root.removeChild(cluster)
+        self.result_label.setText(f"Clusters Found: {root.childCount()}")
+        self.image_label.clear()
+
+    def delete_files(self):
+        """Elimina las imágenes marcadas y sus captions."""
+        selected_files = self.get_selected_items()
+        if not selected_files:
+            QMessageBox.warning(self, "No Files Selected", "Please select files to delete.")
+            return
+
+        reply = QMessageBox.question(
+            self,
+            "Confirm Delete",
+            f"Are you sure you want to delete {len(selected_files)} images and their captions?",
+            QMessageBox.Yes | QMessageBox.No
+        )
+        if reply == QMessageBox.Yes:
+            deleted_count = delete_paired_files(selected_files, CAPTION_EXTENSIONS)
+            self.remove_items([path for path in selected_files if not os.path.exists(path)])
+            QMessageBox.information(self, "Delete Complete", f"{deleted_count} files deleted successfully.")
+
+    def move_files(self):
+        """Mueve las imágenes marcadas y sus captions a una nueva carpeta."""
+        selected_files = self.get_selected_items()
+        if not selected_files:
+            QMessageBox.warning(self, "No Files Selected", "Please select files to move.")
+            return
+
+        from PySide6.QtWidgets import QInputDialog
+        new_folder_name, ok = QInputDialog.getText(self, "New Folder", "Enter the name of the new folder:")
+        if ok and new_folder_name:
+            new_folder_path = os.path.join(self.folder_path, new_folder_name)
+            moved_count = move_paired_files(selected_files, new_folder_path, CAPTION_EXTENSIONS)
+            self.remove_items([path for path in selected_files if not os.path.exists(path)])
+            QMessageBox.information(self, "Move Complete", f"{moved_count} files moved successfully.")
+
+    def display_image_preview(self, item):
+        """Muestra la previsualización de la imagen."""
+        if item.parent() is None:
+            return
+        pixmap = QPixmap(item.text(0))
+        if pixmap.isNull():
+            self.image_label.setPixmap(QPixmap())
+            self.image_label.setText("Cannot preview this image.")
+            return
+        self.image_label.setPixmap(
+            pixmap.scaled(self.image_label.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        )
+
+
+def find_duplicates_job(job, mode, folder, recursive, method, max_distance, max_workers):
+    """
+    Trabajo del JobManager que busca duplicados exactos o perceptuales.
+
+    Returns:
+        Lista de clusters (listas de rutas)
+    """
+    if mode == DEDUPE_MODE_EXACT:
+        return find_exact_duplicates(
+            folder,
+            recursive,
+            max_workers,
+            progress_callback=job.report_progress,
+            cancel_event=job.cancel_event
+        )
+    return find_near_duplicates(
+        folder,
+        recursive,
+        method,
+        max_distance=max_distance,
+        max_workers=max_workers,
+        progress_callback=job.report_progress,
+        cancel_event=job.cancel_event
+    )
@@ -1,71 +1,154 @@
 """
-Pestaña para fusionar caracteres de dos directorios.
+Pestaña para fusionar caracteres de varios directorios.
 """
 import os
 import logging
 from PySide6.QtWidgets import (
-    QWidget, QPushButton, QLabel, QTextEdit, QCheckBox,
-    QFileDialog, QMessageBox, QGridLayout
+    QWidget, QPushButton, QLabel, QTextEdit, QCheckBox, QComboBox, QSpinBox, QListWidget,
+    QFileDialog, QMessageBox, QGridLayout, QHBoxLayout, QProgressBar
+)
+
+from core.job_manager import JOB_TYPE_CPU, JobCancelled, get_job_manager
+from utils.captions import CAPTION_MODE_TAGS, CAPTION_MODE_TEXT
+from utils.composition import LAYOUT_GRID, LAYOUT_HORIZONTAL, LAYOUT_VERTICAL
+from utils.fusion import FusionCancelled, fuse_directories
+from utils.pair_planner import (
+    STRATEGY_BALANCED, STRATEGY_CARTESIAN, STRATEGY_RANDOM_SAMPLE, STRATEGY_ZIP_WRAP
 )
-from PIL import Image
 
 logger = logging.getLogger(__name__)
 
 
 class FuseCharactersTab(QWidget):
-    """Pestaña para fusionar imágenes y textos de dos directorios."""
+    """Pestaña para fusionar imágenes y textos de varios directorios."""
 
     def __init__(self):
         super().__init__()
-        self.fuse_dir1 = ""
-        self.fuse_dir2 = ""
+        self.fuse_dirs = []
         self.fuse_output_dir = ""
         self.template = ""
+        self.fuse_job = None
         self.setup_ui()
 
     def setup_ui(self):
         """Configura la interfaz de usuario."""
-        self.dir1_button = QPushButton("Select Directory 1")
-        self.dir1_button.clicked.connect(self.select_fuse_dir1)
+        self.add_dir_button = QPushButton("Add Directory")
+        self.add_dir_button.clicked.connect(self.add_fuse_dir)
+
+        self.remove_dir_button = QPushButton("Remove Selected")
+        self.remove_dir_button.clicked.connect(self.remove_fuse_dir)
 
-        self.dir2_button = QPushButton("Select Directory 2")
-        self.dir2_button.clicked.connect(self.select_fuse_dir2)
+        self.dirs_list = QListWidget()
+        self.dirs_list.setMaximumHeight(100)
 
         self.output_dir_button = QPushButton("Select Output Directory")
         self.output_dir_button.clicked.connect(self.select_fuse_output_dir)
 
-        self.template_label = QLabel("Template Text:")
+        self.template_label = QLabel("Template Text ({description_dir_1}, {description_dir_2}, ...):")
         self.template_edit = QTextEdit()
 
         self.add_white_bg_checkbox_fuse = QCheckBox("Add White Background")
 
+        self.caption_mode_combo = QComboBox()
+        self.caption_mode_combo.addItem("Raw captions", CAPTION_MODE_TEXT)
+        self.caption_mode_combo.addItem("Merge tags (shared once)", CAPTION_MODE_TAGS)
+        self.caption_mode_combo.setToolTip(
+            "Merge tags also enables {shared_tags}, {tags_dir_k} and {merged_tags} in the template"
+        )
+        self.sort_tags_checkbox = QCheckBox("Sort Tags")
+
+        caption_layout = QHBoxLayout()
+        caption_layout.addWidget(QLabel("Captions:"))
+        caption_layout.addWidget(self.caption_mode_combo, 1)
+        caption_layout.addWidget(self.sort_tags_checkbox)
+
+        self.strategy_combo = QComboBox()
+        self.strategy_combo.addItem("Pair in order (repeat shorter)", STRATEGY_ZIP_WRAP)
+        self.strategy_combo.addItem("All combinations", STRATEGY_CARTESIAN)
+        self.strategy_combo.addItem("Random sample", STRATEGY_RANDOM_SAMPLE)
+        self.strategy_combo.addItem("Balanced shuffle", STRATEGY_BALANCED)
+
+        self.pair_count_spinbox = QSpinBox()
+        self.pair_count_spinbox.setRange(0, 10000000)
+        self.pair_count_spinbox.setSpecialValueText("Auto")
+        self.pair_count_spinbox.setToolTip("Number of pairs for random and balanced strategies")
+
+        self.seed_spinbox = QSpinBox()
+        self.seed_spinbox.setRange(0, 2147483647)
+        self.seed_spinbox.setToolTip("Seed for random and balanced strategies")
+
+        self.layout_combo = QComboBox()
+        self.layout_combo.addItem("Horizontal (1×N)", LAYOUT_HORIZONTAL)
+        self.layout_combo.addItem("Vertical (N×1)", LAYOUT_VERTICAL)
+        self.layout_combo.addItem("Grid (R×C)", LAYOUT_GRID)
+        self.layout_combo.currentIndexChanged.connect(self.update_columns_enabled)
+
+        self.columns_spinbox = QSpinBox()
+        self.columns_spinbox.setRange(0, 64)
+        self.columns_spinbox.setSpecialValueText("Auto")
+        self.columns_spinbox.setToolTip("Grid columns")
+        self.columns_spinbox.setEnabled(False)
+
+        pairing_layout = QHBoxLayout()
+        pairing_layout.addWidget(QLabel("Pairing:"))
+        pairing_layout.addWidget(self.strategy_combo, 1)
+        pairing_layout.addWidget(QLabel("Pairs:"))
+        pairing_layout.addWidget(self.pair_count_spinbox)
+        pairing_layout.addWidget(QLabel("Seed:"))
+        pairing_layout.addWidget(self.seed_spinbox)
+        pairing_layout.addWidget(QLabel("Layout:"))
+        pairing_layout.addWidget(self.layout_combo)
+        pairing_layout.addWidget(QLabel("Columns:"))
+        pairing_layout.addWidget(self.columns_spinbox)
+
         self.fuse_button = QPushButton("Fuse Characters")
         self.fuse_button.clicked.connect(self.fuse_data)
 
+        self.cancel_fuse_button = QPushButton("Cancel")
+        self.cancel_fuse_button.setEnabled(False)
+        self.cancel_fuse_button.clicked.connect(self.cancel_fuse)
+
+        self.fuse_progress_bar = QProgressBar()
+
         layout = QGridLayout()
-        layout.addWidget(self.dir1_button, 0, 0)
-        layout.addWidget(self.dir2_button, 0, 1)
+        layout.addWidget(self.add_dir_button, 0, 0)
+        layout.addWidget(self.remove_dir_button, 0, 1)
         layout.addWidget(self.output_dir_button, 0, 2)
-        layout.addWidget(self.template_label, 1, 0, 1, 3)
-        layout.addWidget(self.template_edit, 2, 0, 1, 3)
-        layout.addWidget(self.add_white_bg_checkbox_fuse, 3, 0)
-        layout.addWidget(self.fuse_button, 3, 1)
+        layout.addWidget(self.dirs_list, 1, 0, 1, 3)
+        layout.addWidget(self.template_label, 2, 0, 1, 3)
+        layout.addWidget(self.template_edit, 3, 0, 1, 3)
+        layout.addLayout(pairing_layout, 4, 0, 1, 3)
+        layout.addLayout(caption_layout, 5, 0, 1, 3)
+        layout.addWidget(self.add_white_bg_checkbox_fuse, 6, 0)
+        layout.addWidget(self.fuse_button, 6, 1)
+        layout.addWidget(self.cancel_fuse_button, 6, 2)
+        layout.addWidget(self.fuse_progress_bar, 7, 0, 1, 3)
 
         self.setLayout(layout)
 
-    def select_fuse_dir1(self):
-        """Selecciona el primer directorio."""
-        folder_selected = QFileDialog.getExistingDirectory(self, "Select Directory 1")
+    def add_fuse_dir(self):
+        """Añade un directorio de origen."""
+        folder_selected = QFileDialog.getExistingDirectory(
+            self, f"Select Directory {len(self.fuse_dirs) + 1}"
+        )
         if folder_selected:
-            self.fuse_dir1 = folder_selected
-            logger.info(f"Selected directory 1: {folder_selected}")
+            self.fuse_dirs.append(folder_selected)
+            self.dirs_list.addItem(f"{len(self.fuse_dirs)}: {folder_selected}")
+            logger.info(f"Selected directory {len(self.fuse_dirs)}: {folder_selected}")
+
+    def remove_fuse_dir(self):
+        """Quita el directorio de origen seleccionado."""
+        row = self.dirs_list.currentRow()
+        if row < 0:
+            return
+        del self.fuse_dirs[row]
+        self.dirs_list.clear()
+        for k, directory in enumerate(self.fuse_dirs, start=1):
+            self.dirs_list.addItem(f"{k}: {directory}")
 
-    def select_fuse_dir2(self):
-        """Selecciona el segundo directorio."""
-        folder_selected = QFileDialog.getExistingDirectory(self, "Select Directory 2")
-        if folder_selected:
-            self.fuse_dir2 = folder_selected
-            logger.info(f"Selected directory 2: {folder_selected}")
+    def update_columns_enabled(self):
+        """Habilita las columnas solo para el layout en rejilla."""
+        self.columns_spinbox.setEnabled(self.layout_combo.currentData() == LAYOUT_GRID)
 
     def select_fuse_output_dir(self):
         """Selecciona el directorio de salida."""
@@ -75,9 +158,12 @@ class FuseCharactersTab(QWidget):
             logger.info(f"Selected output directory: {folder_selected}")
 
     def fuse_data(self):
-        """Fusiona las imágenes y textos de los dos directorios."""
-        if not all([self.fuse_dir1, self.fuse_dir2, self.fuse_output_dir]):
-            QMessageBox.warning(self, "Missing Directories", "Please select all directories.")
+        """Fusiona las imágenes y textos de los directorios en segundo plano."""
+        if len(self.fuse_dirs) < 2 or not self.fuse_output_dir:
+            QMessageBox.warning(
+                self, "Missing Directories",
+                "Please add at least two directories and select an output directory."
+            )
             return
 
         self.template = self.template_edit.toPlainText()
@@ -85,115 +171,91 @@ class FuseCharactersTab(QWidget):
             QMessageBox.warning(self, "No Template", "Please enter a template.")
             return
 
-        output_dir_path = self.fuse_output_dir
-        os.makedirs(output_dir_path, exist_ok=True)
-
-        dir1_path = self.fuse_dir1
-        dir2_path = self.fuse_dir2
-
-        img_extensions = ['.jpg', '.png']
-
-        files_dir1 = sorted(
-            [f for f in os.listdir(dir1_path) if f.endswith(tuple(img_extensions))],
-            key=lambda x: os.path.splitext(x)[0]
+        self.fuse_job = get_job_manager().submit(
+            f"Fuse {len(self.fuse_dirs)} directories into {os.path.basename(self.fuse_output_dir)}",
+            fuse_job,
+            list(self.fuse_dirs),
+            self.fuse_output_dir,
+            self.template,
+            self.add_white_bg_checkbox_fuse.isChecked(),
+            self.strategy_combo.currentData(),
+            self.pair_count_spinbox.value() or None,
+            self.seed_spinbox.value(),
+            self.layout_combo.currentData(),
+            self.columns_spinbox.value() or None,
+            self.caption_mode_combo.currentData(),
+            self.sort_tags_checkbox.isChecked(),
+            job_type=JOB_TYPE_CPU
         )
-        files_dir2 = sorted(
-            [f for f in os.listdir(dir2_path) if f.endswith(tuple(img_extensions))],
-            key=lambda x: os.path.splitext(x)[0]
+        self.fuse_job.progress.connect(self.on_fuse_progress)
+        self.fuse_job.completed.connect(self.on_fuse_completed)
+        self.fuse_job.failed.connect(self.on_fuse_failed)
+
+        self.fuse_progress_bar.setValue(0)
+        self.fuse_button.setEnabled(False)
+        self.cancel_fuse_button.setEnabled(True)
+
+    def cancel_fuse(self):
+        """Cancela la fusión en curso."""
+        if self.fuse_job is not None:
+            self.fuse_job.cancel()
+            self.cancel_fuse_button.setEnabled(False)
+            logger.info("Fusion cancel requested")
+
+    def on_fuse_progress(self, done, total):
+        """Actualiza la barra de progreso."""
+        self.fuse_progress_bar.setMaximum(total)
+        self.fuse_progress_bar.setValue(done)
+
+    def on_fuse_completed(self, processed_count):
+        """Muestra el resultado de una fusión terminada."""
+        self.reset_fuse_controls()
+        QMessageBox.information(
+            self,
+            "Fusion Complete",
+            f"Fusion completed for {processed_count} images."
         )
 
-        max_length = max(len(files_dir1), len(files_dir2))
-
-        files_dir1 *= (max_length // len(files_dir1)) + 1
-        files_dir2 *= (max_length // len(files_dir2)) + 1
-
-        processed_count = 0
-        try:
-            for i in range(max_length):
-                file_name1, ext1 = os.path.splitext(files_dir1[i % len(files_dir1)])
-                file_name2, ext2 = os.path.splitext(files_dir2[i % len(files_dir2)])
-
-                img_path1 = os.path.join(dir1_path, files_dir1[i % len(files_dir1)])
-                img_path2 = os.path.join(dir2_path, files_dir2[i % len(files_dir2)])
-
-                img1 = Image.open(img_path1)
-                img2 = Image.open(img_path2)
-
-                if i % 2 == 0:
-                    combined_img = self.join_images(img1, img2)
-                else:
-                    combined_img = self.join_images(img2, img1)
-
-                combined_img_path = os.path.join(output_dir_path, f"{i+1}.jpg")
-                combined_img.save(combined_img_path)
-
-                self.fuse_texts(file_name1, file_name2, dir1_path, dir2_path, output_dir_path, i+1)
-                processed_count += 1
-
+    def on_fuse_failed(self, error):
+        """Muestra el error o la cancelación de una fusión."""
+        self.reset_fuse_controls()
+        if isinstance(error, JobCancelled):
+            return
+        if isinstance(error, FusionCancelled):
             QMessageBox.information(
-                self,
-                "Fusion Complete",
-                f"Fusion completed for {processed_count} images."
-            )
-            logger.info(f"Fused {processed_count} image pairs from {dir1_path} and {dir2_path}")
-        except Exception as e:
-            logger.error(f"Error fusing characters: {e}")
-            QMessageBox.critical(self, "Error", f"An error occurred: {str(e)}")
-
-    def join_images(self, img1, img2):
-        """Une dos imágenes horizontalmente."""
-        if self.add_white_bg_checkbox_fuse.isChecked():
-            if img1.mode == 'RGBA':
-                background = Image.new('RGB', img1.size, (255, 255, 255))
-                background.paste(img1, mask=img1.split()[3])
-                img1 = background
-            if img2.mode == 'RGBA':
-                background = Image.new('RGB', img2.size, (255, 255, 255))
-                background.paste(img2, mask=img2.split()[3])
-                img2 = background
-
-        new_height = min(img1.height, img2.height)
-        img1_new_width = int((new_height / img1.height) * img1.width)
-        img2_new_width = int((new_height / img2.height) * img2.width)
-
-        img1_resized = img1.resize((img1_new_width, new_height))
-        img2_resized = img2.resize((img2_new_width, new_height))
-
-        combined_img = Image.new(
-            'RGB',
-            (img1_new_width + img2_new_width, new_height),
-            (255, 255, 255) if self.add_white_bg_checkbox_fuse.isChecked() else None
-        )
-        combined_img.paste(img1_resized, (0, 0))
-        combined_img.paste(img2_resized, (img1_new_width, 0))
-
-        return combined_img
-
-    def fuse_texts(self, file_name1, file_name2, dir1, dir2, output_dir, index):
-        """Fusiona los textos de dos archivos usando el template."""
-        txt_path1 = os.path.join(dir1, f"{file_name1}.txt")
-        txt_path2 = os.path.join(dir2, f"{file_name2}.txt")
-
-        description_first_directory = ""
-        description_second_directory = ""
-
-        try:
-            if os.path.exists(txt_path1):
-                with open(txt_path1, 'r', encoding='utf-8') as f:
-                    description_first_directory = f.read()
-
-            if os.path.exists(txt_path2):
-                with open(txt_path2, 'r', encoding='utf-8') as f:
-                    description_second_directory = f.read()
-
-            combined_text = self.template.format(
-                description_first_directory=description_first_directory,
-                description_second_directory=description_second_directory
+                self, "Cancelled", f"{error}; images fused so far were kept."
             )
-
-            new_txt_path = os.path.join(output_dir, f"{index}.txt")
-            with open(new_txt_path, 'w', encoding='utf-8') as f:
-                f.write(combined_text)
-        except Exception as e:
-            logger.error(f"Error fusing texts for {index}: {e}")
-
+        else:
+            QMessageBox.critical(self, "Error", f"An error occurred: {str(error)}")
+
+    def reset_fuse_controls(self):
+        """Restaura los botones al terminar la fusión."""
+        self.fuse_button.setEnabled(True)
+        self.cancel_fuse_button.setEnabled(False)
+        self.fuse_job = None
+
+
+def fuse_job(job, directories, output_dir, template, add_white_bg, strategy, count, seed,
+             layout, columns, caption_mode, sort_tags):
+    """
+    Trabajo del JobManager que ejecuta fuse_directories.
+
+    Returns:
+        Número de imágenes fusionadas
+    """
+    return fuse_directories(
+        directories,
+        output_dir,
+        template,
+        add_white_bg,
+        strategy,
+        count,
+        seed,
+        layout,
+        columns,
+        caption_mode,
+        sort_tags,
+        max_workers=job.max_workers,
+        progress_callback=job.report_progress,
+        cancel_event=job.cancel_event
+    )
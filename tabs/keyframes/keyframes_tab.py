@@ -6,21 +6,25 @@ import shutil
 import logging
 from PySide6.QtWidgets import (
     QWidget, QPushButton, QLineEdit, QLabel, QVBoxLayout, QHBoxLayout,
-    QFileDialog, QMessageBox
+    QFileDialog, QMessageBox, QComboBox, QSpinBox, QDoubleSpinBox, QProgressBar, QCheckBox
 )
 
+from core.job_manager import JOB_TYPE_EXTERNAL, PRIORITY_LOW, JobCancelled, get_job_manager
+from utils.hash_store import HashStore
 from utils.keyframes import (
-    ensure_dir, extract_gif_frames, extract_webm_key_frames
+    DEFAULT_CUTOFF, DEFAULT_SCENE_THRESHOLD, KEYFRAME_MODE_KEYFRAMES, KEYFRAME_MODE_SCENE,
+    KEYFRAME_SOURCE_EXTENSIONS, ensure_dir, extract_keyframes, extract_keyframes_batch
 )
 
 logger = logging.getLogger(__name__)
 
 
 class KeyframesTab(QWidget):
-    """Pestaña para extraer keyframes de archivos GIF y WebM."""
+    """Pestaña para extraer keyframes de animaciones y videos."""
 
     def __init__(self):
         super().__init__()
+        self.batch_job = None
         self.setup_ui()
 
     def setup_ui(self):
@@ -37,9 +41,52 @@ class KeyframesTab(QWidget):
             self.select_keyframes_output_folder
         )
 
+        self.keyframes_mode_label = QLabel("Frame Selection:")
+        self.keyframes_mode_combo = QComboBox()
+        self.keyframes_mode_combo.addItem("Keyframes only (fast)", KEYFRAME_MODE_KEYFRAMES)
+        self.keyframes_mode_combo.addItem("Scene changes", KEYFRAME_MODE_SCENE)
+        self.keyframes_mode_combo.currentIndexChanged.connect(self.update_scene_threshold_enabled)
+
+        self.keyframes_scene_threshold_label = QLabel("Scene Threshold:")
+        self.keyframes_scene_threshold_spinbox = QDoubleSpinBox()
+        self.keyframes_scene_threshold_spinbox.setRange(0.01, 1.0)
+        self.keyframes_scene_threshold_spinbox.setSingleStep(0.05)
+        self.keyframes_scene_threshold_spinbox.setValue(DEFAULT_SCENE_THRESHOLD)
+        self.keyframes_scene_threshold_spinbox.setEnabled(False)
+
+        self.keyframes_max_size_label = QLabel("Max Size:")
+        self.keyframes_max_size_spinbox = QSpinBox()
+        self.keyframes_max_size_spinbox.setRange(0, 16384)
+        self.keyframes_max_size_spinbox.setSingleStep(64)
+        self.keyframes_max_size_spinbox.setSpecialValueText("Native")
+        self.keyframes_max_size_spinbox.setToolTip("Longest side of saved video frames (Native keeps the source resolution)")
+
+        self.keyframes_global_dedupe_checkbox = QCheckBox(
+            "Skip frames already extracted to this output folder (this batch and all previous runs)"
+        )
+
         self.keyframes_run_button = QPushButton("Extract Key Frames")
         self.keyframes_run_button.clicked.connect(self.run_keyframes_extraction)
 
+        self.keyframes_batch_folder_label = QLabel("Batch Folder (GIF/APNG/WebM/MP4/MKV):")
+        self.keyframes_batch_folder_lineedit = QLineEdit()
+        self.keyframes_batch_folder_browse_button = QPushButton("Browse Batch Folder")
+        self.keyframes_batch_folder_browse_button.clicked.connect(self.select_keyframes_batch_folder)
+
+        self.keyframes_jobs_label = QLabel("Parallel Jobs:")
+        self.keyframes_jobs_spinbox = QSpinBox()
+        self.keyframes_jobs_spinbox.setRange(1, os.cpu_count() or 1)
+        self.keyframes_jobs_spinbox.setValue(max(1, (os.cpu_count() or 1) // 2))
+
+        self.keyframes_batch_run_button = QPushButton("Extract Folder")
+        self.keyframes_batch_run_button.clicked.connect(self.run_batch_extraction)
+
+        self.keyframes_batch_cancel_button = QPushButton("Cancel")
+        self.keyframes_batch_cancel_button.setEnabled(False)
+        self.keyframes_batch_cancel_button.clicked.connect(self.cancel_batch_extraction)
+
+        self.keyframes_batch_progress_bar = QProgressBar()
+
         layout = QVBoxLayout()
         layout.addWidget(self.keyframes_video_path_label)
         hlayout_video = QHBoxLayout()
@@ -53,16 +100,46 @@ class KeyframesTab(QWidget):
         hlayout_output.addWidget(self.keyframes_output_folder_browse_button)
         layout.addLayout(hlayout_output)
 
+        hlayout_options = QHBoxLayout()
+        hlayout_options.addWidget(self.keyframes_mode_label)
+        hlayout_options.addWidget(self.keyframes_mode_combo)
+        hlayout_options.addWidget(self.keyframes_scene_threshold_label)
+        hlayout_options.addWidget(self.keyframes_scene_threshold_spinbox)
+        hlayout_options.addWidget(self.keyframes_max_size_label)
+        hlayout_options.addWidget(self.keyframes_max_size_spinbox)
+        layout.addLayout(hlayout_options)
+        layout.addWidget(self.keyframes_global_dedupe_checkbox)
+
         layout.addWidget(self.keyframes_run_button)
+
+        layout.addWidget(self.keyframes_batch_folder_label)
+        hlayout_batch = QHBoxLayout()
+        hlayout_batch.addWidget(self.keyframes_batch_folder_lineedit)
+        hlayout_batch.addWidget(self.keyframes_batch_folder_browse_button)
+        layout.addLayout(hlayout_batch)
+
+        hlayout_batch_run = QHBoxLayout()
+        hlayout_batch_run.addWidget(self.keyframes_jobs_label)
+        hlayout_batch_run.addWidget(self.keyframes_jobs_spinbox)
+        hlayout_batch_run.addWidget(self.keyframes_batch_run_button, 1)
+        hlayout_batch_run.addWidget(self.keyframes_batch_cancel_button)
+        layout.addLayout(hlayout_batch_run)
+        layout.addWidget(self.keyframes_batch_progress_bar)
         self.setLayout(layout)
 
+    def update_scene_threshold_enabled(self):
+        """Habilita el umbral solo en el modo de cambios de escena."""
+        self.keyframes_scene_threshold_spinbox.setEnabled(
+            self.keyframes_mode_combo.currentData() == KEYFRAME_MODE_SCENE
+        )
+
     def select_keyframes_video(self):
         """Selecciona el archivo de video."""
         video_file, _ = QFileDialog.getOpenFileName(
             self,
             "Select Video File",
             "",
-            "Video Files (*.gif *.webm)"
+            "Video Files (*.gif *.apng *.webm *.mp4 *.mkv)"
         )
         if video_file:
             self.keyframes_video_path_lineedit.setText(video_file)
@@ -75,6 +152,21 @@ class KeyframesTab(QWidget):
             self.keyframes_output_folder_lineedit.setText(folder)
             logger.info(f"Selected output folder: {folder}")
 
+    def select_keyframes_batch_folder(self):
+        """Selecciona la carpeta de videos del modo por lotes."""
+        folder = QFileDialog.getExistingDirectory(self, "Select Batch Folder")
+        if folder:
+            self.keyframes_batch_folder_lineedit.setText(folder)
+            logger.info(f"Selected batch folder: {folder}")
+
+    def extraction_options(self):
+        """Opciones de extracción de video elegidas en la interfaz."""
+        return {
+            'max_size': self.keyframes_max_size_spinbox.value() or None,
+            'mode': self.keyframes_mode_combo.currentData(),
+            'scene_threshold': self.keyframes_scene_threshold_spinbox.value(),
+        }
+
     def run_keyframes_extraction(self):
         """Ejecuta la extracción de keyframes."""
         video_path = self.keyframes_video_path_lineedit.text().strip()
@@ -95,29 +187,150 @@ class KeyframesTab(QWidget):
         ensure_dir(success_dir)
 
         ext = os.path.splitext(video_path)[1].lower()
-        try:
-            logger.info(f"Extracting keyframes from {video_path}")
-            if ext == ".gif":
-                extract_gif_frames(video_path, output_dir)
-            elif ext == ".webm":
-                extract_webm_key_frames(video_path, output_dir)
-            else:
-                QMessageBox.warning(
-                    self,
-                    "Error",
-                    "Unsupported video format. Only GIF and WEBM are supported."
-                )
-                return
-
-            # Mover el video original a la carpeta Success
-            shutil.move(video_path, os.path.join(success_dir, os.path.basename(video_path)))
-            QMessageBox.information(self, "Success", "Key frames extracted successfully.")
-            logger.info(f"Keyframes extracted successfully from {video_path}")
-        except FileNotFoundError:
-            error_msg = "FFmpeg not found. Please install FFmpeg to extract WebM keyframes."
+        if ext not in KEYFRAME_SOURCE_EXTENSIONS:
+            QMessageBox.warning(
+                self,
+                "Error",
+                "Unsupported video format. Only GIF, APNG, WEBM, MP4 and MKV are supported."
+            )
+            return
+
+        logger.info(f"Extracting keyframes from {video_path}")
+        job = get_job_manager().submit(
+            f"Extract keyframes from {os.path.basename(video_path)}",
+            extract_keyframes_job,
+            video_path,
+            output_dir,
+            success_dir,
+            self.keyframes_global_dedupe_checkbox.isChecked(),
+            self.extraction_options(),
+            job_type=JOB_TYPE_EXTERNAL,
+            cancellable=False
+        )
+        job.completed.connect(self.on_extraction_completed)
+        job.failed.connect(self.on_extraction_failed)
+
+    def on_extraction_completed(self, video_path):
+        """Avisa de que terminó la extracción de un video."""
+        QMessageBox.information(self, "Success", "Key frames extracted successfully.")
+        logger.info(f"Keyframes extracted successfully from {video_path}")
+
+    def on_extraction_failed(self, error):
+        """Muestra el error de la extracción de un video."""
+        if isinstance(error, JobCancelled):
+            return
+        if isinstance(error, FileNotFoundError):
+            error_msg = "FFmpeg not found. Please install FFmpeg to extract video keyframes."
             logger.error(error_msg)
             QMessageBox.critical(self, "Error", error_msg)
-        except Exception as e:
-            logger.error(f"Error extracting keyframes: {e}")
-            QMessageBox.critical(self, "Error", f"An error occurred: {str(e)}")
+        else:
+            QMessageBox.critical(self, "Error", f"An error occurred: {str(error)}")
+
+    def run_batch_extraction(self):
+        """Extrae en segundo plano los keyframes de todos los videos de una carpeta."""
+        batch_folder = self.keyframes_batch_folder_lineedit.text().strip()
+        output_folder = self.keyframes_output_folder_lineedit.text().strip()
+
+        if not batch_folder or not os.path.isdir(batch_folder):
+            QMessageBox.warning(self, "Error", "Please select a valid batch folder.")
+            return
+
+        if not output_folder:
+            QMessageBox.warning(self, "Error", "Please select an output folder.")
+            return
+
+        self.batch_job = get_job_manager().submit(
+            f"Extract keyframes from folder {os.path.basename(batch_folder)}",
+            extract_keyframes_batch_job,
+            batch_folder,
+            output_folder,
+            self.keyframes_jobs_spinbox.value(),
+            self.extraction_options(),
+            self.keyframes_global_dedupe_checkbox.isChecked(),
+            job_type=JOB_TYPE_EXTERNAL,
+            priority=PRIORITY_LOW
+        )
+        self.batch_job.progress.connect(self.on_batch_progress)
+        self.batch_job.completed.connect(self.on_batch_completed)
+        self.batch_job.failed.connect(self.on_batch_failed)
+
+        self.keyframes_batch_progress_bar.setValue(0)
+        self.keyframes_batch_run_button.setEnabled(False)
+        self.keyframes_batch_cancel_button.setEnabled(True)
+
+    def cancel_batch_extraction(self):
+        """Cancela el lote; las extracciones en curso terminan."""
+        if self.batch_job is not None:
+            self.batch_job.cancel()
+            self.keyframes_batch_cancel_button.setEnabled(False)
+            logger.info("Batch keyframe extraction cancel requested")
+
+    def on_batch_progress(self, done, total):
+        """Actualiza la barra de progreso del lote."""
+        self.keyframes_batch_progress_bar.setMaximum(total)
+        self.keyframes_batch_progress_bar.setValue(done)
+
+    def on_batch_completed(self, results):
+        """Muestra el resultado de un lote."""
+        self.reset_batch_controls()
+        message = (
+            f"Extracted {results['frames']} frames from {results['extracted']} files."
+        )
+        if results['cancelled']:
+            message = "Batch cancelled. " + message + " Run it again to resume."
+        if results['failed']:
+            message += (
+                f"\n{len(results['failed'])} files failed; they were left in place and "
+                f"listed in keyframes_failed.json."
+            )
+            QMessageBox.warning(self, "Batch Finished With Errors", message)
+        else:
+            QMessageBox.information(self, "Success", message)
+
+    def on_batch_failed(self, error):
+        """Muestra un error que detuvo el lote."""
+        self.reset_batch_controls()
+        if not isinstance(error, JobCancelled):
+            QMessageBox.critical(self, "Error", f"An error occurred: {str(error)}")
+
+    def reset_batch_controls(self):
+        """Restaura los botones al terminar el lote."""
+        self.keyframes_batch_run_button.setEnabled(True)
+        self.keyframes_batch_cancel_button.setEnabled(False)
+        self.batch_job = None
+
+
+def extract_keyframes_job(job, video_path, output_dir, success_dir, global_dedupe, options):
+    """
+    Trabajo del JobManager que extrae los keyframes de un video y lo mueve a Success.
+
+    Returns:
+        Ruta del video original
+    """
+    if global_dedupe:
+        with HashStore(output_dir, DEFAULT_CUTOFF - 1) as hash_store:
+            extract_keyframes(video_path, output_dir, hash_store=hash_store, **options)
+    else:
+        extract_keyframes(video_path, output_dir, **options)
+
+    # Mover el video original a la carpeta Success
+    shutil.move(video_path, os.path.join(success_dir, os.path.basename(video_path)))
+    return video_path
+
+
+def extract_keyframes_batch_job(job, source_folder, output_folder, max_jobs, options, global_dedupe=False):
+    """
+    Trabajo del JobManager que ejecuta extract_keyframes_batch.
 
+    Returns:
+        Resultados de extract_keyframes_batch
+    """
+    return extract_keyframes_batch(
+        source_folder,
+        output_folder,
+        max_jobs,
+        progress_callback=lambda done, total, name: job.report_progress(done, total),
+        cancel_event=job.cancel_event,
+        global_dedupe=global_dedupe,
+        **options
+    )
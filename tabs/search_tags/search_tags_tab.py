@@ -2,17 +2,19 @@
 Pestaña de búsqueda de tags en archivos.
 """
 import os
-import shutil
 import logging
 from PySide6.QtWidgets import (
     QWidget, QPushButton, QLineEdit, QTreeWidget, QTreeWidgetItem,
     QLabel, QFileDialog, QMessageBox, QVBoxLayout, QHBoxLayout, QCheckBox,
-    QSplitter, QTextEdit
+    QSplitter, QTextEdit, QComboBox
 )
 from PySide6.QtGui import QPixmap
 from PySide6.QtCore import Qt
 
-from utils.file_operations import find_files_with_phrase
+from core.job_manager import JOB_TYPE_CPU, JOB_TYPE_IO, PRIORITY_HIGH, JobCancelled, get_job_manager
+from utils.file_operations import (
+    copy_paired_files, delete_paired_files, find_files_with_phrase, move_paired_files
+)
 
 logger = logging.getLogger(__name__)
 
@@ -24,7 +26,9 @@ class SearchTagsTab(QWidget):
         super().__init__()
         self.folder_path = ""
         self.result_count = 0
+        self.search_job = None
         self.setup_ui()
+        self.load_output_formats()
 
     def setup_ui(self):
         """Configura la interfaz de usuario."""
@@ -55,8 +59,24 @@ class SearchTagsTab(QWidget):
         self.copy_button = QPushButton("Copy")
         self.copy_button.clicked.connect(self.copy_files)
 
-        self.convert_button = QPushButton("Convert to PNG")
-        self.convert_button.clicked.connect(self.convert_webp_to_png)
+        self.convert_button = QPushButton("Convert")
+        self.convert_button.setEnabled(False)
+        self.convert_button.clicked.connect(self.convert_images)
+
+        self.convert_source_combo = QComboBox()
+        self.convert_source_combo.addItem("From WebP/WebM", ('.webp', '.webm'))
+        self.convert_source_combo.addItem("From GIF", ('.gif',))
+        self.convert_source_combo.addItem("From JPEG", ('.jpg', '.jpeg'))
+        self.convert_source_combo.addItem("From PNG", ('.png',))
+        self.convert_source_combo.addItem("From AVIF", ('.avif',))
+        self.convert_source_combo.addItem("From Any Format", None)
+
+        # Se rellenan cuando termina load_output_formats
+        self.convert_format_combo = QComboBox()
+        self.convert_animated_combo = QComboBox()
+
+        self.convert_remove_source_checkbox = QCheckBox("Remove Source")
+        self.convert_rename_captions_checkbox = QCheckBox("Match Captions")
 
         self.search_subfolders = QCheckBox("Search in Subfolders")
 
@@ -96,6 +116,11 @@ class SearchTagsTab(QWidget):
 
         bottom_layout = QHBoxLayout()
         bottom_layout.addWidget(self.convert_button)
+        bottom_layout.addWidget(self.convert_source_combo)
+        bottom_layout.addWidget(self.convert_format_combo)
+        bottom_layout.addWidget(self.convert_animated_combo)
+        bottom_layout.addWidget(self.convert_remove_source_checkbox)
+        bottom_layout.addWidget(self.convert_rename_captions_checkbox)
         bottom_layout.addWidget(self.search_subfolders)
         bottom_layout.addWidget(self.show_text_checkbox)
 
@@ -134,15 +159,39 @@ class SearchTagsTab(QWidget):
             QMessageBox.warning(self, "No Folder Selected", "Please select a folder first.")
             return
 
-        files = find_files_with_phrase(
+        # Una búsqueda nueva sustituye a la anterior si aún no ha terminado
+        if self.search_job is not None and not self.search_job.finished:
+            self.search_job.cancel()
+
+        self.search_job = get_job_manager().submit(
+            f"Search '{self.search_entry.text()}' in {os.path.basename(self.folder_path)}",
+            file_operation_job,
+            find_files_with_phrase,
             self.folder_path,
             self.search_entry.text(),
-            self.search_subfolders.isChecked()
+            self.search_subfolders.isChecked(),
+            job_type=JOB_TYPE_IO,
+            priority=PRIORITY_HIGH,
+            cancellable=False
         )
+        self.search_job.completed.connect(self.on_search_completed)
+        self.search_job.failed.connect(self.on_job_failed)
+        self.result_label.setText("Searching...")
+
+    def on_search_completed(self, files):
+        """Muestra los archivos encontrados."""
+        if self.sender() is not self.search_job:
+            # Resultado de una búsqueda sustituida por otra más reciente
+            return
         self.update_treeview(files)
         self.result_count = len(files)
         self.result_label.setText(f"Results Found: {self.result_count}")
 
+    def on_job_failed(self, error):
+        """Muestra el error de un trabajo de la pestaña."""
+        if not isinstance(error, JobCancelled):
+            QMessageBox.critical(self, "Error", f"An error occurred: {str(error)}")
+
     def update_treeview(self, files):
         """Actualiza el árbol de archivos."""
         self.tree.clear()
@@ -191,21 +240,21 @@ class SearchTagsTab(QWidget):
             QMessageBox.Yes | QMessageBox.No
         )
         if reply == QMessageBox.Yes:
-            deleted_count = 0
-            for file_path in selected_files:
-                try:
-                    os.remove(file_path)
-                    for ext in ['.jpg', '.png']:
-                        img_file_path = os.path.splitext(file_path)[0] + ext
-                        if os.path.exists(img_file_path):
-                            os.remove(img_file_path)
-                    deleted_count += 1
-                    logger.info(f"Deleted file: {file_path}")
-                except Exception as e:
-                    logger.error(f"Error deleting {file_path}: {e}")
-
-            QMessageBox.information(self, "Delete Complete", f"{deleted_count} files deleted successfully.")
-            self.search()
+            job = get_job_manager().submit(
+                f"Delete {len(selected_files)} files",
+                file_operation_job,
+                delete_paired_files,
+                selected_files,
+                job_type=JOB_TYPE_IO,
+                cancellable=False
+            )
+            job.completed.connect(self.on_delete_completed)
+            job.failed.connect(self.on_job_failed)
+
+    def on_delete_completed(self, deleted_count):
+        """Avisa del borrado y repite la búsqueda."""
+        QMessageBox.information(self, "Delete Complete", f"{deleted_count} files deleted successfully.")
+        self.search()
 
     def move_files(self):
         """Mueve los archivos seleccionados a una nueva carpeta."""
@@ -218,24 +267,22 @@ class SearchTagsTab(QWidget):
         new_folder_name, ok = QInputDialog.getText(self, "New Folder", "Enter the name of the new folder:")
         if ok and new_folder_name:
             new_folder_path = os.path.join(self.folder_path, new_folder_name)
-            os.makedirs(new_folder_path, exist_ok=True)
-
-            moved_count = 0
-            for file_path in selected_files:
-                try:
-                    shutil.move(file_path, new_folder_path)
-                    for ext in ['.jpg', '.png']:
-                        img_file_path = os.path.splitext(file_path)[0] + ext
-                        if os.path.exists(img_file_path):
-                            shutil.move(img_file_path, new_folder_path)
-                            break
-                    moved_count += 1
-                    logger.info(f"Moved file: {file_path} to {new_folder_path}")
-                except Exception as e:
-                    logger.error(f"Error moving {file_path}: {e}")
-
-            QMessageBox.information(self, "Move Complete", f"{moved_count} files moved successfully.")
-            self.search()
+            job = get_job_manager().submit(
+                f"Move {len(selected_files)} files to {new_folder_name}",
+                file_operation_job,
+                move_paired_files,
+                selected_files,
+                new_folder_path,
+                job_type=JOB_TYPE_IO,
+                cancellable=False
+            )
+            job.completed.connect(self.on_move_completed)
+            job.failed.connect(self.on_job_failed)
+
+    def on_move_completed(self, moved_count):
+        """Avisa del movimiento y repite la búsqueda."""
+        QMessageBox.information(self, "Move Complete", f"{moved_count} files moved successfully.")
+        self.search()
 
     def copy_files(self):
         """Copia los archivos seleccionados a una nueva carpeta."""
@@ -248,33 +295,81 @@ class SearchTagsTab(QWidget):
         new_folder_name, ok = QInputDialog.getText(self, "New Folder", "Enter the name of the new folder:")
         if ok and new_folder_name:
             new_folder_path = os.path.join(self.folder_path, new_folder_name)
-            os.makedirs(new_folder_path, exist_ok=True)
-
-            copied_count = 0
-            for file_path in selected_files:
-                try:
-                    shutil.copy(file_path, new_folder_path)
-                    for ext in ['.jpg', '.png']:
-                        img_file_path = os.path.splitext(file_path)[0] + ext
-                        if os.path.exists(img_file_path):
-                            shutil.copy(img_file_path, new_folder_path)
-                            break
-                    copied_count += 1
-                    logger.info(f"Copied file: {file_path} to {new_folder_path}")
-                except Exception as e:
-                    logger.error(f"Error copying {file_path}: {e}")
-
-            QMessageBox.information(self, "Copy Complete", f"{copied_count} files copied successfully.")
-
-    def convert_webp_to_png(self):
-        """Convierte archivos WebP/WebM a PNG."""
+            job = get_job_manager().submit(
+                f"Copy {len(selected_files)} files to {new_folder_name}",
+                file_operation_job,
+                copy_paired_files,
+                selected_files,
+                new_folder_path,
+                job_type=JOB_TYPE_IO,
+                cancellable=False
+            )
+            job.completed.connect(self.on_copy_completed)
+            job.failed.connect(self.on_job_failed)
+
+    def on_copy_completed(self, copied_count):
+        """Avisa de la copia."""
+        QMessageBox.information(self, "Copy Complete", f"{copied_count} files copied successfully.")
+
+    def load_output_formats(self):
+        """
+        Consulta en segundo plano los formatos que puede escribir Pillow.
+
+        Es la primera pestaña que se muestra: así PIL y NumPy no se importan
+        antes de que aparezca la ventana.
+        """
+        job = get_job_manager().submit(
+            "Load image format support",
+            output_formats_job,
+            job_type=JOB_TYPE_IO,
+            priority=PRIORITY_HIGH,
+            cancellable=False
+        )
+        job.completed.connect(self.on_output_formats_loaded)
+        job.failed.connect(self.on_job_failed)
+
+    def on_output_formats_loaded(self, formats):
+        """Rellena las opciones de conversión y habilita Convert."""
+        from utils.format_conversion import ANIMATED_FIRST_FRAME, ANIMATED_ALL_FRAMES, ANIMATED_KEYFRAMES
+
+        self.convert_format_combo.addItems(formats)
+        self.convert_animated_combo.addItem("First Frame", ANIMATED_FIRST_FRAME)
+        self.convert_animated_combo.addItem("All Frames", ANIMATED_ALL_FRAMES)
+        self.convert_animated_combo.addItem("Keyframes", ANIMATED_KEYFRAMES)
+        self.convert_button.setEnabled(True)
+
+    def convert_images(self):
+        """Convierte las imágenes de la carpeta al formato seleccionado."""
         if not self.folder_path:
             QMessageBox.warning(self, "No Folder Selected", "Please select a folder first.")
             return
 
-        from utils.image_operations import convert_webp_to_png as convert_func
-        convert_func(self.folder_path)
-        QMessageBox.information(self, "Conversion Complete", "All .webp files have been converted to .png.")
+        target_format = self.convert_format_combo.currentText()
+        job = get_job_manager().submit(
+            f"Convert {os.path.basename(self.folder_path)} to {target_format}",
+            convert_images_job,
+            self.folder_path,
+            target_format,
+            source_extensions=self.convert_source_combo.currentData(),
+            animated=self.convert_animated_combo.currentData(),
+            remove_source=self.convert_remove_source_checkbox.isChecked(),
+            rename_captions=self.convert_rename_captions_checkbox.isChecked(),
+            job_type=JOB_TYPE_CPU
+        )
+        job.completed.connect(self.on_convert_completed)
+        job.failed.connect(self.on_job_failed)
+
+    def on_convert_completed(self, result):
+        """Muestra el resumen de la conversión."""
+        target_format, summary = result
+        message = (
+            f"Converted {summary['converted']} files to {target_format}.\n"
+            f"Skipped: {summary['skipped']}, failed: {summary['failed']}."
+        )
+        if summary['cancelled']:
+            QMessageBox.information(self, "Conversion Cancelled", "Conversion cancelled. " + message)
+        else:
+            QMessageBox.information(self, "Conversion Complete", message)
 
     def display_image_preview(self, item):
         """Muestra la previsualización de la imagen."""
@@ -326,3 +421,38 @@ class SearchTagsTab(QWidget):
         if selected_items:
             self.display_image_preview(selected_items[0])
 
+
+def file_operation_job(job, operation, *args):
+    """
+    Trabajo del JobManager que ejecuta una operación de archivos de utils.
+
+    Returns:
+        El resultado de la operación
+    """
+    return operation(*args)
+
+
+def output_formats_job(job):
+    """
+    Trabajo del JobManager que importa la conversión de formatos.
+
+    Returns:
+        Lista de formatos de salida disponibles
+    """
+    from utils.format_conversion import available_output_formats
+
+    return available_output_formats()
+
+
+def convert_images_job(job, folder, target_format, **options):
+    """
+    Trabajo del JobManager que convierte las imágenes de una carpeta.
+
+    Returns:
+        Tupla (formato destino, resumen de convert_images)
+    """
+    from utils.format_conversion import convert_images
+
+    return target_format, convert_images(
+        folder, target_format, max_workers=job.max_workers, cancel_event=job.cancel_event, **options
+    )
@@ -6,17 +6,32 @@ import subprocess
 import logging
 from PySide6.QtWidgets import (
     QWidget, QPushButton, QLineEdit, QLabel, QVBoxLayout, QHBoxLayout,
-    QCheckBox, QFileDialog, QMessageBox
+    QCheckBox, QFileDialog, QMessageBox, QComboBox, QSpinBox, QDoubleSpinBox, QProgressBar
+)
+
+from core.job_manager import (
+    JOB_TYPE_CPU, JOB_TYPE_EXTERNAL, JOB_TYPE_INFERENCE, PRIORITY_LOW, JobCancelled, get_job_manager
+)
+from utils.process_runner import format_eta, run_with_progress
+from utils.tag_probabilities import rethreshold_captions
+from utils.tagger import (
+    DEFAULT_BATCH_SIZE, DEFAULT_CHARACTER_THRESHOLD, DEFAULT_GENERAL_THRESHOLD, DEFAULT_LOADER_WORKERS,
+    DEFAULT_TAGGER_REPO, TAG_CACHE_FILE, get_tagger_service, list_images_to_tag, resolve_tagger_model
 )
 
 logger = logging.getLogger(__name__)
 
+# Motores de tagging
+TAGGER_BACKEND_ONNX = 'onnx'
+TAGGER_BACKEND_SD_SCRIPTS = 'sd-scripts'
+
 
 class TagImagesTab(QWidget):
     """Pestaña para etiquetar imágenes usando modelos de tagging."""
 
     def __init__(self):
         super().__init__()
+        self.job = None
         self.setup_ui()
 
     def setup_ui(self):
@@ -34,10 +49,66 @@ class TagImagesTab(QWidget):
 
         self.recursive_checkbox = QCheckBox("Recursive")
         self.force_download_checkbox = QCheckBox("Force Model Re-download")
+        self.skip_captioned_checkbox = QCheckBox("Skip images with an up-to-date caption")
+        self.skip_captioned_checkbox.setChecked(True)
+        self.tag_cache_checkbox = QCheckBox("Reuse tags of identical images (content cache)")
+        self.tag_cache_checkbox.setChecked(True)
+        self.store_probabilities_checkbox = QCheckBox("Store probabilities for re-thresholding")
+        self.store_probabilities_checkbox.setChecked(True)
+
+        self.backend_label = QLabel("Tagger Backend:")
+        self.backend_combo = QComboBox()
+        self.backend_combo.addItem("ONNX (model stays loaded)", TAGGER_BACKEND_ONNX)
+        self.backend_combo.addItem("sd-scripts (accelerate)", TAGGER_BACKEND_SD_SCRIPTS)
+        self.backend_combo.currentIndexChanged.connect(self.update_incremental_options_enabled)
+
+        self.model_label = QLabel("Model (Hugging Face repo or local folder):")
+        self.model_lineedit = QLineEdit(DEFAULT_TAGGER_REPO)
+        self.model_browse_button = QPushButton("Browse Model Folder")
+        self.model_browse_button.clicked.connect(self.select_model_folder)
+
+        self.batch_size_label = QLabel("Batch Size:")
+        self.batch_size_spinbox = QSpinBox()
+        self.batch_size_spinbox.setRange(1, 256)
+        self.batch_size_spinbox.setValue(DEFAULT_BATCH_SIZE)
+
+        self.loader_workers_label = QLabel("Loader Workers:")
+        self.loader_workers_spinbox = QSpinBox()
+        self.loader_workers_spinbox.setRange(1, os.cpu_count() or 1)
+        self.loader_workers_spinbox.setValue(min(DEFAULT_LOADER_WORKERS, os.cpu_count() or 1))
+
+        self.general_threshold_label = QLabel("General Threshold:")
+        self.general_threshold_spinbox = QDoubleSpinBox()
+        self.general_threshold_spinbox.setRange(0.0, 1.0)
+        self.general_threshold_spinbox.setSingleStep(0.05)
+        self.general_threshold_spinbox.setValue(DEFAULT_GENERAL_THRESHOLD)
+
+        self.character_threshold_label = QLabel("Character Threshold:")
+        self.character_threshold_spinbox = QDoubleSpinBox()
+        self.character_threshold_spinbox.setRange(0.0, 1.0)
+        self.character_threshold_spinbox.setSingleStep(0.05)
+        self.character_threshold_spinbox.setValue(DEFAULT_CHARACTER_THRESHOLD)
+
+        self.top_k_label = QLabel("Max General Tags:")
+        self.top_k_spinbox = QSpinBox()
+        self.top_k_spinbox.setRange(0, 500)
+        self.top_k_spinbox.setSpecialValueText("No limit")
 
         self.tag_images_run_button = QPushButton("Tag Images")
         self.tag_images_run_button.clicked.connect(self.tag_images)
 
+        self.tag_images_cancel_button = QPushButton("Cancel")
+        self.tag_images_cancel_button.setEnabled(False)
+        self.tag_images_cancel_button.clicked.connect(self.cancel_tagging)
+
+        self.rethreshold_button = QPushButton("Re-threshold Captions")
+        self.rethreshold_button.setToolTip(
+            "Rewrite the captions from the stored probabilities with the current thresholds, without running the model"
+        )
+        self.rethreshold_button.clicked.connect(self.rethreshold)
+
+        self.tag_images_progress_bar = QProgressBar()
+
         layout = QVBoxLayout()
         layout.addWidget(self.tag_images_folder_label)
         hlayout_folder = QHBoxLayout()
@@ -51,7 +122,40 @@ class TagImagesTab(QWidget):
         layout.addWidget(self.caption_separator_lineedit)
         layout.addWidget(self.recursive_checkbox)
         layout.addWidget(self.force_download_checkbox)
-        layout.addWidget(self.tag_images_run_button)
+        layout.addWidget(self.skip_captioned_checkbox)
+        layout.addWidget(self.tag_cache_checkbox)
+        layout.addWidget(self.store_probabilities_checkbox)
+
+        layout.addWidget(self.model_label)
+        hlayout_model = QHBoxLayout()
+        hlayout_model.addWidget(self.model_lineedit)
+        hlayout_model.addWidget(self.model_browse_button)
+        layout.addLayout(hlayout_model)
+
+        hlayout_options = QHBoxLayout()
+        hlayout_options.addWidget(self.backend_label)
+        hlayout_options.addWidget(self.backend_combo)
+        hlayout_options.addWidget(self.batch_size_label)
+        hlayout_options.addWidget(self.batch_size_spinbox)
+        hlayout_options.addWidget(self.loader_workers_label)
+        hlayout_options.addWidget(self.loader_workers_spinbox)
+        layout.addLayout(hlayout_options)
+
+        hlayout_thresholds = QHBoxLayout()
+        hlayout_thresholds.addWidget(self.general_threshold_label)
+        hlayout_thresholds.addWidget(self.general_threshold_spinbox)
+        hlayout_thresholds.addWidget(self.character_threshold_label)
+        hlayout_thresholds.addWidget(self.character_threshold_spinbox)
+        hlayout_thresholds.addWidget(self.top_k_label)
+        hlayout_thresholds.addWidget(self.top_k_spinbox)
+        layout.addLayout(hlayout_thresholds)
+
+        hlayout_run = QHBoxLayout()
+        hlayout_run.addWidget(self.tag_images_run_button, 1)
+        hlayout_run.addWidget(self.rethreshold_button)
+        hlayout_run.addWidget(self.tag_images_cancel_button)
+        layout.addLayout(hlayout_run)
+        layout.addWidget(self.tag_images_progress_bar)
         self.setLayout(layout)
 
     def select_tag_images_folder(self):
@@ -61,17 +165,158 @@ class TagImagesTab(QWidget):
             self.tag_images_folder_lineedit.setText(folder)
             logger.info(f"Selected images folder: {folder}")
 
+    def select_model_folder(self):
+        """Selecciona una carpeta local con model.onnx y selected_tags.csv."""
+        folder = QFileDialog.getExistingDirectory(self, "Select Model Folder")
+        if folder:
+            self.model_lineedit.setText(folder)
+            logger.info(f"Selected tagger model folder: {folder}")
+
+    def update_incremental_options_enabled(self):
+        """sd-scripts siempre etiqueta la carpeta completa y no admite top-k."""
+        onnx = self.backend_combo.currentData() == TAGGER_BACKEND_ONNX
+        self.skip_captioned_checkbox.setEnabled(onnx)
+        self.tag_cache_checkbox.setEnabled(onnx)
+        self.store_probabilities_checkbox.setEnabled(onnx)
+        self.top_k_spinbox.setEnabled(onnx)
+
     def tag_images(self):
         """Ejecuta el proceso de etiquetado de imágenes."""
         folder = self.tag_images_folder_lineedit.text().strip()
+
+        if not folder or not os.path.exists(folder):
+            QMessageBox.warning(self, "Error", "Please select a valid images folder.")
+            return
+
+        if self.backend_combo.currentData() == TAGGER_BACKEND_ONNX:
+            self.run_onnx_tagger(folder)
+        else:
+            self.run_sd_scripts_tagger(folder)
+
+    def run_onnx_tagger(self, folder):
+        """Etiqueta en segundo plano con el servicio ONNX persistente."""
+        model = self.model_lineedit.text().strip() or DEFAULT_TAGGER_REPO
+        self.job = get_job_manager().submit(
+            f"Tag images in {os.path.basename(folder)}",
+            tag_folder_job,
+            model,
+            self.force_download_checkbox.isChecked(),
+            folder,
+            self.recursive_checkbox.isChecked(),
+            self.skip_captioned_checkbox.isChecked(),
+            {
+                'caption_extension': self.caption_extension_lineedit.text().strip(),
+                'caption_separator': self.caption_separator_lineedit.text().strip(),
+                'batch_size': self.batch_size_spinbox.value(),
+                'num_workers': self.loader_workers_spinbox.value(),
+                'general_threshold': self.general_threshold_spinbox.value(),
+                'character_threshold': self.character_threshold_spinbox.value(),
+                'top_k': self.top_k_spinbox.value() or None,
+                'tag_cache': (
+                    os.path.join(folder, TAG_CACHE_FILE) if self.tag_cache_checkbox.isChecked() else None
+                ),
+                'probability_dir': folder if self.store_probabilities_checkbox.isChecked() else None,
+            },
+            job_type=JOB_TYPE_INFERENCE,
+            priority=PRIORITY_LOW
+        )
+        self.job.progress.connect(self.on_tagging_progress)
+        self.job.completed.connect(self.on_tagging_completed)
+        self.job.failed.connect(self.on_tagging_failed)
+
+        self.tag_images_progress_bar.setValue(0)
+        self.tag_images_run_button.setEnabled(False)
+        self.rethreshold_button.setEnabled(False)
+        self.tag_images_cancel_button.setEnabled(True)
+
+    def rethreshold(self):
+        """Reescribe los captions desde las probabilidades guardadas con los umbrales actuales."""
+        folder = self.tag_images_folder_lineedit.text().strip()
+        if not folder or not os.path.exists(folder):
+            QMessageBox.warning(self, "Error", "Please select a valid images folder.")
+            return
+
+        self.job = get_job_manager().submit(
+            f"Re-threshold captions in {os.path.basename(folder)}",
+            rethreshold_job,
+            folder,
+            self.general_threshold_spinbox.value(),
+            self.character_threshold_spinbox.value(),
+            self.top_k_spinbox.value() or None,
+            self.caption_extension_lineedit.text().strip(),
+            self.caption_separator_lineedit.text().strip(),
+            job_type=JOB_TYPE_CPU,
+            cancellable=False
+        )
+        self.job.progress.connect(self.on_tagging_progress)
+        self.job.completed.connect(self.on_rethreshold_completed)
+        self.job.failed.connect(self.on_tagging_failed)
+
+        self.tag_images_progress_bar.setValue(0)
+        self.tag_images_run_button.setEnabled(False)
+        self.rethreshold_button.setEnabled(False)
+
+    def on_rethreshold_completed(self, summary):
+        """Muestra el resultado del re-umbralizado."""
+        self.reset_tagging_controls()
+        message = f"Rewrote {summary['written']} captions from stored probabilities."
+        if summary['missing']:
+            message += f" {summary['missing']} images no longer exist."
+        QMessageBox.information(self, "Success", message)
+
+    def cancel_tagging(self):
+        """Cancela el etiquetado (ONNX al terminar el lote en curso, sd-scripts terminando el proceso)."""
+        if self.job is not None:
+            self.job.cancel()
+            self.tag_images_cancel_button.setEnabled(False)
+            logger.info("Image tagging cancel requested")
+
+    def on_tagging_progress(self, done, total):
+        """Actualiza la barra de progreso."""
+        self.tag_images_progress_bar.setMaximum(total)
+        self.tag_images_progress_bar.setValue(done)
+
+    def on_tagging_completed(self, summary):
+        """Muestra el resultado del etiquetado."""
+        self.reset_tagging_controls()
+        message = (
+            f"Tagged {summary['tagged']} images, {summary['cached']} from the tag cache. "
+            f"Skipped {summary['skipped']} images with up-to-date captions."
+        )
+        if summary['cancelled']:
+            message = "Tagging cancelled. " + message
+        if summary['failed']:
+            message += f"\n{len(summary['failed'])} images could not be read (see the log)."
+            QMessageBox.warning(self, "Tagging Finished With Errors", message)
+        else:
+            QMessageBox.information(self, "Success", message)
+
+    def on_tagging_failed(self, error):
+        """Muestra un error que detuvo el etiquetado."""
+        self.reset_tagging_controls()
+        if not isinstance(error, JobCancelled):
+            QMessageBox.critical(self, "Error", f"An error occurred while tagging images: {str(error)}")
+
+    def reset_tagging_controls(self):
+        """Restaura los botones al terminar el etiquetado."""
+        self.tag_images_run_button.setEnabled(True)
+        self.rethreshold_button.setEnabled(True)
+        self.tag_images_cancel_button.setEnabled(False)
+        self.tag_images_progress_bar.setFormat("%p%")
+        self.job = None
+
+    def run_sd_scripts_tagger(self, folder):
+        """Etiqueta con el script de sd-scripts a través de accelerate."""
         caption_extension = self.caption_extension_lineedit.text().strip()
         caption_separator = self.caption_separator_lineedit.text().strip()
         recursive = self.recursive_checkbox.isChecked()
         force_download = self.force_download_checkbox.isChecked()
-        repo_id = "SmilingWolf/wd-eva02-large-tagger-v3"
+        repo_id = self.model_lineedit.text().strip() or DEFAULT_TAGGER_REPO
 
-        if not folder or not os.path.exists(folder):
-            QMessageBox.warning(self, "Error", "Please select a valid images folder.")
+        if os.path.isdir(repo_id):
+            QMessageBox.warning(
+                self, "Error", "The sd-scripts backend needs a Hugging Face repo id, not a local folder."
+            )
             return
 
         # Buscar el script de tagging
@@ -95,8 +340,10 @@ class TagImagesTab(QWidget):
             "--repo_id", repo_id,
             "--caption_extension", caption_extension,
             "--caption_separator", caption_separator,
-            "--batch_size", "1",
-            "--max_data_loader_n_workers", "1"
+            "--batch_size", str(self.batch_size_spinbox.value()),
+            "--max_data_loader_n_workers", str(self.loader_workers_spinbox.value()),
+            "--general_threshold", str(self.general_threshold_spinbox.value()),
+            "--character_threshold", str(self.character_threshold_spinbox.value())
         ]
         if recursive:
             run_cmd.append("--recursive")
@@ -104,21 +351,108 @@ class TagImagesTab(QWidget):
             run_cmd.append("--force_download")
         run_cmd.append(folder)
 
-        try:
-            logger.info(f"Starting image tagging for folder: {folder}")
-            logger.debug(f"Command: {' '.join(run_cmd)}")
-            subprocess.run(run_cmd, check=True)
-            QMessageBox.information(self, "Success", "Images have been tagged successfully.")
+        logger.info(f"Starting image tagging for folder: {folder}")
+        logger.debug(f"Command: {' '.join(run_cmd)}")
+        self.job = get_job_manager().submit(
+            f"Tag images in {os.path.basename(folder)} (sd-scripts)",
+            sd_scripts_tagger_job,
+            run_cmd,
+            job_type=JOB_TYPE_EXTERNAL,
+            priority=PRIORITY_LOW
+        )
+        self.job.progress.connect(self.on_tagging_progress)
+        self.job.status.connect(self.on_sd_scripts_status)
+        self.job.completed.connect(self.on_sd_scripts_completed)
+        self.job.failed.connect(self.on_tagging_failed)
+
+        self.tag_images_progress_bar.setValue(0)
+        self.tag_images_progress_bar.setMaximum(0)
+        self.tag_images_progress_bar.setFormat("Starting...")
+        self.tag_images_run_button.setEnabled(False)
+        self.rethreshold_button.setEnabled(False)
+        self.tag_images_cancel_button.setEnabled(True)
+
+    def on_sd_scripts_status(self, text):
+        """Muestra la velocidad y el tiempo restante de sd-scripts en la barra de progreso."""
+        self.tag_images_progress_bar.setFormat(f"%v/%m ({text})")
+
+    def on_sd_scripts_completed(self, finished):
+        """Muestra el resultado del etiquetado con sd-scripts."""
+        self.reset_tagging_controls()
+        if finished:
             logger.info("Image tagging completed successfully")
-        except subprocess.CalledProcessError as e:
-            error_msg = f"Tagging process failed with exit code {e.returncode}"
-            logger.error(error_msg)
-            QMessageBox.critical(self, "Error", f"An error occurred while tagging images: {error_msg}")
-        except FileNotFoundError:
-            error_msg = "accelerate command not found. Please install accelerate."
-            logger.error(error_msg)
-            QMessageBox.critical(self, "Error", error_msg)
-        except Exception as e:
-            logger.error(f"Error tagging images: {e}")
-            QMessageBox.critical(self, "Error", f"An error occurred while tagging images: {str(e)}")
+            QMessageBox.information(self, "Success", "Images have been tagged successfully.")
+        else:
+            QMessageBox.information(self, "Cancelled", "Tagging cancelled; captions written so far were kept.")
+
+
+def tag_folder_job(job, model, force_download, folder, recursive, skip_captioned, options):
+    """
+    Trabajo del JobManager que envía una carpeta al servicio de tagging.
+
+    Returns:
+        Resumen de TaggerService.tag con 'skipped' (imágenes ya etiquetadas)
+    """
+    service = get_tagger_service(*resolve_tagger_model(model, force_download))
+    paths, skipped = list_images_to_tag(folder, recursive, options['caption_extension'], skip_captioned)
+    logger.info(f"Tagging {len(paths)} images in {folder} ({skipped} already captioned)")
+    summary = service.tag(
+        paths,
+        progress_callback=job.report_progress,
+        cancel_event=job.cancel_event,
+        **options
+    )
+    summary['skipped'] = skipped
+    logger.info(
+        f"Tagging finished: {summary['tagged']} tagged, {summary['cached']} cached, "
+        f"{len(summary['failed'])} failed"
+    )
+    return summary
+
+
+def rethreshold_job(job, folder, general_threshold, character_threshold, top_k, caption_extension, caption_separator):
+    """
+    Trabajo del JobManager que regenera los captions desde las probabilidades guardadas.
+
+    Returns:
+        Resumen de rethreshold_captions
+    """
+    return rethreshold_captions(
+        folder,
+        general_threshold,
+        character_threshold,
+        top_k,
+        caption_extension,
+        caption_separator,
+        progress_callback=job.report_progress
+    )
+
+
+def sd_scripts_tagger_job(job, cmd):
+    """
+    Trabajo del JobManager que ejecuta el tagger de sd-scripts.
+
+    La barra de tqdm del script se traduce en progreso y en un estado con
+    velocidad y tiempo restante; cancelar termina todo el árbol de procesos.
+
+    Returns:
+        True si terminó, False si se canceló
+
+    Raises:
+        RuntimeError: Si accelerate no está instalado o el script falla
+    """
+    def report(done, total, rate, eta):
+        job.report_progress(done, total)
+        job.report_status(f"{rate:.2f} it/s, ETA {format_eta(eta)}" if eta is not None else f"{rate:.2f} it/s")
 
+    try:
+        return run_with_progress(
+            cmd,
+            progress_callback=report,
+            output_callback=lambda line: logger.info(f"sd-scripts: {line}"),
+            cancel_event=job.cancel_event
+        )
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Tagging process failed with exit code {e.returncode}\n\n{e.output}") from e
+    except FileNotFoundError as e:
+        raise RuntimeError("accelerate command not found. Please install accelerate.") from e
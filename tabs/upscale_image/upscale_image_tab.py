@@ -1,13 +1,18 @@
 """
 Pestaña para redimensionar imágenes.
 """
+import os
 import logging
 from PySide6.QtWidgets import (
-    QWidget, QPushButton, QLineEdit, QVBoxLayout, QCheckBox,
-    QFileDialog, QMessageBox
+    QWidget, QPushButton, QLineEdit, QVBoxLayout, QHBoxLayout, QCheckBox,
+    QFileDialog, QMessageBox, QLabel, QSpinBox
 )
 
+from core.job_manager import JOB_TYPE_CPU, JOB_TYPE_INFERENCE, JobCancelled, get_job_manager
 from utils.image_operations import resize_images, add_white_background_to_images
+from utils.super_resolution import (
+    DEFAULT_TILE_SIZE, DEFAULT_TILE_OVERLAP, SuperResolutionUpscaler
+)
 
 logger = logging.getLogger(__name__)
 
@@ -30,6 +35,15 @@ class UpscaleImageTab(QWidget):
 
         self.add_white_bg_checkbox = QCheckBox("Add White Background to PNGs")
 
+        self.sr_model_lineedit = QLineEdit()
+        self.sr_model_lineedit.setPlaceholderText("Super-resolution ONNX model (empty = LANCZOS)")
+        self.sr_model_browse_button = QPushButton("Browse Model")
+        self.sr_model_browse_button.clicked.connect(self.select_sr_model)
+
+        self.sr_tile_size_spinbox = QSpinBox()
+        self.sr_tile_size_spinbox.setRange(32, 2048)
+        self.sr_tile_size_spinbox.setValue(DEFAULT_TILE_SIZE)
+
         self.upscale_button = QPushButton("Upscale Images")
         self.upscale_button.clicked.connect(self.upscale_images)
 
@@ -40,6 +54,12 @@ class UpscaleImageTab(QWidget):
         layout.addWidget(self.upscale_select_folder_button)
         layout.addWidget(self.resolution_entry)
         layout.addWidget(self.add_white_bg_checkbox)
+        hlayout_model = QHBoxLayout()
+        hlayout_model.addWidget(self.sr_model_lineedit)
+        hlayout_model.addWidget(self.sr_model_browse_button)
+        hlayout_model.addWidget(QLabel("Tile Size:"))
+        hlayout_model.addWidget(self.sr_tile_size_spinbox)
+        layout.addLayout(hlayout_model)
         layout.addWidget(self.upscale_button)
         layout.addWidget(self.add_white_background_button)
 
@@ -52,6 +72,18 @@ class UpscaleImageTab(QWidget):
             self.upscale_folder_path = folder_selected
             logger.info(f"Selected folder for upscale: {folder_selected}")
 
+    def select_sr_model(self):
+        """Selecciona el modelo ONNX de super-resolución."""
+        model_file, _ = QFileDialog.getOpenFileName(
+            self,
+            "Select Super-Resolution Model",
+            "",
+            "ONNX Models (*.onnx)"
+        )
+        if model_file:
+            self.sr_model_lineedit.setText(model_file)
+            logger.info(f"Selected super-resolution model: {model_file}")
+
     def upscale_images(self):
         """Redimensiona las imágenes."""
         if not self.upscale_folder_path:
@@ -75,14 +107,39 @@ class UpscaleImageTab(QWidget):
             return
 
         add_white_bg = self.add_white_bg_checkbox.isChecked()
-
-        try:
-            resize_images(self.upscale_folder_path, resolution, add_white_bg)
-            QMessageBox.information(self, "Upscale Complete", "Images have been upscaled successfully.")
-            logger.info(f"Upscaled images in {self.upscale_folder_path} to {resolution}")
-        except Exception as e:
-            logger.error(f"Error upscaling images: {e}")
-            QMessageBox.critical(self, "Error", f"An error occurred: {str(e)}")
+        model_path = self.sr_model_lineedit.text().strip()
+
+        logger.info(f"Upscaling images in {self.upscale_folder_path} to {resolution}")
+        job = get_job_manager().submit(
+            f"Upscale {os.path.basename(self.upscale_folder_path)} to {width}x{height}",
+            upscale_images_job,
+            self.upscale_folder_path,
+            resolution,
+            add_white_bg,
+            model_path,
+            self.sr_tile_size_spinbox.value(),
+            job_type=JOB_TYPE_INFERENCE if model_path else JOB_TYPE_CPU
+        )
+        job.completed.connect(self.on_upscale_completed)
+        job.failed.connect(self.on_job_failed)
+
+    def on_upscale_completed(self, result):
+        """Muestra el resultado del redimensionado."""
+        folder, resolution, upscaler, processed_count, cancelled = result
+        if cancelled:
+            message = (
+                f"Upscale cancelled after {processed_count} images.\n"
+                "Run it again to continue where it stopped."
+            )
+        else:
+            message = "Images have been upscaled successfully."
+        if upscaler is not None and upscaler.tiles_processed:
+            message += (
+                f"\nSuper-resolution: {upscaler.tiles_processed} tiles "
+                f"at {upscaler.tiles_per_second:.1f} tiles/s."
+            )
+        QMessageBox.information(self, "Upscale Cancelled" if cancelled else "Upscale Complete", message)
+        logger.info(f"Upscaled {processed_count} images in {folder} to {resolution}")
 
     def add_white_background(self):
         """Añade fondo blanco a imágenes PNG con transparencia."""
@@ -90,11 +147,64 @@ class UpscaleImageTab(QWidget):
             QMessageBox.warning(self, "No Folder Selected", "Please select a folder first.")
             return
 
-        try:
-            add_white_background_to_images(self.upscale_folder_path)
+        job = get_job_manager().submit(
+            f"Add white background in {os.path.basename(self.upscale_folder_path)}",
+            white_background_job,
+            self.upscale_folder_path,
+            job_type=JOB_TYPE_CPU
+        )
+        job.completed.connect(self.on_white_background_completed)
+        job.failed.connect(self.on_job_failed)
+
+    def on_white_background_completed(self, result):
+        """Avisa de que terminó el fondo blanco."""
+        folder, processed_count, cancelled = result
+        if cancelled:
+            QMessageBox.information(
+                self,
+                "Process Cancelled",
+                f"White background cancelled after {processed_count} PNG images.\n"
+                "Run it again to continue where it stopped."
+            )
+        else:
             QMessageBox.information(self, "Process Complete", "White background added to PNG images.")
-            logger.info(f"Added white background to PNGs in {self.upscale_folder_path}")
-        except Exception as e:
-            logger.error(f"Error adding white background: {e}")
-            QMessageBox.critical(self, "Error", f"An error occurred: {str(e)}")
-
+        logger.info(f"Added white background to {processed_count} PNGs in {folder}")
+
+    def on_job_failed(self, error):
+        """Muestra el error de un trabajo de la pestaña."""
+        if not isinstance(error, JobCancelled):
+            QMessageBox.critical(self, "Error", f"An error occurred: {str(error)}")
+
+
+def upscale_images_job(job, folder, resolution, add_white_bg, model_path, tile_size):
+    """
+    Trabajo del JobManager que redimensiona una carpeta, con super-resolución si hay modelo.
+
+    Returns:
+        Tupla (carpeta, resolución, SuperResolutionUpscaler o None, imágenes procesadas, cancelado)
+    """
+    upscaler = None
+    if model_path:
+        upscaler = SuperResolutionUpscaler(model_path, tile_size=tile_size, overlap=DEFAULT_TILE_OVERLAP)
+    processed_count = resize_images(
+        folder,
+        resolution,
+        add_white_bg,
+        max_workers=job.max_workers,
+        upscaler=upscaler,
+        cancel_event=job.cancel_event
+    )
+    return folder, resolution, upscaler, processed_count, job.cancel_event.is_set()
+
+
+def white_background_job(job, folder):
+    """
+    Trabajo del JobManager que añade fondo blanco a los PNG de una carpeta.
+
+    Returns:
+        Tupla (carpeta, imágenes modificadas, cancelado)
+    """
+    processed_count = add_white_background_to_images(
+        folder, max_workers=job.max_workers, cancel_event=job.cancel_event
+    )
+    return folder, processed_count, job.cancel_event.is_set()
@@ -0,0 +1,243 @@
+"""
+Lectura en caché, fusión por tags y templates precompilados de captions.
+"""
+import os
+import re
+import logging
+from string import Formatter
+
+logger = logging.getLogger(__name__)
+
+# Modos de fusión de captions
+CAPTION_MODE_TEXT = 'text'
+CAPTION_MODE_TAGS = 'tags'
+CAPTION_MODES = (CAPTION_MODE_TEXT, CAPTION_MODE_TAGS)
+
+# Separador de tags al escribir
+TAG_SEPARATOR = ", "
+
+_TAG_SPLIT = re.compile(r'[,\n]')
+_DIR_FIELD = re.compile(r'description_dir_(\d+)$|tags_dir_(\d+)$')
+
+
+def parse_tags(text):
+    """
+    Separa un caption en tags sin duplicados, conservando el orden.
+
+    Args:
+        text: Contenido del caption (tags separados por comas o líneas)
+
+    Returns:
+        Tupla de tags
+    """
+    seen = set()
+    tags = []
+    for tag in _TAG_SPLIT.split(text):
+        tag = tag.strip()
+        if tag and tag not in seen:
+            seen.add(tag)
+            tags.append(tag)
+    return tuple(tags)
+
+
+def write_caption(image_path, tags, caption_extension='.txt', caption_separator=TAG_SEPARATOR):
+    """
+    Escribe el caption de una imagen a partir de sus tags.
+
+    Args:
+        image_path: Ruta de la imagen
+        tags: Lista de tags
+        caption_extension: Extensión del caption
+        caption_separator: Separador entre tags
+    """
+    caption_path = os.path.splitext(image_path)[0] + caption_extension
+    with open(caption_path, 'w', encoding='utf-8') as f:
+        f.write(caption_separator.join(tags))
+
+
+class CaptionCache:
+    """
+    Captions de un directorio leídos una sola vez.
+
+    El directorio se recorre una vez con os.scandir y cada caption se lee y
+    se separa en tags al construir la caché, así que las consultas
+    posteriores no tocan el disco.
+    """
+
+    def __init__(self, directory, stems=None):
+        """
+        Args:
+            directory: Directorio de los captions
+            stems: Nombres (sin extensión) que interesan; None carga todos
+        """
+        self.directory = directory
+        self._texts = {}
+        self._tags = {}
+
+        wanted = set(stems) if stems is not None else None
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                stem, ext = os.path.splitext(entry.name)
+                if ext != '.txt' or (wanted is not None and stem not in wanted):
+                    continue
+                try:
+                    with open(entry.path, 'r', encoding='utf-8') as f:
+                        text = f.read()
+                except (OSError, UnicodeDecodeError) as e:
+                    logger.warning(f"Error reading caption {entry.path}: {e}")
+                    continue
+                self._texts[stem] = text
+                self._tags[stem] = parse_tags(text)
+
+        logger.debug(f"Loaded {len(self._texts)} captions from {directory}")
+
+    def __len__(self):
+        return len(self._texts)
+
+    def text(self, stem):
+        """Devuelve el caption en bruto ('' si no existe)."""
+        return self._texts.get(stem, "")
+
+    def tags(self, stem):
+        """Devuelve los tags del caption (tupla vacía si no existe)."""
+        return self._tags.get(stem, ())
+
+
+def merge_tags(tag_lists, sort_tags=False):
+    """
+    Agrupa los tags de varios captions.
+
+    Los tags presentes en más de un caption se consideran compartidos y
+    aparecen una sola vez; el resto se agrupa por caption de origen.
+
+    Args:
+        tag_lists: Lista de tuplas de tags, una por caption
+        sort_tags: Si True, ordena alfabéticamente cada grupo
+
+    Returns:
+        Tupla (tags compartidos, lista de tags propios de cada caption)
+    """
+    counts = {}
+    for tags in tag_lists:
+        for tag in tags:
+            counts[tag] = counts.get(tag, 0) + 1
+
+    shared = [tag for tag, count in counts.items() if count > 1]
+    groups = [[tag for tag in tags if counts[tag] == 1] for tags in tag_lists]
+    if sort_tags:
+        shared.sort()
+        for group in groups:
+            group.sort()
+    return shared, groups
+
+
+class CaptionTemplate:
+    """
+    Template de captions analizado una sola vez.
+
+    Campos admitidos:
+        {description_dir_k}: caption del directorio k (1..N); en modo tags,
+            solo sus tags propios, y el primero del template lleva delante
+            los compartidos si no se usa {shared_tags} ni {merged_tags}
+        {description_first_directory}, {description_second_directory}:
+            alias de los dos primeros directorios
+        {tags_dir_k}: tags propios del directorio k
+        {shared_tags}: tags presentes en más de un caption (modo tags)
+        {merged_tags}: compartidos seguidos de los propios de cada directorio
+    """
+
+    def __init__(self, template, source_count, mode=CAPTION_MODE_TEXT, sort_tags=False):
+        """
+        Args:
+            template: Texto del template
+            source_count: Número de directorios de origen
+            mode: CAPTION_MODE_TEXT (texto en bruto) o CAPTION_MODE_TAGS
+            sort_tags: Si True, ordena alfabéticamente los grupos de tags
+
+        Raises:
+            ValueError: Si el template usa campos desconocidos o fuera de rango
+        """
+        if mode not in CAPTION_MODES:
+            raise ValueError(f"Modo de captions no válido: {mode}")
+        self.mode = mode
+        self.sort_tags = sort_tags
+        self.source_count = source_count
+
+        self._parts = []
+        for literal, field, spec, conversion in Formatter().parse(template):
+            if field is not None:
+                if conversion or spec:
+                    raise ValueError(f"Formato no soportado en el campo {{{field}}}")
+                self._check_field(field)
+            self._parts.append((literal, field))
+
+        fields = [field for _, field in self._parts if field is not None]
+        tag_fields = [
+            field for field in fields
+            if field in ('shared_tags', 'merged_tags') or field.startswith('tags_dir_')
+        ]
+        # El texto en bruto no necesita separar tags salvo que se pidan campos de tags
+        self._needs_tags = mode == CAPTION_MODE_TAGS or bool(tag_fields)
+
+        # En modo tags los compartidos no se pueden perder: van con la primera descripción
+        self._shared_part = None
+        if mode == CAPTION_MODE_TAGS and not any(f in ('shared_tags', 'merged_tags') for f in fields):
+            for i, (_, field) in enumerate(self._parts):
+                if field is not None and field.startswith('description_'):
+                    self._shared_part = i
+                    break
+
+    def _check_field(self, field):
+        if field in ('description_first_directory', 'description_second_directory',
+                     'shared_tags', 'merged_tags'):
+            return
+        match = _DIR_FIELD.match(field)
+        if not match:
+            raise ValueError(f"Campo desconocido en el template: {{{field}}}")
+        k = int(match.group(1) or match.group(2))
+        if not 1 <= k <= self.source_count:
+            raise ValueError(f"{{{field}}} fuera de rango para {self.source_count} directorios")
+
+    def render(self, stems, caches):
+        """
+        Genera el caption de una composición.
+
+        Args:
+            stems: Nombres (sin extensión) de las imágenes, uno por directorio
+            caches: CaptionCache de cada directorio, en el mismo orden
+
+        Returns:
+            Texto del caption
+        """
+        if self._needs_tags:
+            shared, groups = merge_tags(
+                [cache.tags(stem) for stem, cache in zip(stems, caches)], self.sort_tags
+            )
+        else:
+            shared, groups = [], [[] for _ in caches]
+        own_tags = [TAG_SEPARATOR.join(group) for group in groups]
+        if self.mode == CAPTION_MODE_TAGS:
+            descriptions = own_tags
+        else:
+            descriptions = [cache.text(stem) for stem, cache in zip(stems, caches)]
+
+        fields = {
+            'shared_tags': TAG_SEPARATOR.join(shared),
+            'merged_tags': TAG_SEPARATOR.join(shared + [tag for group in groups for tag in group]),
+            'description_first_directory': descriptions[0],
+            'description_second_directory': descriptions[1] if len(descriptions) > 1 else "",
+        }
+        for k, (description, tags) in enumerate(zip(descriptions, own_tags), start=1):
+            fields[f"description_dir_{k}"] = description
+            fields[f"tags_dir_{k}"] = tags
+
+        pieces = []
+        for i, (literal, field) in enumerate(self._parts):
+            pieces.append(literal)
+            if field is None:
+                continue
+            value = fields[field]
+            if i == self._shared_part and shared:
+                value = TAG_SEPARATOR.join(shared + ([value] if value else []))
+            pieces.append(value)
+        return "".join(pieces)
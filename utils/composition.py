@@ -0,0 +1,104 @@
+"""
+Composición de varias imágenes en filas, columnas o rejillas.
+
+El layout se calcula una vez a partir de los tamaños de cabecera y el
+lienzo se ensambla copiando cada imagen en su celda de un buffer NumPy
+reservado de antemano.
+"""
+import math
+
+import numpy as np
+from PIL import Image
+
+# Layouts de composición
+LAYOUT_HORIZONTAL = 'horizontal'
+LAYOUT_VERTICAL = 'vertical'
+LAYOUT_GRID = 'grid'
+LAYOUTS = (LAYOUT_HORIZONTAL, LAYOUT_VERTICAL, LAYOUT_GRID)
+
+
+def grid_shape(count, layout=LAYOUT_HORIZONTAL, columns=None):
+    """
+    Calcula filas y columnas de una composición.
+
+    Args:
+        count: Número de imágenes
+        layout: Layout de composición
+        columns: Columnas del layout grid (default: la raíz cuadrada redondeada hacia arriba)
+
+    Returns:
+        Tupla (filas, columnas)
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f"Layout de composición no válido: {layout}")
+    if layout == LAYOUT_HORIZONTAL:
+        return 1, count
+    if layout == LAYOUT_VERTICAL:
+        return count, 1
+    columns = min(columns or math.ceil(math.sqrt(count)), count)
+    return math.ceil(count / columns), columns
+
+
+def compute_layout(sizes, layout=LAYOUT_HORIZONTAL, columns=None):
+    """
+    Calcula el lienzo y la celda de cada imagen.
+
+    En vertical todas las imágenes se escalan al ancho mínimo y se apilan.
+    En horizontal y en rejilla se escalan al alto mínimo; cada columna de
+    la rejilla toma el ancho de su imagen más ancha y las más estrechas se
+    centran en su celda.
+
+    Args:
+        sizes: Lista de tamaños (ancho, alto) originales
+        layout: Layout de composición
+        columns: Columnas del layout grid
+
+    Returns:
+        Tupla (tamaño del lienzo, lista de cajas (left, top, ancho, alto))
+    """
+    rows, cols = grid_shape(len(sizes), layout, columns)
+
+    if layout == LAYOUT_VERTICAL:
+        width = min(w for w, _ in sizes)
+        cells = []
+        top = 0
+        for w, h in sizes:
+            height = int((width / w) * h)
+            cells.append((0, top, width, height))
+            top += height
+        return (width, top), cells
+
+    height = min(h for _, h in sizes)
+    widths = [int((height / h) * w) for w, h in sizes]
+    column_widths = [max(widths[c::cols]) for c in range(cols)]
+    column_lefts = [sum(column_widths[:c]) for c in range(cols)]
+
+    cells = []
+    for i, width in enumerate(widths):
+        row, col = divmod(i, cols)
+        left = column_lefts[col] + (column_widths[col] - width) // 2
+        cells.append((left, row * height, width, height))
+    return (sum(column_widths), rows * height), cells
+
+
+def compose_images(images, canvas_size, cells, background=(0, 0, 0)):
+    """
+    Ensambla imágenes RGB en un lienzo según un layout ya calculado.
+
+    Args:
+        images: Lista de imágenes PIL RGB del tamaño de su celda
+        canvas_size: Tamaño (ancho, alto) del lienzo
+        cells: Cajas (left, top, ancho, alto) devueltas por compute_layout
+        background: Color RGB de las zonas sin imagen
+
+    Returns:
+        Imagen RGB compuesta
+    """
+    width, height = canvas_size
+    canvas = np.empty((height, width, 3), dtype=np.uint8)
+    canvas[...] = background
+    for img, (left, top, cell_width, cell_height) in zip(images, cells):
+        # tobytes + frombuffer es bastante más rápido que np.asarray(img)
+        pixels = np.frombuffer(img.tobytes(), dtype=np.uint8).reshape(cell_height, cell_width, 3)
+        canvas[top:top + cell_height, left:left + cell_width] = pixels
+    return Image.fromarray(canvas)
@@ -0,0 +1,495 @@
+"""
+Búsqueda de imágenes casi duplicadas en un dataset.
+
+Cada imagen se reduce a un hash perceptual (utils.image_hashing) que se
+guarda en una caché SQLite junto a su tamaño y fecha de modificación, de
+modo que al repetir la búsqueda solo se decodifican las imágenes nuevas o
+modificadas. Los hashes se agrupan con un índice multi-tabla
+(utils.hash_index) y las parejas cercanas se unen en clusters.
+
+Los duplicados exactos se buscan aparte: se agrupan por tamaño y solo los
+tamaños repetidos se leen, primero la cabecera y después el archivo
+completo de los que siguen coincidiendo.
+"""
+import os
+import hashlib
+import sqlite3
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from utils.file_operations import CAPTION_EXTENSIONS, paired_files
+from utils.format_conversion import IMAGE_EXTENSIONS
+from utils.hash_index import MultiIndexHash
+from utils.image_hashing import HASH_DHASH, hash_batch, hash_thumbnail, thumbnail_size
+
+logger = logging.getLogger(__name__)
+
+# Caché de hashes dentro de la carpeta analizada
+HASH_CACHE_FILE = '.image_hashes.sqlite'
+
+# Distancia de Hamming máxima por defecto entre casi duplicados (hash de 64 bits)
+DEFAULT_MAX_DISTANCE = 4
+
+# Imágenes por tarea del pool de hashing
+HASH_CHUNK_SIZE = 64
+
+# Bytes de cabecera del primer filtro de duplicados exactos
+HEAD_HASH_BYTES = 64 << 10
+# Tamaño de bloque de lectura del hash completo
+HASH_READ_CHUNK = 1 << 20
+
+_SIGN_BIT = 1 << 63
+
+
+def list_images(folder, recursive=False, extensions=IMAGE_EXTENSIONS):
+    """
+    Lista las imágenes de una carpeta.
+
+    Args:
+        folder: Carpeta a recorrer
+        recursive: Si True, incluye subcarpetas
+        extensions: Extensiones admitidas (en minúsculas)
+
+    Returns:
+        Lista ordenada de rutas
+    """
+    images = []
+    pending = [folder]
+    while pending:
+        directory = pending.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if recursive and not entry.name.startswith('.'):
+                            pending.append(entry.path)
+                    elif os.path.splitext(entry.name)[1].lower() in extensions:
+                        images.append(entry.path)
+        except OSError as e:
+            logger.error(f"Error listing {directory}: {e}")
+    images.sort()
+    return images
+
+
+def _to_signed(value):
+    """SQLite solo guarda enteros con signo de 64 bits."""
+    return value - (1 << 64) if value & _SIGN_BIT else value
+
+
+def _to_unsigned(value):
+    return value + (1 << 64) if value < 0 else value
+
+
+class HashCache:
+    """
+    Caché persistente de hashes perceptuales.
+
+    Cada fila se identifica por ruta, método y tamaño de hash, y solo es
+    válida si el tamaño y la fecha de modificación del archivo coinciden
+    con los guardados.
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path: Ruta del archivo SQLite
+        """
+        self.path = path
+        self._connection = sqlite3.connect(path)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS hashes ("
+            " path TEXT NOT NULL, method TEXT NOT NULL, hash_size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL, value INTEGER NOT NULL,"
+            " PRIMARY KEY (path, method, hash_size))"
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Confirma los cambios y cierra la base de datos."""
+        if self._connection is not None:
+            self._connection.commit()
+            self._connection.close()
+            self._connection = None
+
+    def lookup(self, method, hash_size):
+        """
+        Carga todas las entradas de un método.
+
+        Args:
+            method: Método de hash
+            hash_size: Lado del hash en bits
+
+        Returns:
+            Diccionario ruta -> (mtime_ns, tamaño, hash)
+        """
+        rows = self._connection.execute(
+            "SELECT path, mtime_ns, size, value FROM hashes WHERE method = ? AND hash_size = ?",
+            (method, hash_size)
+        )
+        return {path: (mtime_ns, size, _to_unsigned(value)) for path, mtime_ns, size, value in rows}
+
+    def store(self, method, hash_size, entries):
+        """
+        Guarda o reemplaza hashes.
+
+        Args:
+            method: Método de hash
+            hash_size: Lado del hash en bits
+            entries: Iterable de tuplas (ruta, mtime_ns, tamaño, hash)
+        """
+        self._connection.executemany(
+            "INSERT OR REPLACE INTO hashes (path, method, hash_size, mtime_ns, size, value)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            [(path, method, hash_size, mtime_ns, size, _to_signed(value))
+             for path, mtime_ns, size, value in entries]
+        )
+        self._connection.commit()
+
+    def prune(self, keep_paths):
+        """
+        Elimina las entradas de archivos que ya no existen.
+
+        Args:
+            keep_paths: Rutas que se sabe que existen (no se comprueban)
+        """
+        keep = set(keep_paths)
+        stale = [
+            (path,) for (path,) in self._connection.execute("SELECT DISTINCT path FROM hashes")
+            if path not in keep and not os.path.exists(path)
+        ]
+        if stale:
+            self._connection.executemany("DELETE FROM hashes WHERE path = ?", stale)
+            self._connection.commit()
+
+
+def _hash_chunk(paths, method, hash_size):
+    """
+    Calcula el hash de un grupo de imágenes.
+
+    Las miniaturas se reducen en un array común y se hashean juntas; las
+    imágenes que no se pueden leer se devuelven con hash None.
+    """
+    width, height = thumbnail_size(method, hash_size)
+    thumbnails = np.empty((len(paths), height, width), dtype=np.uint8)
+    valid = []
+    for path in paths:
+        try:
+            with Image.open(path) as img:
+                # Los JPEG se decodifican directamente a escala reducida
+                img.draft('L', (width * 4, height * 4))
+                hash_thumbnail(img, method, hash_size, thumbnails[len(valid)])
+            valid.append(path)
+        except Exception as e:
+            logger.warning(f"Error hashing {path}: {e}")
+
+    hashes = dict.fromkeys(paths)
+    if valid:
+        values = hash_batch(thumbnails[:len(valid)], method, hash_size)
+        hashes.update(zip(valid, (int(value) for value in values)))
+    return hashes
+
+
+def compute_image_hashes(paths, method=HASH_DHASH, hash_size=8, cache_path=None,
+                         max_workers=None, progress_callback=None, cancel_event=None):
+    """
+    Calcula el hash perceptual de varias imágenes usando la caché.
+
+    Args:
+        paths: Rutas de las imágenes
+        method: HASH_DHASH o HASH_PHASH
+        hash_size: Lado del hash en bits
+        cache_path: Archivo de caché SQLite (None para no usar caché)
+        max_workers: Hilos de decodificación (default: núcleos disponibles)
+        progress_callback: Función opcional (hechas, total)
+        cancel_event: threading.Event opcional; si se activa se devuelven
+            los hashes calculados hasta entonces
+
+    Returns:
+        Diccionario ruta -> hash (entero); las imágenes ilegibles se omiten
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    total = len(paths)
+    stats = {}
+    for path in paths:
+        try:
+            st = os.stat(path)
+            stats[path] = (st.st_mtime_ns, st.st_size)
+        except OSError as e:
+            logger.warning(f"Error reading {path}: {e}")
+
+    cache = HashCache(cache_path) if cache_path else None
+    try:
+        cached = cache.lookup(method, hash_size) if cache else {}
+        hashes = {}
+        pending = []
+        for path, stat in stats.items():
+            entry = cached.get(path)
+            if entry is not None and entry[:2] == stat:
+                hashes[path] = entry[2]
+            else:
+                pending.append(path)
+
+        logger.info(f"Hashing {len(pending)} images ({len(hashes)} cached) with {max_workers} workers")
+        done = total - len(pending)
+        if progress_callback:
+            progress_callback(done, total)
+
+        chunks = [pending[i:i + HASH_CHUNK_SIZE] for i in range(0, len(pending), HASH_CHUNK_SIZE)]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(_hash_chunk, chunk, method, hash_size) for chunk in chunks]
+            for future in futures:
+                if cancel_event is not None and cancel_event.is_set():
+                    for other in futures:
+                        other.cancel()
+                    logger.info("Image hashing cancelled")
+                    break
+                chunk_hashes = future.result()
+                computed = [(path, value) for path, value in chunk_hashes.items() if value is not None]
+                hashes.update(computed)
+                if cache:
+                    cache.store(method, hash_size, [(path, *stats[path], value) for path, value in computed])
+                done += len(chunk_hashes)
+                if progress_callback:
+                    progress_callback(done, total)
+    finally:
+        if cache:
+            cache.close()
+    return hashes
+
+
+def find_duplicate_clusters(hashes, max_distance=DEFAULT_MAX_DISTANCE, bits=64):
+    """
+    Agrupa las imágenes cuyos hashes están a distancia <= max_distance.
+
+    La relación es transitiva: si A se parece a B y B a C, las tres
+    imágenes quedan en el mismo cluster.
+
+    Args:
+        hashes: Diccionario ruta -> hash
+        max_distance: Distancia de Hamming máxima (inclusive)
+        bits: Longitud de los hashes en bits
+
+    Returns:
+        Lista de clusters (listas de rutas ordenadas) con al menos dos imágenes
+    """
+    index = MultiIndexHash(max_distance, bits)
+    paths = sorted(hashes)
+    parent = list(range(len(paths)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, path in enumerate(paths):
+        value = hashes[path]
+        for _, _, j in index.find(value):
+            root_i, root_j = find(i), find(j)
+            if root_i != root_j:
+                parent[max(root_i, root_j)] = min(root_i, root_j)
+        index.add(value, i)
+
+    groups = {}
+    for i, path in enumerate(paths):
+        groups.setdefault(find(i), []).append(path)
+    clusters = [group for group in groups.values() if len(group) > 1]
+    logger.info(f"Found {len(clusters)} duplicate clusters among {len(paths)} images")
+    return clusters
+
+
+def rank_cluster(paths):
+    """
+    Ordena un cluster poniendo primero la imagen que conviene conservar.
+
+    Se prefiere la de mayor resolución y, a igualdad, el archivo más grande.
+
+    Args:
+        paths: Rutas del cluster
+
+    Returns:
+        Lista de rutas ordenada
+    """
+    def quality(path):
+        try:
+            with Image.open(path) as img:
+                width, height = img.size
+            return width * height, os.path.getsize(path)
+        except Exception:
+            return 0, 0
+
+    return sorted(paths, key=lambda path: (tuple(-v for v in quality(path)), path))
+
+
+def find_near_duplicates(folder, recursive=False, method=HASH_DHASH, hash_size=8,
+                         max_distance=DEFAULT_MAX_DISTANCE, use_cache=True, max_workers=None,
+                         progress_callback=None, cancel_event=None):
+    """
+    Busca imágenes casi duplicadas en una carpeta.
+
+    Args:
+        folder: Carpeta del dataset
+        recursive: Si True, incluye subcarpetas
+        method: HASH_DHASH o HASH_PHASH
+        hash_size: Lado del hash en bits
+        max_distance: Distancia de Hamming máxima (inclusive)
+        use_cache: Si True, usa la caché de hashes HASH_CACHE_FILE de la carpeta
+        max_workers: Hilos de decodificación
+        progress_callback: Función opcional (hechas, total)
+        cancel_event: threading.Event opcional
+
+    Returns:
+        Lista de clusters; en cada uno la primera ruta es la sugerida para conservar
+    """
+    paths = list_images(folder, recursive)
+    cache_path = os.path.join(folder, HASH_CACHE_FILE) if use_cache else None
+    hashes = compute_image_hashes(
+        paths, method, hash_size, cache_path, max_workers, progress_callback, cancel_event
+    )
+    if use_cache and not (cancel_event is not None and cancel_event.is_set()):
+        with HashCache(cache_path) as cache:
+            cache.prune(paths)
+    clusters = find_duplicate_clusters(hashes, max_distance, hash_size * hash_size)
+    return [rank_cluster(cluster) for cluster in clusters]
+
+
+def file_digest(path, limit=None):
+    """
+    Calcula el BLAKE2b de un archivo leyendo en bloques grandes.
+
+    hashlib libera el GIL con bloques grandes, así que varias llamadas
+    en hilos distintos avanzan en paralelo.
+
+    Args:
+        path: Ruta del archivo
+        limit: Bytes a leer desde el principio (None lee el archivo entero)
+
+    Returns:
+        Digest de 16 bytes
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    buffer = memoryview(bytearray(min(HASH_READ_CHUNK, limit) if limit else HASH_READ_CHUNK))
+    remaining = limit
+    with open(path, 'rb', buffering=0) as f:
+        while remaining is None or remaining > 0:
+            view = buffer if remaining is None or remaining >= len(buffer) else buffer[:remaining]
+            read = f.readinto(view)
+            if not read:
+                break
+            digest.update(view[:read])
+            if remaining is not None:
+                remaining -= read
+    return digest.digest()
+
+
+def _split_by_digest(groups, limit, executor, progress, cancel_event):
+    """
+    Subdivide grupos de archivos según su digest.
+
+    Args:
+        groups: Lista de listas de rutas candidatas
+        limit: Bytes a leer de cada archivo (None para el archivo entero)
+        executor: Pool de hilos
+        progress: Función sin argumentos llamada por cada archivo leído
+        cancel_event: threading.Event opcional
+
+    Returns:
+        Lista de grupos con al menos dos archivos de digest idéntico, o
+        None si se canceló
+    """
+    futures = [
+        [(path, executor.submit(file_digest, path, limit)) for path in group]
+        for group in groups
+    ]
+    result = []
+    for group in futures:
+        by_digest = {}
+        for path, future in group:
+            if cancel_event is not None and cancel_event.is_set():
+                for other in futures:
+                    for _, pending in other:
+                        pending.cancel()
+                return None
+            try:
+                by_digest.setdefault(future.result(), []).append(path)
+            except OSError as e:
+                logger.warning(f"Error reading {path}: {e}")
+            progress()
+        result.extend(paths for paths in by_digest.values() if len(paths) > 1)
+    return result
+
+
+def find_exact_duplicates(folder, recursive=False, max_workers=None,
+                          progress_callback=None, cancel_event=None):
+    """
+    Busca imágenes idénticas byte a byte en una carpeta.
+
+    Los archivos se agrupan por tamaño; de los tamaños repetidos se compara
+    un hash de los primeros HEAD_HASH_BYTES y solo los que coinciden se
+    leen completos.
+
+    Args:
+        folder: Carpeta del dataset
+        recursive: Si True, incluye subcarpetas
+        max_workers: Hilos de lectura (default: núcleos disponibles)
+        progress_callback: Función opcional (hechas, total), una vez por etapa
+        cancel_event: threading.Event opcional; si se activa no se devuelve
+            ningún cluster
+
+    Returns:
+        Lista de clusters (listas de rutas ordenadas, primero las que tienen caption)
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    paths = list_images(folder, recursive)
+    sizes = {}
+    by_size = {}
+    for path in paths:
+        try:
+            sizes[path] = os.path.getsize(path)
+            by_size.setdefault(sizes[path], []).append(path)
+        except OSError as e:
+            logger.warning(f"Error reading {path}: {e}")
+    candidates = [group for group in by_size.values() if len(group) > 1]
+    logger.info(
+        f"{sum(map(len, candidates))} of {len(paths)} images share a size with another image"
+    )
+
+    def stage(groups, limit):
+        total = sum(map(len, groups))
+        done = [0]
+
+        def progress():
+            done[0] += 1
+            if progress_callback:
+                progress_callback(done[0], total)
+
+        return _split_by_digest(groups, limit, executor, progress, cancel_event)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        groups = stage(candidates, HEAD_HASH_BYTES)
+        if groups is not None:
+            # Si el archivo cabe en la cabecera, el hash parcial ya es el completo
+            small, large = [], []
+            for group in groups:
+                (small if sizes[group[0]] <= HEAD_HASH_BYTES else large).append(group)
+            large = stage(large, None)
+            groups = None if large is None else small + large
+    if groups is None:
+        logger.info("Exact duplicate search cancelled")
+        return []
+
+    def caption_first(path):
+        return not paired_files(path, CAPTION_EXTENSIONS), path
+
+    clusters = [sorted(group, key=caption_first) for group in groups]
+    clusters.sort(key=lambda group: group[0])
+    logger.info(f"Found {len(clusters)} exact duplicate clusters among {len(paths)} images")
+    return clusters
@@ -2,10 +2,15 @@
 Operaciones de archivos y búsqueda.
 """
 import os
+import shutil
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Extensiones de los archivos que acompañan a un caption (.txt) en el dataset
+PAIRED_IMAGE_EXTENSIONS = ('.jpg', '.png')
+CAPTION_EXTENSIONS = ('.txt',)
+
 
 def find_files_with_phrase(folder_path, search_terms, search_in_subfolders):
     """
@@ -50,3 +55,93 @@ def find_files_with_phrase(folder_path, search_terms, search_in_subfolders):
     logger.info(f"Found {len(matching_files)} matching files")
     return matching_files
 
+
+def paired_files(file_path, extensions=PAIRED_IMAGE_EXTENSIONS):
+    """
+    Devuelve los archivos con el mismo nombre base que acompañan a un archivo.
+
+    Args:
+        file_path: Ruta del archivo principal
+        extensions: Extensiones de los archivos asociados a buscar
+
+    Returns:
+        Lista de rutas existentes (sin incluir file_path)
+    """
+    base_name = os.path.splitext(file_path)[0]
+    companions = []
+    for ext in extensions:
+        companion = base_name + ext
+        if companion != file_path and os.path.exists(companion):
+            companions.append(companion)
+    return companions
+
+
+def delete_paired_files(file_paths, extensions=PAIRED_IMAGE_EXTENSIONS):
+    """
+    Elimina archivos junto con sus archivos asociados.
+
+    Args:
+        file_paths: Rutas de los archivos principales
+        extensions: Extensiones de los archivos asociados
+
+    Returns:
+        Número de archivos principales eliminados
+    """
+    deleted_count = 0
+    for file_path in file_paths:
+        try:
+            companions = paired_files(file_path, extensions)
+            os.remove(file_path)
+            for companion in companions:
+                os.remove(companion)
+            deleted_count += 1
+            logger.info(f"Deleted file: {file_path}")
+        except Exception as e:
+            logger.error(f"Error deleting {file_path}: {e}")
+    return deleted_count
+
+
+def _transfer_paired_files(file_paths, destination, extensions, transfer, action, done):
+    os.makedirs(destination, exist_ok=True)
+    count = 0
+    for file_path in file_paths:
+        try:
+            companions = paired_files(file_path, extensions)
+            transfer(file_path, destination)
+            for companion in companions:
+                transfer(companion, destination)
+            count += 1
+            logger.info(f"{done} file: {file_path} to {destination}")
+        except Exception as e:
+            logger.error(f"Error {action} {file_path}: {e}")
+    return count
+
+
+def move_paired_files(file_paths, destination, extensions=PAIRED_IMAGE_EXTENSIONS):
+    """
+    Mueve archivos junto con sus archivos asociados a una carpeta.
+
+    Args:
+        file_paths: Rutas de los archivos principales
+        destination: Carpeta destino (se crea si no existe)
+        extensions: Extensiones de los archivos asociados
+
+    Returns:
+        Número de archivos principales movidos
+    """
+    return _transfer_paired_files(file_paths, destination, extensions, shutil.move, "moving", "Moved")
+
+
+def copy_paired_files(file_paths, destination, extensions=PAIRED_IMAGE_EXTENSIONS):
+    """
+    Copia archivos junto con sus archivos asociados a una carpeta.
+
+    Args:
+        file_paths: Rutas de los archivos principales
+        destination: Carpeta destino (se crea si no existe)
+        extensions: Extensiones de los archivos asociados
+
+    Returns:
+        Número de archivos principales copiados
+    """
+    return _transfer_paired_files(file_paths, destination, extensions, shutil.copy, "copying", "Copied")
@@ -0,0 +1,346 @@
+"""
+Conversión de formatos de imagen en paralelo.
+"""
+import os
+import shutil
+import logging
+from PIL import Image, ImageSequence
+
+from utils.image_operations import flatten_alpha, has_alpha
+from utils.job_journal import atomic_save_image
+from utils.memory_budget import estimate_image_file_memory, run_with_memory_budget
+
+logger = logging.getLogger(__name__)
+
+try:
+    # Plugin opcional para versiones de Pillow sin soporte AVIF nativo
+    import pillow_avif  # noqa: F401
+except ImportError:
+    pass
+
+# Extensión de salida y formato PIL de cada formato destino
+OUTPUT_FORMATS = {
+    'PNG': '.png',
+    'JPEG': '.jpg',
+    'WEBP': '.webp',
+    'AVIF': '.avif',
+}
+
+# Extensiones de entrada reconocidas (en minúsculas)
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp', '.avif', '.gif', '.bmp')
+VIDEO_EXTENSIONS = ('.webm',)
+
+# Modos para contenido animado
+ANIMATED_FIRST_FRAME = 'first'
+ANIMATED_ALL_FRAMES = 'all'
+ANIMATED_KEYFRAMES = 'keyframes'
+ANIMATED_MODES = (ANIMATED_FIRST_FRAME, ANIMATED_ALL_FRAMES, ANIMATED_KEYFRAMES)
+
+# Opciones de guardado por formato
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 95},
+    'WEBP': {'quality': 95},
+    'AVIF': {'quality': 90},
+}
+
+
+def available_output_formats():
+    """
+    Devuelve los formatos destino que Pillow puede escribir en este entorno.
+
+    Returns:
+        Lista de nombres de formato (p. ej. ['PNG', 'JPEG', 'WEBP'])
+    """
+    Image.init()
+    return [fmt for fmt in OUTPUT_FORMATS if fmt in Image.SAVE]
+
+
+def _prepare_frame(frame, target_format):
+    """
+    Adapta el modo de un frame al formato destino.
+
+    Args:
+        frame: Imagen PIL
+        target_format: Formato destino
+
+    Returns:
+        Imagen lista para guardar
+    """
+    if target_format == 'JPEG':
+        if has_alpha(frame) or frame.mode not in ('RGB', 'L'):
+            return flatten_alpha(frame)
+        return frame
+    if frame.mode.startswith('I;16') and target_format != 'PNG':
+        return flatten_alpha(frame)
+    if frame.mode not in ('RGB', 'RGBA', 'L', 'LA', 'P'):
+        return frame.convert('RGBA' if has_alpha(frame) else 'RGB')
+    return frame
+
+
+def _caption_path(source_path):
+    """
+    Busca el caption de una imagen, como nombre.txt o nombre.ext.txt.
+
+    Args:
+        source_path: Ruta de la imagen
+
+    Returns:
+        Ruta del caption o None
+    """
+    for candidate in (os.path.splitext(source_path)[0] + '.txt', source_path + '.txt'):
+        if os.path.exists(candidate):
+            return candidate
+    return None
+
+
+def _caption_target(caption_path, source_path, output_path):
+    """
+    Calcula el nombre del caption que corresponde a una imagen convertida.
+
+    Args:
+        caption_path: Caption de la imagen original
+        source_path: Ruta de la imagen original
+        output_path: Ruta de la imagen convertida
+
+    Returns:
+        Ruta del nuevo caption
+    """
+    if caption_path == source_path + '.txt':
+        return output_path + '.txt'
+    return os.path.splitext(output_path)[0] + '.txt'
+
+
+def _apply_captions(source_path, written, remove_source):
+    """
+    Copia el caption de una imagen a cada archivo convertido.
+
+    Args:
+        source_path: Ruta de la imagen original
+        written: Rutas de los archivos convertidos
+        remove_source: Si True, elimina el caption original si ya no corresponde a ningún archivo
+    """
+    caption_path = _caption_path(source_path)
+    if not caption_path:
+        return
+    targets = [_caption_target(caption_path, source_path, p) for p in written]
+    for target in targets:
+        if target != caption_path:
+            shutil.copy2(caption_path, target)
+    if remove_source and written and caption_path not in targets:
+        os.remove(caption_path)
+
+
+def _save_converted(img, output_path, target_format):
+    """
+    Guarda una imagen convertida de forma atómica, verificándola antes de reemplazar.
+
+    Args:
+        img: Imagen PIL
+        output_path: Ruta de salida
+        target_format: Formato destino
+    """
+    atomic_save_image(
+        _prepare_frame(img, target_format),
+        output_path,
+        target_format,
+        verify=True,
+        **SAVE_OPTIONS.get(target_format, {})
+    )
+
+
+def _output_paths(source_path, target_format, frame_count):
+    """
+    Genera las rutas de salida de un archivo convertido.
+
+    Args:
+        source_path: Ruta de la imagen original
+        target_format: Formato destino
+        frame_count: Número de frames a escribir
+
+    Returns:
+        Lista de rutas de salida
+    """
+    stem = os.path.splitext(source_path)[0]
+    extension = OUTPUT_FORMATS[target_format]
+    if frame_count == 1:
+        return [stem + extension]
+    return [f"{stem}_frame_{i}{extension}" for i in range(frame_count)]
+
+
+def convert_image_file(source_path, target_format='PNG', animated=ANIMATED_FIRST_FRAME,
+                       remove_source=False, rename_captions=False, overwrite=False):
+    """
+    Convierte un archivo de imagen (o animación) al formato destino.
+
+    Args:
+        source_path: Ruta del archivo original
+        target_format: 'PNG', 'JPEG', 'WEBP' o 'AVIF'
+        animated: 'first' (primer frame), 'all' (todos los frames) o
+            'keyframes' (extracción de keyframes únicos)
+        remove_source: Si True, elimina el original tras verificar la escritura
+        rename_captions: Si True, renombra o copia el caption para que coincida
+        overwrite: Si True, sobrescribe archivos de salida existentes
+
+    Returns:
+        Lista de rutas escritas (vacía si se omitió)
+    """
+    extension = os.path.splitext(source_path)[1].lower()
+    is_video = extension in VIDEO_EXTENSIONS
+
+    if is_video or animated == ANIMATED_KEYFRAMES:
+        with_frames = is_video
+        if not is_video:
+            with Image.open(source_path) as img:
+                with_frames = getattr(img, 'n_frames', 1) > 1
+        if with_frames:
+            if animated != ANIMATED_KEYFRAMES:
+                logger.warning(f"Skipping video {source_path}: use keyframe mode to convert videos")
+                return []
+            return _convert_via_keyframes(source_path, target_format, remove_source, rename_captions)
+
+    with Image.open(source_path) as img:
+        frame_count = getattr(img, 'n_frames', 1) if animated == ANIMATED_ALL_FRAMES else 1
+        output_paths = _output_paths(source_path, target_format, frame_count)
+
+        if not overwrite:
+            existing = [p for p in output_paths if p != source_path and os.path.exists(p)]
+            if existing:
+                logger.warning(f"Skipping {source_path}: {existing[0]} already exists")
+                return []
+
+        for output_path, frame in zip(output_paths, ImageSequence.Iterator(img)):
+            if output_path == source_path:
+                # Mismo formato y nombre: no hay nada que convertir
+                continue
+            _save_converted(frame, output_path, target_format)
+            logger.debug(f"Converted {source_path} -> {output_path}")
+
+    written = [p for p in output_paths if p != source_path]
+
+    if rename_captions:
+        _apply_captions(source_path, written, remove_source)
+
+    if remove_source and written:
+        os.remove(source_path)
+        logger.debug(f"Removed source {source_path}")
+
+    return written
+
+
+def _convert_via_keyframes(source_path, target_format, remove_source, rename_captions):
+    """
+    Convierte una animación o video extrayendo solo sus keyframes únicos.
+
+    Cada keyframe se guarda en el formato destino y se verifica antes de
+    reemplazar; si alguna escritura falla la extracción lanza la excepción
+    y el original se conserva.
+
+    Args:
+        source_path: Ruta del archivo animado
+        target_format: Formato destino
+        remove_source: Si True, elimina el original tras verificar la extracción
+        rename_captions: Si True, copia el caption a cada keyframe
+
+    Returns:
+        Lista de rutas escritas
+    """
+    from utils.keyframes import extract_gif_frames, extract_webm_key_frames
+
+    output_dir = os.path.dirname(source_path)
+    extract = (
+        extract_webm_key_frames if os.path.splitext(source_path)[1].lower() in VIDEO_EXTENSIONS
+        else extract_gif_frames
+    )
+    written = extract(
+        source_path,
+        output_dir,
+        save_frame=lambda img, path: _save_converted(img, path, target_format),
+        extension=OUTPUT_FORMATS[target_format]
+    )
+
+    if rename_captions:
+        _apply_captions(source_path, written, remove_source)
+
+    if remove_source and written:
+        os.remove(source_path)
+        logger.debug(f"Removed source {source_path}")
+    return written
+
+
+def convert_images(directory, target_format='PNG', source_extensions=None,
+                   animated=ANIMATED_FIRST_FRAME, remove_source=False, rename_captions=False,
+                   overwrite=False, max_workers=None, cancel_event=None):
+    """
+    Convierte en paralelo las imágenes de un directorio al formato destino.
+
+    Args:
+        directory: Directorio con los archivos a convertir
+        target_format: 'PNG', 'JPEG', 'WEBP' o 'AVIF' (si está disponible)
+        source_extensions: Extensiones a convertir (default: todas las soportadas
+            salvo la del formato destino)
+        animated: 'first', 'all' o 'keyframes'
+        remove_source: Si True, elimina cada original tras verificar su conversión
+        rename_captions: Si True, renombra o copia los captions para que coincidan
+        overwrite: Si True, sobrescribe archivos de salida existentes
+        max_workers: Número de hilos (default: núcleos disponibles)
+        cancel_event: threading.Event opcional; si se activa no se empiezan más archivos
+
+    Returns:
+        Diccionario con los contadores 'converted', 'skipped' y 'failed' y
+        'cancelled' (True si se detuvo por cancel_event)
+    """
+    target_format = target_format.upper()
+    if target_format not in available_output_formats():
+        raise ValueError(f"Formato de salida no soportado: {target_format}")
+    if animated not in ANIMATED_MODES:
+        raise ValueError(f"Modo de animación no válido: {animated}")
+
+    if source_extensions is None:
+        target_extensions = ('.jpg', '.jpeg') if target_format == 'JPEG' else (OUTPUT_FORMATS[target_format],)
+        source_extensions = tuple(
+            ext for ext in IMAGE_EXTENSIONS + VIDEO_EXTENSIONS if ext not in target_extensions
+        )
+    source_extensions = tuple(ext.lower() for ext in source_extensions)
+
+    source_paths = sorted(
+        os.path.join(directory, filename)
+        for filename in os.listdir(directory)
+        if filename.lower().endswith(source_extensions)
+    )
+    logger.info(
+        f"Converting {len(source_paths)} files in {directory} to {target_format} (animated: {animated})"
+    )
+
+    def estimate(source_path):
+        if source_path.lower().endswith(VIDEO_EXTENSIONS):
+            return 0
+        return estimate_image_file_memory(source_path, flatten=target_format == 'JPEG')
+
+    results = run_with_memory_budget(
+        source_paths,
+        estimate,
+        lambda source_path: convert_image_file(
+            source_path, target_format, animated, remove_source, rename_captions, overwrite
+        ),
+        max_workers,
+        cancel_event=cancel_event
+    )
+
+    summary = {
+        'converted': 0, 'skipped': 0, 'failed': 0,
+        'cancelled': cancel_event is not None and cancel_event.is_set()
+    }
+    for source_path, written, error in results:
+        if error is not None:
+            logger.error(f"Error converting {os.path.basename(source_path)}: {error}")
+            summary['failed'] += 1
+        elif written:
+            summary['converted'] += 1
+        else:
+            summary['skipped'] += 1
+
+    logger.info(
+        f"Converted {summary['converted']} files "
+        f"({summary['skipped']} skipped, {summary['failed']} failed)"
+    )
+    return summary
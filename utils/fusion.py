@@ -0,0 +1,384 @@
+"""
+Fusión de imágenes y textos de varios directorios en un pool de hilos.
+
+Un trabajo guardado se puede ejecutar por shards desde la línea de comandos:
+    python -m utils.fusion salida/fuse_job.json --shard 0 --shards 4
+"""
+import os
+import json
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from PIL import Image
+
+from utils.captions import CAPTION_MODE_TEXT, CaptionCache, CaptionTemplate
+from utils.composition import LAYOUT_HORIZONTAL, compose_images, compute_layout
+from utils.image_operations import flatten_alpha, has_alpha
+from utils.job_journal import JobJournal, atomic_save_image, remove_stale_partials
+from utils.pair_planner import PairPlan, STRATEGY_ZIP_WRAP
+
+logger = logging.getLogger(__name__)
+
+# Extensiones de imagen que se fusionan
+FUSE_IMAGE_EXTENSIONS = ('.jpg', '.png')
+# Imágenes redimensionadas que se mantienen en memoria por defecto
+DEFAULT_CACHE_ENTRIES = 64
+# Trabajo de fusión guardado en el directorio de salida
+FUSE_JOB_FILE = 'fuse_job.json'
+
+
+class FusionCancelled(Exception):
+    """La fusión se canceló antes de terminar."""
+
+
+class DecodeCache:
+    """
+    Caché LRU de imágenes decodificadas y redimensionadas a un tamaño concreto.
+
+    Cada par (ruta, tamaño) se decodifica una sola vez aunque varios hilos lo
+    pidan a la vez: el primero lo calcula y el resto espera su resultado.
+    """
+
+    def __init__(self, add_white_bg=False, max_entries=DEFAULT_CACHE_ENTRIES):
+        """
+        Args:
+            add_white_bg: Si True, compone la transparencia sobre blanco al decodificar
+            max_entries: Número máximo de imágenes retenidas
+        """
+        self.add_white_bg = add_white_bg
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def size(self, path):
+        """
+        Devuelve el tamaño de una imagen leyendo solo su cabecera (memorizado).
+
+        Args:
+            path: Ruta de la imagen
+
+        Returns:
+            Tupla (ancho, alto)
+        """
+        with self._lock:
+            if path in self._sizes:
+                return self._sizes[path]
+        with Image.open(path) as img:
+            size = img.size
+        with self._lock:
+            self._sizes[path] = size
+        return size
+
+    def get(self, path, size):
+        """
+        Devuelve la imagen en RGB redimensionada al tamaño indicado.
+
+        Args:
+            path: Ruta de la imagen
+            size: Tamaño destino (ancho, alto)
+
+        Returns:
+            Imagen PIL RGB (compartida; no debe modificarse)
+        """
+        key = (path, size)
+        with self._lock:
+            future = self._entries.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._entries[key] = future
+                self.misses += 1
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+
+        if owner:
+            try:
+                future.set_result(self._decode(path, size))
+            except BaseException as e:
+                with self._lock:
+                    self._entries.pop(key, None)
+                future.set_exception(e)
+        return future.result()
+
+    def _decode(self, path, size):
+        """Decodifica, aplana y redimensiona una imagen, cerrando el archivo al terminar."""
+        with Image.open(path) as img:
+            if img.format == 'JPEG':
+                img.draft(None, size)
+            img.load()
+            if self.add_white_bg and has_alpha(img):
+                decoded = flatten_alpha(img)
+            else:
+                decoded = img.convert('RGB')
+        if decoded.size != size:
+            decoded = decoded.resize(size)
+        return decoded
+
+
+def list_fuse_images(directory):
+    """
+    Lista las imágenes fusionables de un directorio ordenadas por nombre.
+
+    Args:
+        directory: Directorio de origen
+
+    Returns:
+        Lista de nombres de archivo
+    """
+    return sorted(
+        [f for f in os.listdir(directory) if f.endswith(FUSE_IMAGE_EXTENSIONS)],
+        key=lambda x: os.path.splitext(x)[0]
+    )
+
+
+def create_fuse_job(directories, output_dir, template, add_white_bg=False,
+                    strategy=STRATEGY_ZIP_WRAP, count=None, seed=0,
+                    layout=LAYOUT_HORIZONTAL, columns=None,
+                    caption_mode=CAPTION_MODE_TEXT, sort_tags=False):
+    """
+    Crea la descripción serializable de un trabajo de fusión.
+
+    Args:
+        directories: Directorios de origen (uno por imagen de cada composición)
+        output_dir: Directorio de salida
+        template: Template de texto
+        add_white_bg: Si True, compone la transparencia sobre blanco
+        strategy: Estrategia de emparejamiento (ver utils.pair_planner)
+        count: Número de composiciones para las estrategias que lo admiten
+        seed: Semilla de las estrategias aleatorias
+        layout: Layout de composición (ver utils.composition)
+        columns: Columnas del layout grid
+        caption_mode: Modo de fusión de captions (ver utils.captions)
+        sort_tags: Si True, ordena alfabéticamente los grupos de tags
+
+    Returns:
+        Diccionario del trabajo (directorios, opciones y plan de combinaciones)
+    """
+    sources = [list_fuse_images(directory) for directory in directories]
+    if len(sources) < 2 or not all(sources):
+        raise ValueError("At least two directories with .jpg or .png images are required")
+
+    # Validar el template antes de guardar el trabajo
+    CaptionTemplate(template, len(directories), caption_mode, sort_tags)
+
+    plan = PairPlan(sources, strategy, count, seed)
+    return {
+        'directories': list(directories),
+        'output_dir': output_dir,
+        'template': template,
+        'add_white_bg': add_white_bg,
+        'layout': layout,
+        'columns': columns,
+        'caption_mode': caption_mode,
+        'sort_tags': sort_tags,
+        'plan': plan.to_dict(),
+    }
+
+
+def save_fuse_job(job, path):
+    """Guarda un trabajo de fusión como JSON."""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(job, f, ensure_ascii=False)
+
+
+def load_fuse_job(path):
+    """Carga un trabajo de fusión guardado con save_fuse_job."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def run_fuse_job(job, shard_index=0, shard_count=1, max_workers=None,
+                 cache_entries=DEFAULT_CACHE_ENTRIES, progress_callback=None,
+                 cancel_event=None, resume=True):
+    """
+    Ejecuta un shard de un trabajo de fusión.
+
+    Cada composición se procesa en un pool de hilos con, como mucho, 2 x
+    max_workers composiciones en vuelo, y cada imagen de origen se
+    decodifica una vez por tamaño destino gracias a la caché LRU. El orden
+    de las imágenes rota en cada composición. Las composiciones terminadas se
+    registran en un diario por shard, de modo que un shard interrumpido
+    continúa donde se quedó. Las salidas se numeran por su posición en el
+    plan, así que shards distintos nunca colisionan; cada shard marca sus
+    temporales con su propio prefijo y al empezar solo limpia los suyos.
+    Las posiciones del shard se recorren sin materializarlas.
+
+    Args:
+        job: Diccionario creado con create_fuse_job
+        shard_index: Shard a ejecutar
+        shard_count: Número total de shards
+        max_workers: Número de hilos (default: núcleos disponibles)
+        cache_entries: Imágenes redimensionadas retenidas en la caché
+        progress_callback: Función (completados, total) llamada tras cada composición
+        cancel_event: threading.Event que detiene la fusión al activarse
+        resume: Si True, omite las composiciones completadas en una ejecución anterior
+
+    Returns:
+        Número de composiciones generadas en esta ejecución
+
+    Raises:
+        FusionCancelled: Si se activó cancel_event
+    """
+    directories = job['directories']
+    output_dir = job['output_dir']
+    add_white_bg = job['add_white_bg']
+    layout = job.get('layout', LAYOUT_HORIZONTAL)
+    columns = job.get('columns')
+    background = (255, 255, 255) if add_white_bg else (0, 0, 0)
+    plan = PairPlan.from_dict(job['plan'])
+    caption_template = CaptionTemplate(
+        job['template'], len(directories), job.get('caption_mode', CAPTION_MODE_TEXT), job.get('sort_tags', False)
+    )
+    caption_caches = [
+        CaptionCache(directory, [os.path.splitext(name)[0] for name in files])
+        for directory, files in zip(directories, plan.sources)
+    ]
+    shard = plan.shard(shard_index, shard_count)
+    shard_name = f"fuse_shard_{shard_index}_of_{shard_count}"
+    # Otros shards pueden estar escribiendo en la misma carpeta
+    temp_prefix = f"{shard_name}."
+    os.makedirs(output_dir, exist_ok=True)
+    remove_stale_partials(output_dir, temp_prefix)
+
+    job_digest = hashlib.sha1(json.dumps(job, sort_keys=True).encode('utf-8')).hexdigest()
+    journal = JobJournal(output_dir, shard_name, {'job': job_digest}, resume)
+
+    total = len(range(shard_index, len(plan), shard_count))
+    already_done = len(journal.completed)
+    max_workers = max_workers or os.cpu_count() or 1
+    cache = DecodeCache(add_white_bg, cache_entries)
+    in_flight = threading.Semaphore(2 * max_workers)
+    progress_lock = threading.Lock()
+    errors = []
+    completed = 0
+
+    def fuse_combination(index, names):
+        nonlocal completed
+        try:
+            if cancel_event is not None and cancel_event.is_set():
+                return
+            paths = [os.path.join(directory, name) for directory, name in zip(directories, names)]
+            shift = index % len(paths)
+            ordered = paths[shift:] + paths[:shift]
+
+            canvas_size, cells = compute_layout([cache.size(path) for path in ordered], layout, columns)
+            images = [cache.get(path, (width, height)) for path, (_, _, width, height) in zip(ordered, cells)]
+            combined_img = compose_images(images, canvas_size, cells, background)
+            atomic_save_image(
+                combined_img, os.path.join(output_dir, f"{index + 1}.jpg"), 'JPEG', temp_prefix=temp_prefix
+            )
+
+            try:
+                stems = [os.path.splitext(name)[0] for name in names]
+                with open(os.path.join(output_dir, f"{index + 1}.txt"), 'w', encoding='utf-8') as f:
+                    f.write(caption_template.render(stems, caption_caches))
+            except Exception as e:
+                logger.error(f"Error fusing texts for {index + 1}: {e}")
+
+            journal.mark_done(str(index))
+            with progress_lock:
+                completed += 1
+                done = already_done + completed
+            if progress_callback is not None:
+                progress_callback(done, total)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            in_flight.release()
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for index in shard:
+                if journal.is_done(str(index)):
+                    continue
+                in_flight.acquire()
+                if errors or (cancel_event is not None and cancel_event.is_set()):
+                    in_flight.release()
+                    break
+                executor.submit(fuse_combination, index, plan.files(index))
+    finally:
+        cancelled = cancel_event is not None and cancel_event.is_set()
+        journal.close(finished=not errors and not cancelled)
+
+    logger.info(
+        f"Fused {completed} compositions from {len(directories)} directories "
+        f"(shard {shard_index + 1}/{shard_count}, "
+        f"decode cache: {cache.misses} decodes, {cache.hits} hits)"
+    )
+    if errors:
+        raise errors[0]
+    if cancelled:
+        raise FusionCancelled(f"Fusion cancelled after {completed} of {total - already_done} compositions")
+    return completed
+
+
+def fuse_directories(directories, output_dir, template, add_white_bg=False,
+                     strategy=STRATEGY_ZIP_WRAP, count=None, seed=0,
+                     layout=LAYOUT_HORIZONTAL, columns=None,
+                     caption_mode=CAPTION_MODE_TEXT, sort_tags=False, **run_options):
+    """
+    Fusiona las imágenes y textos de varios directorios en un solo shard.
+
+    El trabajo se guarda además en output_dir/fuse_job.json para poder
+    relanzarlo o repartirlo en shards con `python -m utils.fusion`.
+
+    Args:
+        directories: Directorios de origen
+        output_dir: Directorio de salida
+        template: Template de texto
+        add_white_bg: Si True, compone la transparencia sobre blanco
+        strategy: Estrategia de emparejamiento (ver utils.pair_planner)
+        count: Número de composiciones para las estrategias que lo admiten
+        seed: Semilla de las estrategias aleatorias
+        layout: Layout de composición (ver utils.composition)
+        columns: Columnas del layout grid
+        caption_mode: Modo de fusión de captions (ver utils.captions)
+        sort_tags: Si True, ordena alfabéticamente los grupos de tags
+        **run_options: Opciones de run_fuse_job (max_workers, progress_callback, ...)
+
+    Returns:
+        Número de composiciones generadas
+    """
+    job = create_fuse_job(
+        directories, output_dir, template, add_white_bg, strategy, count, seed, layout, columns,
+        caption_mode, sort_tags
+    )
+    os.makedirs(output_dir, exist_ok=True)
+    save_fuse_job(job, os.path.join(output_dir, FUSE_JOB_FILE))
+    return run_fuse_job(job, **run_options)
+
+
+def main():
+    """Ejecuta un shard de un trabajo de fusión guardado desde la línea de comandos."""
+    import argparse
+    from config.logging_config import setup_logging
+
+    parser = argparse.ArgumentParser(description="Run one shard of a saved fusion job.")
+    parser.add_argument('job_file', help=f"Path to a {FUSE_JOB_FILE} written by the Fuse tab")
+    parser.add_argument('--shard', type=int, default=0, help="Shard index (0-based)")
+    parser.add_argument('--shards', type=int, default=1, help="Total number of shards")
+    parser.add_argument('--workers', type=int, default=None, help="Worker threads")
+    parser.add_argument('--no-resume', action='store_true', help="Ignore the shard journal")
+    args = parser.parse_args()
+
+    setup_logging()
+    run_fuse_job(
+        load_fuse_job(args.job_file),
+        args.shard,
+        args.shards,
+        max_workers=args.workers,
+        resume=not args.no_resume
+    )
+
+
+if __name__ == "__main__":
+    main()
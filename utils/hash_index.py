@@ -0,0 +1,258 @@
+"""
+Índice de vecinos cercanos para hashes perceptuales empaquetados en enteros.
+"""
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+if hasattr(int, 'bit_count'):
+    def popcount(value):
+        """Número de bits a 1 de un entero no negativo."""
+        return value.bit_count()
+else:  # Python < 3.10
+    def popcount(value):
+        """Número de bits a 1 de un entero no negativo."""
+        return bin(value).count('1')
+
+
+def hamming_distance(a, b):
+    """Distancia de Hamming entre dos hashes empaquetados."""
+    return popcount(a ^ b)
+
+
+def hash_to_int(image_hash):
+    """
+    Empaqueta un hash de imagehash (matriz de bits) en un entero.
+
+    Con hash_size=8 el resultado cabe en 64 bits.
+
+    Args:
+        image_hash: imagehash.ImageHash o array de bools
+
+    Returns:
+        Entero con un bit por celda del hash (la primera celda es el bit alto)
+    """
+    bits = np.asarray(getattr(image_hash, 'hash', image_hash), dtype=bool).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big') >> (-len(bits) % 8)
+
+
+class BKTree:
+    """
+    BK-tree sobre la distancia de Hamming.
+
+    Cada nodo guarda un hash y sus hijos indexados por distancia; una
+    búsqueda con radio r solo baja por los hijos con distancia en
+    [d - r, d + r], así que con radios pequeños se visita una fracción
+    mínima del árbol en lugar de comparar con todos los hashes.
+    """
+
+    def __init__(self, hashes=()):
+        """
+        Args:
+            hashes: Hashes iniciales (enteros)
+        """
+        # Nodo: [hash, valor, {distancia: nodo}]
+        self._root = None
+        self._size = 0
+        for value in hashes:
+            self.add(value)
+
+    def __len__(self):
+        return self._size
+
+    def add(self, value, item=None):
+        """
+        Inserta un hash.
+
+        Args:
+            value: Hash empaquetado
+            item: Dato opcional asociado (p. ej. la ruta de la imagen)
+        """
+        self._size += 1
+        if self._root is None:
+            self._root = [value, item, {}]
+            return
+        node = self._root
+        while True:
+            distance = popcount(node[0] ^ value)
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, item, {}]
+                return
+            node = child
+
+    def find(self, value, max_distance):
+        """
+        Busca todos los hashes a distancia <= max_distance.
+
+        Args:
+            value: Hash empaquetado
+            max_distance: Distancia de Hamming máxima (inclusive)
+
+        Returns:
+            Lista de tuplas (distancia, hash, dato) sin ordenar
+        """
+        matches = []
+        if self._root is None:
+            return matches
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            distance = popcount(node[0] ^ value)
+            if distance <= max_distance:
+                matches.append((distance, node[0], node[1]))
+            low, high = distance - max_distance, distance + max_distance
+            for child_distance, child in node[2].items():
+                if low <= child_distance <= high:
+                    stack.append(child)
+        return matches
+
+    def contains_near(self, value, max_distance):
+        """
+        Indica si hay algún hash a distancia <= max_distance.
+
+        Igual que find, pero termina en la primera coincidencia.
+
+        Args:
+            value: Hash empaquetado
+            max_distance: Distancia de Hamming máxima (inclusive)
+
+        Returns:
+            True si existe un hash suficientemente cercano
+        """
+        if self._root is None:
+            return False
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            distance = popcount(node[0] ^ value)
+            if distance <= max_distance:
+                return True
+            low, high = distance - max_distance, distance + max_distance
+            for child_distance, child in node[2].items():
+                if low <= child_distance <= high:
+                    stack.append(child)
+        return False
+
+    def add_if_new(self, value, max_distance, item=None):
+        """
+        Inserta un hash solo si no hay otro a distancia <= max_distance.
+
+        Args:
+            value: Hash empaquetado
+            max_distance: Distancia de Hamming máxima (inclusive)
+            item: Dato opcional asociado
+
+        Returns:
+            True si se insertó
+        """
+        if self.contains_near(value, max_distance):
+            return False
+        self.add(value, item)
+        return True
+
+
+class MultiIndexHash:
+    """
+    Índice multi-tabla (multi-index hashing) para un radio fijo.
+
+    El hash se parte en max_distance + 1 bandas de bits; si dos hashes
+    están a distancia <= max_distance, al menos una banda coincide
+    exactamente (principio del palomar). Cada banda se indexa en un
+    diccionario, de modo que solo se comparan los hashes que comparten
+    alguna banda.
+    """
+
+    def __init__(self, max_distance, bits=64):
+        """
+        Args:
+            max_distance: Distancia de Hamming máxima (inclusive) de las búsquedas
+            bits: Longitud de los hashes en bits
+        """
+        self.max_distance = max_distance
+        self.bits = bits
+        band_count = min(max(max_distance, 0) + 1, bits)
+        width, extra = divmod(bits, band_count)
+        self._bands = []
+        shift = 0
+        for i in range(band_count):
+            band_width = width + (1 if i < extra else 0)
+            self._bands.append((shift, (1 << band_width) - 1))
+            shift += band_width
+        self._tables = [{} for _ in self._bands]
+        self._items = []
+
+    def __len__(self):
+        return len(self._items)
+
+    def values(self):
+        """Devuelve los hashes insertados, en orden de inserción."""
+        return [value for value, _ in self._items]
+
+    def _keys(self, value):
+        return [(value >> shift) & mask for shift, mask in self._bands]
+
+    def add(self, value, item=None):
+        """
+        Inserta un hash.
+
+        Args:
+            value: Hash empaquetado
+            item: Dato opcional asociado
+        """
+        index = len(self._items)
+        self._items.append((value, item))
+        for table, key in zip(self._tables, self._keys(value)):
+            bucket = table.get(key)
+            if bucket is None:
+                table[key] = [index]
+            else:
+                bucket.append(index)
+
+    def _candidates(self, value):
+        seen = set()
+        for table, key in zip(self._tables, self._keys(value)):
+            for index in table.get(key, ()):
+                if index not in seen:
+                    seen.add(index)
+                    yield index
+
+    def find(self, value):
+        """
+        Busca todos los hashes a distancia <= max_distance.
+
+        Args:
+            value: Hash empaquetado
+
+        Returns:
+            Lista de tuplas (distancia, hash, dato)
+        """
+        matches = []
+        for index in self._candidates(value):
+            other, item = self._items[index]
+            distance = popcount(other ^ value)
+            if distance <= self.max_distance:
+                matches.append((distance, other, item))
+        return matches
+
+    def contains_near(self, value):
+        """Indica si hay algún hash a distancia <= max_distance."""
+        for index in self._candidates(value):
+            if popcount(self._items[index][0] ^ value) <= self.max_distance:
+                return True
+        return False
+
+    def add_if_new(self, value, item=None):
+        """
+        Inserta un hash solo si no hay otro a distancia <= max_distance.
+
+        Returns:
+            True si se insertó
+        """
+        if self.contains_near(value):
+            return False
+        self.add(value, item)
+        return True
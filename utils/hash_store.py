@@ -0,0 +1,174 @@
+"""
+Almacén persistente de hashes perceptuales para deduplicar entre ejecuciones.
+"""
+import os
+import threading
+import logging
+
+import numpy as np
+
+from utils.hash_index import MultiIndexHash
+
+logger = logging.getLogger(__name__)
+
+# Archivo del almacén dentro del directorio de salida
+HASH_STORE_FILE = '.frame_hashes.u64'
+
+_HASH_DTYPE = np.dtype('<u8')
+
+
+class HashStore:
+    """
+    Hashes de 64 bits guardados en un archivo binario append-only.
+
+    Al abrirlo, el archivo se mapea en memoria y se indexa con un
+    MultiIndexHash del radio indicado. Los hashes nuevos se añaden al
+    final del archivo con escrituras O_APPEND, de modo que varios procesos
+    pueden compartir el mismo almacén. Es seguro usarlo desde varios hilos:
+    los hashes aceptados por las sesiones entran en el índice en memoria en
+    cuanto se aceptan, así que las fuentes que se extraen a la vez se
+    descartan casi-duplicados entre sí, y llegan al archivo al confirmarse.
+    """
+
+    def __init__(self, directory, max_distance, bits=64, file_name=HASH_STORE_FILE):
+        """
+        Args:
+            directory: Directorio donde vive el almacén (p. ej. la carpeta de frames)
+            max_distance: Distancia de Hamming máxima (inclusive) para considerar duplicado
+            bits: Bits de cada hash (como mucho 64)
+            file_name: Nombre del archivo del almacén
+        """
+        if bits > 64:
+            raise ValueError(f"Un hash de {bits} bits no cabe en el almacén de 64 bits")
+        self.path = os.path.join(directory, file_name)
+        self.max_distance = max_distance
+        self.bits = bits
+        self._index = MultiIndexHash(max_distance, bits)
+        self._lock = threading.Lock()
+
+        existing = self._load()
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND | getattr(os, 'O_BINARY', 0))
+        logger.info(f"Opened hash store {self.path} with {existing} hashes")
+
+    def _load(self):
+        """Indexa los hashes del archivo y descarta un último registro incompleto."""
+        if not os.path.exists(self.path):
+            return 0
+        size = os.path.getsize(self.path)
+        whole = size - size % _HASH_DTYPE.itemsize
+        if whole != size:
+            logger.warning(f"Truncating incomplete record at the end of {self.path}")
+            os.truncate(self.path, whole)
+        if not whole:
+            return 0
+        values = np.memmap(self.path, dtype=_HASH_DTYPE, mode='r')
+        for value in values.tolist():
+            self._index.add(value)
+        count = len(values)
+        del values
+        return count
+
+    def __len__(self):
+        return len(self._index)
+
+    def contains_near(self, value):
+        """Indica si el almacén tiene un hash a distancia <= max_distance."""
+        with self._lock:
+            return self._index.contains_near(value)
+
+    def reserve_if_new(self, value):
+        """
+        Acepta un hash si no hay otro cercano y lo añade solo al índice en memoria.
+
+        Returns:
+            True si se aceptó
+        """
+        with self._lock:
+            return self._index.add_if_new(value)
+
+    def persist(self, values):
+        """
+        Escribe en el archivo hashes ya aceptados con reserve_if_new.
+
+        Args:
+            values: Iterable de hashes empaquetados
+        """
+        values = list(values)
+        if not values:
+            return
+        data = np.asarray(values, dtype=_HASH_DTYPE).tobytes()
+        with self._lock:
+            os.write(self._fd, data)
+
+    def extend(self, values):
+        """
+        Añade hashes al almacén y al índice.
+
+        Args:
+            values: Iterable de hashes empaquetados
+        """
+        values = list(values)
+        if not values:
+            return
+        data = np.asarray(values, dtype=_HASH_DTYPE).tobytes()
+        with self._lock:
+            os.write(self._fd, data)
+            for value in values:
+                self._index.add(value)
+
+    def session(self):
+        """
+        Crea un índice de trabajo para una fuente (un video o un GIF).
+
+        Returns:
+            HashStoreSession
+        """
+        return HashStoreSession(self)
+
+    def close(self):
+        """Cierra el archivo del almacén."""
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class HashStoreSession:
+    """
+    Índice de una sola fuente respaldado por un HashStore.
+
+    Un hash se rechaza si está cerca de algo del almacén, incluido lo que
+    otras sesiones abiertas ya aceptaron. Lo aceptado solo se escribe en el
+    archivo al llamar a commit, así que una extracción interrumpida no deja
+    hashes de frames que quizá no llegaron a escribirse; en memoria sigue
+    descartando casi-duplicados hasta que se cierra el almacén.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._accepted = []
+
+    def __len__(self):
+        return len(self._accepted)
+
+    def add_if_new(self, value):
+        """
+        Acepta un hash si no hay otro cercano en el almacén ni en ninguna sesión.
+
+        Returns:
+            True si se aceptó
+        """
+        if not self.store.reserve_if_new(value):
+            return False
+        self._accepted.append(value)
+        return True
+
+    def commit(self):
+        """Guarda en el archivo del almacén los hashes aceptados en la sesión."""
+        self.store.persist(self._accepted)
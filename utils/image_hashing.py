@@ -0,0 +1,169 @@
+"""
+Hashes perceptuales (dHash y pHash) calculados por lotes con NumPy.
+
+Los resultados son compatibles con imagehash.dhash / imagehash.phash pero
+empaquetados en uint64 (el primer bit del hash es el más significativo),
+listos para utils.hash_index.
+"""
+import logging
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+HASH_DHASH = 'dhash'
+HASH_PHASH = 'phash'
+HASH_METHODS = (HASH_DHASH, HASH_PHASH)
+
+# Factor de sobremuestreo de pHash (igual que imagehash)
+PHASH_HIGHFREQ_FACTOR = 4
+
+_dct_cache = {}
+
+
+def thumbnail_size(method=HASH_DHASH, hash_size=8):
+    """
+    Tamaño (ancho, alto) de la miniatura en escala de grises que necesita cada hash.
+
+    Args:
+        method: HASH_DHASH o HASH_PHASH
+        hash_size: Lado del hash en bits
+
+    Returns:
+        Tupla (ancho, alto)
+    """
+    if method == HASH_DHASH:
+        return hash_size + 1, hash_size
+    if method == HASH_PHASH:
+        side = hash_size * PHASH_HIGHFREQ_FACTOR
+        return side, side
+    raise ValueError(f"Método de hash no válido: {method}")
+
+
+def hash_thumbnail(img, method=HASH_DHASH, hash_size=8, out=None):
+    """
+    Reduce una imagen a la miniatura en escala de grises de un hash.
+
+    Usa la misma conversión y el mismo filtro que imagehash.
+
+    Args:
+        img: Imagen PIL
+        method: HASH_DHASH o HASH_PHASH
+        hash_size: Lado del hash en bits
+        out: Array uint8 (alto, ancho) opcional donde escribir la miniatura
+
+    Returns:
+        Array uint8 (alto, ancho)
+    """
+    thumb = img.convert('L').resize(thumbnail_size(method, hash_size), Image.LANCZOS)
+    pixels = np.asarray(thumb)
+    if out is None:
+        return pixels
+    out[...] = pixels
+    return out
+
+
+def pack_bits(bits):
+    """
+    Empaqueta filas de bits en uint64.
+
+    Args:
+        bits: Array bool (N, B) con B <= 64
+
+    Returns:
+        Array uint64 (N,) con el primer bit de cada fila como el más significativo
+    """
+    count = bits.shape[1]
+    if count > 64:
+        raise ValueError(f"Un hash de {count} bits no cabe en 64 bits")
+    if count < 64:
+        bits = np.pad(bits, ((0, 0), (64 - count, 0)))
+    return np.packbits(bits, axis=1).view('>u8')[:, 0].astype(np.uint64)
+
+
+def dhash_batch(thumbnails):
+    """
+    Calcula dHash para una pila de miniaturas.
+
+    Args:
+        thumbnails: Array (N, hash_size, hash_size + 1) de escala de grises
+
+    Returns:
+        Array uint64 (N,)
+    """
+    thumbnails = np.asarray(thumbnails)
+    diff = thumbnails[:, :, 1:] > thumbnails[:, :, :-1]
+    return pack_bits(diff.reshape(len(thumbnails), -1))
+
+
+def _dct_matrix(size, rows):
+    """Primeras `rows` filas de la matriz DCT-II (sin normalizar) de lado `size`."""
+    key = (size, rows)
+    matrix = _dct_cache.get(key)
+    if matrix is None:
+        k = np.arange(rows)[:, None]
+        n = np.arange(size)[None, :]
+        matrix = 2 * np.cos(np.pi * k * (2 * n + 1) / (2 * size))
+        _dct_cache[key] = matrix
+    return matrix
+
+
+def phash_batch(thumbnails, hash_size=8):
+    """
+    Calcula pHash para una pila de miniaturas.
+
+    Solo se calculan los hash_size x hash_size coeficientes DCT de baja
+    frecuencia, como dos productos de matrices sobre toda la pila.
+
+    Args:
+        thumbnails: Array (N, S, S) de escala de grises con S = hash_size * 4
+        hash_size: Lado del hash en bits
+
+    Returns:
+        Array uint64 (N,)
+    """
+    pixels = np.asarray(thumbnails, dtype=np.float64)
+    dct = _dct_matrix(pixels.shape[-1], hash_size)
+    low = dct @ pixels @ dct.T
+    flat = low.reshape(len(pixels), -1)
+    median = np.median(flat, axis=1, keepdims=True)
+    return pack_bits(flat > median)
+
+
+def hash_batch(thumbnails, method=HASH_DHASH, hash_size=8):
+    """
+    Calcula dHash o pHash para una pila de miniaturas.
+
+    Args:
+        thumbnails: Array de miniaturas con el tamaño de thumbnail_size
+        method: HASH_DHASH o HASH_PHASH
+        hash_size: Lado del hash en bits
+
+    Returns:
+        Array uint64 (N,)
+    """
+    if method == HASH_DHASH:
+        return dhash_batch(thumbnails)
+    if method == HASH_PHASH:
+        return phash_batch(thumbnails, hash_size)
+    raise ValueError(f"Método de hash no válido: {method}")
+
+
+def hash_images(images, method=HASH_DHASH, hash_size=8):
+    """
+    Calcula el hash de varias imágenes PIL.
+
+    Args:
+        images: Lista de imágenes PIL
+        method: HASH_DHASH o HASH_PHASH
+        hash_size: Lado del hash en bits
+
+    Returns:
+        Array uint64 (N,)
+    """
+    width, height = thumbnail_size(method, hash_size)
+    thumbnails = np.empty((len(images), height, width), dtype=np.uint8)
+    for img, out in zip(images, thumbnails):
+        hash_thumbnail(img, method, hash_size, out)
+    return hash_batch(thumbnails, method, hash_size)
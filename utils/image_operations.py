@@ -3,116 +3,375 @@ Operaciones con imágenes.
 """
 import os
 import logging
+import numpy as np
 from PIL import Image
 
+from utils.job_journal import JobJournal, atomic_save_image, remove_stale_partials
+from utils.memory_budget import (
+    COMPOSITE_STRIP_PIXELS, estimate_image_file_memory, run_with_memory_budget
+)
+
 logger = logging.getLogger(__name__)
 
+# Modos con banda alfa explícita
+ALPHA_MODES = ('RGBA', 'RGBa', 'LA', 'La', 'PA')
+
+# Un píxel RGBA como entero de 32 bits con R en el byte bajo
+_PIXEL_DTYPE = np.dtype('<u4')
+
+
+def compute_target_size(width, height, resolution):
+    """
+    Calcula el tamaño destino manteniendo la relación de aspecto.
+
+    Args:
+        width: Ancho original
+        height: Alto original
+        resolution: Tupla (ancho, alto) para la resolución objetivo
+
+    Returns:
+        Tupla (ancho, alto) destino, o None si no hay que redimensionar
+    """
+    max_res = max(resolution)
+    if width >= max_res and height >= max_res:
+        return None
+
+    # Mantener la relación de aspecto
+    aspect_ratio = width / height
+    if width < height:
+        return int(max_res * aspect_ratio), max_res
+    return max_res, int(max_res / aspect_ratio)
+
+
+def has_alpha(img):
+    """
+    Indica si una imagen lleva transparencia en cualquier forma.
+
+    Cubre los modos con banda alfa (RGBA, LA, PA y sus variantes
+    premultiplicadas) y los modos con color transparente ('transparency'
+    en info), como P, L, RGB o escala de grises de 16 bits.
+
+    Args:
+        img: Imagen PIL
+
+    Returns:
+        True si la imagen tiene transparencia
+    """
+    return img.mode in ALPHA_MODES or 'transparency' in img.info
+
+
+def _strip_to_rgba(img):
+    """
+    Convierte una franja de imagen en un array RGBA de 8 bits.
+
+    Args:
+        img: Imagen PIL en cualquier modo
+
+    Returns:
+        Array HxWx4 uint8 contiguo
+    """
+    if img.mode.startswith('I'):
+        # Escala de grises de 16 bits ('I;16*', o 'I' con rango de 16 bits)
+        values = np.asarray(img)
+        rgba = np.empty(values.shape + (4,), dtype=np.uint8)
+        rgba[..., :3] = (np.clip(values, 0, 65535) >> 8).astype(np.uint8)[..., None]
+        transparency = img.info.get('transparency')
+        rgba[..., 3] = 255 if transparency is None else np.where(values == transparency, 0, 255)
+        return rgba
+
+    if img.mode != 'RGBA':
+        img = img.convert('RGBA')
+    # tobytes + frombuffer es bastante más rápido que np.asarray(img)
+    return np.frombuffer(img.tobytes(), dtype=np.uint8).reshape(img.height, img.width, 4)
+
+
+def _blend_strip(rgba, background, out):
+    """
+    Mezcla una franja RGBA sobre un color de fondo con aritmética entera.
+
+    Cada píxel se trata como un uint32 y se opera con dos canales a la vez
+    (R y B en un registro, G y A en otro, 16 bits por canal), de modo que
+    NumPy recorre el buffer de píxeles sin separar bandas.
+
+    Args:
+        rgba: Array HxWx4 uint8
+        background: Tupla RGB del fondo
+        out: Array HxW '<u4' donde se escriben los píxeles RGBX resultantes
+    """
+    pixels = rgba.view(_PIXEL_DTYPE)[..., 0]
+    alpha = pixels >> 24
+    inverse = 255 - alpha
+    red, green, blue = background
+
+    # color * a + fondo * (255 - a) <= 255 * 255, cabe en cada canal de 16 bits
+    red_blue = (pixels & 0x00FF00FF) * alpha
+    red_blue += (red | (blue << 16)) * inverse
+    green_alpha = ((pixels >> 8) & 0x00FF00FF) * alpha
+    green_alpha += green * inverse
+
+    # División por 255 con redondeo, canal a canal
+    for lanes in (red_blue, green_alpha):
+        lanes += 0x00800080
+        lanes += (lanes >> 8) & 0x00FF00FF
+        lanes >>= 8
+        lanes &= 0x00FF00FF
+
+    np.bitwise_or(red_blue, green_alpha << 8, out=out)
+
 
-def resize_images(directory, resolution=(1216, 1216), add_white_bg=False):
+def flatten_alpha(img, background=(255, 255, 255)):
+    """
+    Compone una imagen sobre un fondo de color y la devuelve en RGB.
+
+    Acepta cualquier modo que lleve transparencia (RGBA, LA, PA, P o L con
+    'transparency', premultiplicados y escala de grises de 16 bits). La
+    mezcla se hace con NumPy sobre franjas horizontales del buffer de
+    píxeles, sin separar las bandas, de modo que la memoria extra no
+    depende del tamaño de la imagen.
+
+    Args:
+        img: Imagen PIL
+        background: Tupla RGB del fondo (default: blanco)
+
+    Returns:
+        Imagen RGB
+    """
+    width, height = img.size
+    canvas = Image.new('RGB', img.size)
+    strip_rows = max(1, COMPOSITE_STRIP_PIXELS // max(width, 1))
+    out = np.empty((min(strip_rows, height), width), dtype=_PIXEL_DTYPE)
+
+    for top in range(0, height, strip_rows):
+        rows = min(strip_rows, height - top)
+        rgba = _strip_to_rgba(img.crop((0, top, width, top + rows)))
+        _blend_strip(rgba, background, out[:rows])
+        strip = Image.frombuffer('RGB', (width, rows), out[:rows], 'raw', 'RGBX', 0, 1)
+        canvas.paste(strip, (0, top))
+    return canvas
+
+
+def _resize_image_file(file_path, resolution, add_white_bg, upscaler=None):
+    """
+    Redimensiona (y opcionalmente aplana) un archivo de imagen en su sitio.
+
+    Args:
+        file_path: Ruta de la imagen
+        resolution: Tupla (ancho, alto) para la resolución objetivo
+        add_white_bg: Si True, añade fondo blanco a PNGs con transparencia
+        upscaler: SuperResolutionUpscaler opcional para las ampliaciones
+    """
+    filename = os.path.basename(file_path)
+    with Image.open(file_path) as img:
+        target_size = compute_target_size(img.width, img.height, resolution)
+
+        if target_size and img.format == 'JPEG':
+            # Decodificación reducida (1/2, 1/4, 1/8) directamente en el decoder
+            img.draft(None, target_size)
+
+        resized_img = img
+        if target_size and upscaler is not None and target_size[0] > img.width:
+            # El modelo amplía por su factor fijo; LANCZOS ajusta al tamaño exacto
+            resized_img = upscaler.upscale(img)
+            logger.debug(f"Imagen {filename} ampliada x{upscaler.scale} con super-resolución")
+            if resized_img.size != target_size:
+                resized_img = resized_img.resize(target_size, Image.LANCZOS, reducing_gap=3.0)
+        elif target_size:
+            # reducing_gap reduce por bloques antes del remuestreo LANCZOS
+            resized_img = img.resize(target_size, Image.LANCZOS, reducing_gap=3.0)
+            logger.debug(f"Imagen {filename} redimensionada a {target_size[0]}x{target_size[1]}")
+
+        # Check if need to add white background
+        if add_white_bg and filename.lower().endswith('.png') and has_alpha(resized_img):
+            resized_img = flatten_alpha(resized_img)
+            logger.debug(f"Fondo blanco añadido a {filename}")
+
+        # Save the image
+        atomic_save_image(resized_img, file_path, img.format)
+
+
+def _add_white_background_file(file_path):
+    """
+    Añade fondo blanco a un PNG en su sitio si tiene transparencia.
+
+    Args:
+        file_path: Ruta del PNG
+
+    Returns:
+        True si la imagen se modificó
+    """
+    with Image.open(file_path) as img:
+        if not has_alpha(img):
+            return False
+        atomic_save_image(flatten_alpha(img), file_path, img.format)
+        logger.debug(f"Fondo blanco añadido a {os.path.basename(file_path)}")
+        return True
+
+
+def _run_image_job(directory, job_name, params, filenames, estimate, process,
+                   max_workers, memory_budget, resume, cancel_event=None):
+    """
+    Ejecuta un trabajo sobre archivos de un directorio con diario de reanudación.
+
+    Los archivos se procesan en orden alfabético; los ya registrados en el
+    diario de una ejecución interrumpida se omiten. El diario se elimina
+    cuando el trabajo termina sin errores ni cancelación.
+
+    Args:
+        directory: Directorio de trabajo (donde vive el diario)
+        job_name: Nombre del trabajo para el diario
+        params: Parámetros que identifican el trabajo
+        filenames: Nombres de archivo a procesar
+        estimate: Función ruta -> bytes estimados en el pico
+        process: Función ruta -> resultado
+        max_workers: Número de hilos
+        memory_budget: Bytes de memoria para imágenes simultáneas
+        resume: Si True, continúa desde el diario existente
+        cancel_event: threading.Event opcional; si se activa no se empiezan más archivos
+
+    Returns:
+        Lista de tuplas (ruta, resultado, excepción) de los archivos procesados
+    """
+    remove_stale_partials(directory)
+    journal = JobJournal(directory, job_name, params, resume)
+
+    def process_and_record(file_path):
+        result = process(file_path)
+        journal.mark_done(os.path.basename(file_path))
+        return result
+
+    pending = [
+        os.path.join(directory, filename)
+        for filename in sorted(filenames)
+        if not journal.is_done(filename)
+    ]
+    try:
+        results = run_with_memory_budget(
+            pending, estimate, process_and_record, max_workers, memory_budget, cancel_event
+        )
+    except BaseException:
+        journal.close()
+        raise
+
+    cancelled = cancel_event is not None and cancel_event.is_set()
+    journal.close(finished=not cancelled and all(error is None for _, _, error in results))
+    return results
+
+
+def resize_images(directory, resolution=(1216, 1216), add_white_bg=False,
+                  max_workers=None, memory_budget=None, upscaler=None, resume=True,
+                  cancel_event=None):
     """
     Redimensiona imágenes en un directorio.
+
+    Las imágenes se admiten en el pool de hilos según el pico de memoria
+    estimado a partir de su cabecera. Con un modelo de super-resolución las
+    imágenes se procesan de una en una, ya que el paralelismo está en los
+    tiles de cada imagen. Cada imagen se reemplaza de forma atómica y se
+    registra en un diario, de modo que un trabajo interrumpido continúa
+    donde se quedó.
     
     Args:
         directory: Directorio con las imágenes
         resolution: Tupla (ancho, alto) para la resolución objetivo
         add_white_bg: Si True, añade fondo blanco a PNGs con transparencia
+        max_workers: Número de hilos (default: núcleos disponibles)
+        memory_budget: Bytes de memoria para imágenes simultáneas (default: mitad de la RAM)
+        upscaler: SuperResolutionUpscaler para ampliar; None usa solo LANCZOS
+        resume: Si True, omite las imágenes completadas en una ejecución interrumpida
+        cancel_event: threading.Event opcional; si se activa no se empiezan más imágenes
+
+    Returns:
+        Número de imágenes procesadas
     """
     if not isinstance(resolution, tuple) or len(resolution) != 2:
         raise ValueError("La resolución debe ser una tupla de dos valores, por ejemplo, (1024, 1024)")
 
     logger.info(f"Resizing images in {directory} to {resolution}")
-    processed_count = 0
 
-    for filename in os.listdir(directory):
-        if filename.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp')):
-            file_path = os.path.join(directory, filename)
-            try:
-                with Image.open(file_path) as img:
-                    width, height = img.size
-                    max_res = max(resolution)
-
-                    resized_img = img
-                    resized = False
-
-                    if width < max_res or height < max_res:
-                        # Mantener la relación de aspecto
-                        aspect_ratio = width / height
-                        if width < height:
-                            new_width = int(max_res * aspect_ratio)
-                            new_height = max_res
-                        else:
-                            new_width = max_res
-                            new_height = int(max_res / aspect_ratio)
-
-                        resized_img = img.resize((new_width, new_height), Image.LANCZOS)
-                        resized = True
-                        logger.debug(f"Imagen {filename} redimensionada a {new_width}x{new_height}")
-
-                    # Check if need to add white background
-                    if add_white_bg and filename.lower().endswith('.png') and 'A' in resized_img.getbands():
-                        background = Image.new('RGB', resized_img.size, (255, 255, 255))
-                        background.paste(resized_img, mask=resized_img.split()[3])  # 3 is the alpha channel
-                        resized_img = background
-                        logger.debug(f"Fondo blanco añadido a {filename}")
-
-                    # Save the image
-                    resized_img.save(file_path)
-                    processed_count += 1
-            except Exception as e:
-                logger.error(f"Error processing {filename}: {e}")
+    filenames = [
+        filename for filename in os.listdir(directory)
+        if filename.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp'))
+    ]
 
-    logger.info(f"Processed {processed_count} images")
+    if upscaler is not None:
+        max_workers = 1
 
+    def estimate(file_path):
+        return estimate_image_file_memory(
+            file_path,
+            lambda width, height: compute_target_size(width, height, resolution),
+            flatten=add_white_bg and file_path.lower().endswith('.png'),
+            upscale_factor=upscaler.scale if upscaler is not None else 1
+        )
 
-def add_white_background_to_images(directory):
-    """
-    Añade fondo blanco a imágenes PNG con transparencia.
-    
-    Args:
-        directory: Directorio con las imágenes PNG
-    """
-    logger.info(f"Adding white background to PNG images in {directory}")
-    processed_count = 0
+    results = _run_image_job(
+        directory,
+        'resize_images',
+        {'resolution': resolution, 'add_white_bg': add_white_bg, 'upscaler': upscaler is not None},
+        filenames,
+        estimate,
+        lambda file_path: _resize_image_file(file_path, resolution, add_white_bg, upscaler),
+        max_workers,
+        memory_budget,
+        resume,
+        cancel_event
+    )
 
-    for filename in os.listdir(directory):
-        if filename.lower().endswith('.png'):
-            file_path = os.path.join(directory, filename)
-            try:
-                with Image.open(file_path) as img:
-                    if 'A' in img.getbands():
-                        background = Image.new('RGB', img.size, (255, 255, 255))
-                        background.paste(img, mask=img.split()[3])  # 3 is the alpha channel
-                        background.save(file_path)
-                        logger.debug(f"Fondo blanco añadido a {filename}")
-                        processed_count += 1
-            except Exception as e:
-                logger.error(f"Error processing {filename}: {e}")
+    processed_count = 0
+    for file_path, _, error in results:
+        if error is not None:
+            logger.error(f"Error processing {os.path.basename(file_path)}: {error}")
+        else:
+            processed_count += 1
 
-    logger.info(f"Processed {processed_count} PNG images with transparency")
+    logger.info(f"Processed {processed_count} images")
+    return processed_count
 
 
-def convert_webp_to_png(directory):
+def add_white_background_to_images(directory, max_workers=None, memory_budget=None, resume=True,
+                                   cancel_event=None):
     """
-    Convierte archivos WebP y WebM a PNG.
+    Añade fondo blanco a imágenes PNG con transparencia.
+
+    Cada imagen se reemplaza de forma atómica y se registra en un diario
+    para poder reanudar un trabajo interrumpido.
     
     Args:
-        directory: Directorio con los archivos a convertir
+        directory: Directorio con las imágenes PNG
+        max_workers: Número de hilos (default: núcleos disponibles)
+        memory_budget: Bytes de memoria para imágenes simultáneas (default: mitad de la RAM)
+        resume: Si True, omite las imágenes completadas en una ejecución interrumpida
+        cancel_event: threading.Event opcional; si se activa no se empiezan más imágenes
+
+    Returns:
+        Número de imágenes a las que se añadió fondo blanco
     """
-    logger.info(f"Converting WebP/WebM files to PNG in {directory}")
-    converted_count = 0
+    logger.info(f"Adding white background to PNG images in {directory}")
 
-    for file in os.listdir(directory):
-        if file.endswith((".webp", ".webm")):
-            webp_path = os.path.join(directory, file)
-            png_path = os.path.splitext(webp_path)[0] + ".png"
+    filenames = [
+        filename for filename in os.listdir(directory)
+        if filename.lower().endswith('.png')
+    ]
 
-            try:
-                with Image.open(webp_path) as img:
-                    img.save(png_path, "PNG")
-                    logger.info(f"Converted: {file} to PNG")
-                    converted_count += 1
-            except Exception as e:
-                logger.error(f"Error converting {file}: {e}")
+    results = _run_image_job(
+        directory,
+        'add_white_background',
+        {},
+        filenames,
+        lambda file_path: estimate_image_file_memory(file_path, flatten=True),
+        _add_white_background_file,
+        max_workers,
+        memory_budget,
+        resume,
+        cancel_event
+    )
 
-    logger.info(f"Converted {converted_count} files")
+    processed_count = 0
+    for file_path, modified, error in results:
+        if error is not None:
+            logger.error(f"Error processing {os.path.basename(file_path)}: {error}")
+        elif modified:
+            processed_count += 1
 
+    logger.info(f"Processed {processed_count} PNG images with transparency")
+    return processed_count
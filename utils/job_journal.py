@@ -0,0 +1,195 @@
+"""
+Diario de trabajos reanudables y escritura atómica de archivos.
+"""
+import os
+import json
+import tempfile
+import threading
+import logging
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Sufijo de los archivos temporales de escritura atómica
+PARTIAL_SUFFIX = '.partial'
+
+
+def atomic_write(path, write, verify=None, temp_prefix=''):
+    """
+    Escribe un archivo a través de un temporal en el mismo directorio y os.replace.
+
+    Si el proceso muere a mitad de la escritura, el archivo destino conserva
+    su contenido anterior.
+
+    Args:
+        path: Ruta final
+        write: Función que recibe un archivo binario abierto y escribe el contenido
+        verify: Función opcional que recibe la ruta temporal y lanza si no es válida
+        temp_prefix: Prefijo del temporal para que remove_stale_partials limpie
+            solo los de un escritor concreto
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(
+        prefix=f".{temp_prefix}{os.path.basename(path)}.", suffix=PARTIAL_SUFFIX, dir=directory
+    )
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        if verify is not None:
+            verify(temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def atomic_save_image(img, path, format=None, verify=False, temp_prefix='', **params):
+    """
+    Guarda una imagen PIL de forma atómica.
+
+    Args:
+        img: Imagen PIL
+        path: Ruta final
+        format: Formato PIL (default: deducido de la extensión de path)
+        verify: Si True, reabre y verifica el temporal antes de reemplazar
+        temp_prefix: Prefijo del temporal (ver atomic_write)
+        **params: Opciones de guardado de Pillow
+    """
+    if format is None:
+        Image.init()
+        format = Image.EXTENSION[os.path.splitext(path)[1].lower()]
+
+    def check(temp_path):
+        with Image.open(temp_path) as written:
+            written.verify()
+        with Image.open(temp_path) as written:
+            if written.size != img.size:
+                raise ValueError(f"written size {written.size} does not match {img.size}")
+
+    atomic_write(path, lambda f: img.save(f, format, **params), check if verify else None, temp_prefix)
+
+
+def remove_stale_partials(directory, temp_prefix=''):
+    """
+    Elimina temporales de escrituras atómicas interrumpidas.
+
+    Args:
+        directory: Directorio a limpiar
+        temp_prefix: Si se indica, solo se eliminan los temporales con este prefijo
+
+    Returns:
+        Número de archivos eliminados
+    """
+    removed = 0
+    for filename in os.listdir(directory):
+        if filename.startswith('.' + temp_prefix) and filename.endswith(PARTIAL_SUFFIX):
+            try:
+                os.remove(os.path.join(directory, filename))
+                removed += 1
+            except OSError as e:
+                logger.warning(f"Could not remove stale temp file {filename}: {e}")
+    if removed:
+        logger.info(f"Removed {removed} stale temp files in {directory}")
+    return removed
+
+
+class JobJournal:
+    """
+    Diario append-only de los elementos completados de un trabajo.
+
+    La primera línea guarda el nombre y los parámetros del trabajo; cada
+    línea siguiente es un elemento completado. Un diario con otros
+    parámetros se descarta y el trabajo empieza de cero.
+    """
+
+    def __init__(self, directory, job_name, params=None, resume=True):
+        """
+        Args:
+            directory: Directorio donde se guarda el diario
+            job_name: Nombre del trabajo (p. ej. 'resize_images')
+            params: Diccionario serializable con los parámetros del trabajo
+            resume: Si False, descarta cualquier diario previo
+        """
+        self.path = os.path.join(directory, f".{job_name}.journal")
+        # Ida y vuelta por JSON para comparar con lo leído del disco (tuplas -> listas)
+        self.header = json.loads(json.dumps({'job': job_name, 'params': params or {}}))
+        self.completed = set()
+        self._lock = threading.Lock()
+        self._truncated = False
+
+        if resume:
+            self._load()
+        mode = 'a' if self.completed else 'w'
+        self._file = open(self.path, mode, encoding='utf-8')
+        if mode == 'w':
+            self._append(self.header)
+        elif self._truncated:
+            # Terminar la línea cortada para no pegarle la siguiente entrada
+            self._file.write('\n')
+
+        if self.completed:
+            logger.info(f"Resuming {job_name}: {len(self.completed)} items already done")
+
+    def _load(self):
+        """Carga los elementos completados si el diario es del mismo trabajo."""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                content = f.read()
+        except (OSError, UnicodeDecodeError) as e:
+            logger.warning(f"Could not read job journal {self.path}: {e}")
+            return
+
+        lines = content.splitlines()
+        self._truncated = bool(content) and not content.endswith('\n')
+        if not lines or self._parse(lines[0]) != self.header:
+            logger.info(f"Job journal {self.path} belongs to a different job, starting over")
+            return
+        for line in lines[1:]:
+            item = self._parse(line)
+            # Una última línea truncada por una interrupción se ignora
+            if isinstance(item, str):
+                self.completed.add(item)
+
+    @staticmethod
+    def _parse(line):
+        try:
+            return json.loads(line)
+        except ValueError:
+            return None
+
+    def _append(self, value):
+        self._file.write(json.dumps(value, ensure_ascii=False) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def is_done(self, item):
+        """Indica si un elemento ya se completó en una ejecución anterior."""
+        return item in self.completed
+
+    def mark_done(self, item):
+        """
+        Registra un elemento como completado.
+
+        Args:
+            item: Identificador del elemento (p. ej. nombre de archivo)
+        """
+        with self._lock:
+            if item not in self.completed:
+                self.completed.add(item)
+                self._append(item)
+
+    def close(self, finished=False):
+        """
+        Cierra el diario.
+
+        Args:
+            finished: Si True, el trabajo terminó sin errores y el diario se elimina
+        """
+        self._file.close()
+        if finished and os.path.exists(self.path):
+            os.remove(self.path)
@@ -2,13 +2,51 @@
 Operaciones para extracción de keyframes de videos.
 """
 import os
+import json
+import shutil
+import tempfile
 import subprocess
+import threading
 import logging
-import imagehash
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 from PIL import Image, ImageSequence
 
+from utils.hash_index import MultiIndexHash
+from utils.hash_store import HashStore
+from utils.image_hashing import HASH_DHASH, dhash_batch, hash_thumbnail, thumbnail_size
+from utils.job_journal import JobJournal, atomic_save_image, atomic_write
+
 logger = logging.getLogger(__name__)
 
+# Hilos de codificación PNG por defecto
+DEFAULT_WRITER_WORKERS = 4
+# Diferencia de hash a partir de la cual dos frames se consideran distintos
+DEFAULT_CUTOFF = 5
+
+# Modos de selección de frames de video
+KEYFRAME_MODE_KEYFRAMES = 'keyframes'
+KEYFRAME_MODE_SCENE = 'scene'
+KEYFRAME_MODES = (KEYFRAME_MODE_KEYFRAMES, KEYFRAME_MODE_SCENE)
+# Umbral por defecto del detector de cambios de escena de ffmpeg (0-1)
+DEFAULT_SCENE_THRESHOLD = 0.3
+# Tamaño de la copia reducida sobre la que se calcula el hash
+HASH_PREVIEW_SIZE = (320, 240)
+# Frames que se hashean juntos y memoria máxima de frames de video retenidos por lote
+DEFAULT_HASH_BATCH = 16
+HASH_BATCH_BYTES = 64 << 20
+
+# Animaciones que se decodifican con Pillow y videos que se decodifican con ffmpeg
+ANIMATION_EXTENSIONS = ('.gif', '.apng')
+VIDEO_EXTENSIONS = ('.webm', '.mp4', '.mkv')
+KEYFRAME_SOURCE_EXTENSIONS = ANIMATION_EXTENSIONS + VIDEO_EXTENSIONS
+# Hilos de codificación PNG de cada extracción dentro de un lote
+BATCH_WRITER_WORKERS = 2
+# Registro de fuentes fallidas de un lote, dentro de la carpeta de salida
+BATCH_FAILURES_FILE = 'keyframes_failed.json'
+
 
 def ensure_dir(directory):
     """
@@ -22,99 +60,634 @@ def ensure_dir(directory):
         logger.debug(f"Created directory: {directory}")
 
 
-def extract_gif_frames(gif_path, output_dir, hash_size=8, cutoff=5):
+def save_png_frame(img, path):
+    """
+    Guarda un frame como PNG de forma atómica.
+
+    Args:
+        img: Imagen PIL
+        path: Ruta de salida
+    """
+    atomic_save_image(img, path, 'PNG')
+
+
+class FrameWriter:
+    """
+    Codifica y guarda frames en un pool de hilos.
+
+    Como mucho hay 2 x max_workers frames pendientes: submit bloquea
+    cuando el pool va por detrás, de modo que la memoria no crece con la
+    longitud del video.
+    """
+
+    def __init__(self, max_workers=DEFAULT_WRITER_WORKERS, save_frame=save_png_frame):
+        """
+        Args:
+            max_workers: Hilos de codificación
+            save_frame: Función (imagen, ruta) que escribe cada frame
+        """
+        self._save_frame = save_frame
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._pending = threading.Semaphore(2 * max_workers)
+        self._errors = []
+
+    def submit(self, img, path):
+        """
+        Encola una imagen para guardarla.
+
+        Args:
+            img: Imagen PIL propia del llamador (no debe modificarse después)
+            path: Ruta de salida
+
+        Raises:
+            Exception: El primer error de una escritura anterior
+        """
+        if self._errors:
+            raise self._errors[0]
+        self._pending.acquire()
+        self._executor.submit(self._save, img, path)
+
+    def _save(self, img, path):
+        try:
+            self._save_frame(img, path)
+            logger.debug(f"Saved frame to {path}")
+        except Exception as e:
+            self._errors.append(e)
+        finally:
+            self._pending.release()
+
+    def close(self):
+        """
+        Espera a que terminen las escrituras pendientes.
+
+        Raises:
+            Exception: El primer error de escritura, si lo hubo
+        """
+        self._executor.shutdown(wait=True)
+        if self._errors:
+            raise self._errors[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._executor.shutdown(wait=True)
+
+
+def iter_gif_frames(gif_path):
+    """
+    Recorre los frames de un GIF decodificándolos de uno en uno.
+
+    El frame devuelto es la propia imagen abierta situada en ese frame, así
+    que solo es válido hasta la siguiente iteración; hay que copiarlo si se
+    necesita conservarlo.
+
+    Args:
+        gif_path: Ruta del archivo GIF
+
+    Yields:
+        Tupla (índice, frame)
+    """
+    with Image.open(gif_path) as img:
+        for i, frame in enumerate(ImageSequence.Iterator(img)):
+            yield i, frame
+
+
+def select_unique_frames(frames, index, hash_size=8, batch_size=DEFAULT_HASH_BATCH, preview_size=None):
+    """
+    Filtra un flujo de frames descartando los casi-duplicados.
+
+    Las miniaturas de cada lote se escriben en una pila reservada una vez
+    y su dHash se calcula en una sola pasada vectorizada; después cada hash
+    se contrasta con el índice en orden. Cada frame recibido debe seguir
+    siendo válido durante batch_size iteraciones, y cada frame devuelto
+    solo hasta que se pida el siguiente.
+
+    Args:
+        frames: Iterable de tuplas (índice, imagen PIL)
+        index: MultiIndexHash con el radio de rechazo (se actualiza)
+        hash_size: Tamaño del hash
+        batch_size: Frames por lote
+        preview_size: Tamaño al que reducir cada frame antes de la miniatura (None: directo)
+
+    Yields:
+        Tuplas (índice, imagen PIL) de los frames conservados
+    """
+    width, height = thumbnail_size(HASH_DHASH, hash_size)
+    thumbnails = np.empty((batch_size, height, width), dtype=np.uint8)
+    pending = []
+
+    def flush():
+        values = dhash_batch(thumbnails[:len(pending)]).tolist()
+        for (i, frame), value in zip(pending, values):
+            if index.add_if_new(value):
+                yield i, frame
+
+    for i, frame in frames:
+        source = frame
+        if preview_size is not None and frame.size != preview_size:
+            source = frame.resize(preview_size, Image.BILINEAR, reducing_gap=2.0)
+        hash_thumbnail(source, HASH_DHASH, hash_size, thumbnails[len(pending)])
+        pending.append((i, frame))
+        if len(pending) == batch_size:
+            yield from flush()
+            pending = []
+    if pending:
+        yield from flush()
+
+
+def frame_base_name(source_path):
+    """
+    Nombre base de los frames extraídos de una fuente.
+
+    Incluye la extensión de la fuente para que clip.webm y clip.mp4 (o
+    clip.gif y clip.apng) no se sobrescriban en la misma carpeta de salida.
+
+    Args:
+        source_path: Ruta de la animación o el video
+
+    Returns:
+        Nombre base, p. ej. 'clip_webm' para clip.webm
+    """
+    stem, ext = os.path.splitext(os.path.basename(source_path))
+    return f"{stem}_{ext[1:].lower()}" if ext else stem
+
+
+def _frame_index(hash_size, cutoff, hash_store=None):
+    """
+    Crea el índice de casi-duplicados de una fuente.
+
+    Args:
+        hash_size: Tamaño del hash
+        cutoff: Umbral de diferencia para considerar frames únicos
+        hash_store: HashStore opcional compartido entre fuentes y ejecuciones
+
+    Returns:
+        MultiIndexHash propio, o una sesión del almacén (su radio manda sobre cutoff)
+    """
+    if hash_store is None:
+        return MultiIndexHash(cutoff - 1, hash_size * hash_size)
+    if hash_store.bits != hash_size * hash_size:
+        raise ValueError(f"hash_size {hash_size} does not match the {hash_store.bits}-bit hash store")
+    return hash_store.session()
+
+
+def extract_gif_frames(gif_path, output_dir, hash_size=8, cutoff=5, max_workers=DEFAULT_WRITER_WORKERS,
+                       hash_store=None, save_frame=save_png_frame, extension='.png'):
     """
     Extrae frames únicos de un archivo GIF usando hash de imágenes.
-    
+
+    Los frames se decodifican de uno en uno y se hashean por lotes
+    pequeños; solo los conservados se codifican en segundo plano, así que
+    la memoria no depende de la longitud del GIF.
+
     Args:
         gif_path: Ruta del archivo GIF
         output_dir: Directorio de salida para los frames
         hash_size: Tamaño del hash (default: 8)
         cutoff: Umbral de diferencia para considerar frames únicos (default: 5)
+        max_workers: Hilos de codificación PNG
+        hash_store: HashStore opcional para descartar también frames ya
+            extraídos de otras fuentes, incluidas las que se extraen a la vez;
+            su archivo se actualiza al terminar sin errores
+        save_frame: Función (imagen, ruta) que escribe cada frame (default: PNG)
+        extension: Extensión de los archivos de salida
+
+    Returns:
+        Lista de rutas de los frames guardados
     """
     logger.info(f"Extracting frames from GIF: {gif_path}")
-    hashes = []
-    frame_count = 0
+    hashes = _frame_index(hash_size, cutoff, hash_store)
+    written = []
+    base_name = frame_base_name(gif_path)
 
     try:
-        with Image.open(gif_path) as img:
-            frames = [frame.copy() for frame in ImageSequence.Iterator(img)]
-            for i, frame in enumerate(frames):
-                h = imagehash.dhash(frame, hash_size)
-                if not any((h - other) < cutoff for other in hashes):
-                    output_path = os.path.join(
-                        output_dir,
-                        f"{os.path.splitext(os.path.basename(gif_path))[0]}_frame_{i}.png"
-                    )
-                    frame.save(output_path)
-                    hashes.append(h)
-                    frame_count += 1
-                    logger.debug(f"Saved frame {i} to {output_path}")
-
-        logger.info(f"Extracted {frame_count} unique frames from GIF")
+        # Cada frame se copia porque el GIF abierto se reutiliza al pasar al siguiente
+        frames = ((i, frame.copy()) for i, frame in iter_gif_frames(gif_path))
+        with FrameWriter(max_workers, save_frame) as writer, closing(frames):
+            for i, frame in select_unique_frames(frames, hashes, hash_size):
+                output_path = os.path.join(output_dir, f"{base_name}_frame_{i}{extension}")
+                writer.submit(frame, output_path)
+                written.append(output_path)
+
+        if hash_store is not None:
+            hashes.commit()
+        logger.info(f"Extracted {len(written)} unique frames from GIF")
+        return written
     except Exception as e:
         logger.error(f"Error extracting GIF frames: {e}")
         raise
 
 
-def extract_webm_key_frames(webm_path, output_dir, hash_size=8, cutoff=5):
+def read_frame(stream, buffer):
+    """
+    Lee un frame crudo completo de un stream sobre un buffer existente.
+
+    Args:
+        stream: Stream binario (p. ej. stdout de ffmpeg)
+        buffer: Array NumPy contiguo del tamaño de un frame
+
+    Returns:
+        True si se leyó un frame completo, False al llegar al final
+    """
+    view = memoryview(buffer).cast('B')
+    filled = 0
+    while filled < len(view):
+        read = stream.readinto(view[filled:])
+        if not read:
+            if filled:
+                logger.warning(f"Discarding truncated frame ({filled} of {len(view)} bytes)")
+            return False
+        filled += read
+    return True
+
+
+def iter_ffmpeg_frames(cmd, width, height, buffers=1):
+    """
+    Ejecuta ffmpeg con salida rawvideo rgb0 por stdout y recorre sus frames.
+
+    Los frames se leen por turnos sobre un anillo de buffers reservados al
+    empezar, así que cada imagen devuelta es válida durante `buffers`
+    iteraciones. Se usa rgb0 en lugar de rgb24 porque Pillow solo mapea
+    sin copiar buffers de 4 bytes por píxel (RGBX).
+
+    Args:
+        cmd: Comando ffmpeg que escribe rawvideo rgb0 en 'pipe:1'
+        width: Ancho de los frames
+        height: Alto de los frames
+        buffers: Número de buffers del anillo
+
+    Yields:
+        Tupla (índice, imagen PIL RGBX que comparte el buffer)
+
+    Raises:
+        FileNotFoundError: Si ffmpeg no está instalado
+        subprocess.CalledProcessError: Si ffmpeg termina con error
+    """
+    ring = np.empty((buffers, height, width, 4), dtype=np.uint8)
+    images = [Image.frombuffer('RGBX', (width, height), buffer, 'raw', 'RGBX', 0, 1) for buffer in ring]
+
+    with tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr)
+        try:
+            i = 0
+            while read_frame(process.stdout, ring[i % buffers]):
+                yield i, images[i % buffers]
+                i += 1
+        finally:
+            process.stdout.close()
+            if process.poll() is None:
+                # El consumidor se detuvo antes de tiempo (error o cancelación)
+                process.kill()
+            returncode = process.wait()
+
+        if returncode != 0:
+            stderr.seek(0)
+            raise subprocess.CalledProcessError(returncode, cmd, stderr=stderr.read())
+
+
+def probe_video_size(video_path):
+    """
+    Obtiene el tamaño con el que ffmpeg entrega los frames del primer stream de video.
+
+    ffprobe informa del tamaño codificado, pero ffmpeg rota automáticamente
+    los videos con rotación (tag rotate o matriz de visualización, típico
+    de los videos verticales de móvil); con ±90° se intercambian ancho y alto.
+
+    Args:
+        video_path: Ruta del video
+
+    Returns:
+        Tupla (ancho, alto) de los frames ya rotados
+
+    Raises:
+        FileNotFoundError: Si ffprobe no está instalado
+        subprocess.CalledProcessError: Si ffprobe no puede leer el archivo
+    """
+    result = subprocess.run(
+        [
+            'ffprobe', '-v', 'error',
+            '-select_streams', 'v:0',
+            '-show_entries', 'stream=width,height:stream_tags=rotate:stream_side_data=rotation',
+            '-of', 'json',
+            video_path
+        ],
+        check=True, capture_output=True, text=True
+    )
+    stream = json.loads(result.stdout)['streams'][0]
+    width, height = int(stream['width']), int(stream['height'])
+    if video_rotation(stream) % 180 == 90:
+        return height, width
+    return width, height
+
+
+def video_rotation(stream):
+    """
+    Rotación en grados (0-359) de un stream de ffprobe.
+
+    Args:
+        stream: Diccionario del stream en la salida JSON de ffprobe
+
+    Returns:
+        Grados de rotación
+    """
+    rotation = stream.get('tags', {}).get('rotate')
+    for side_data in stream.get('side_data_list', []):
+        if 'rotation' in side_data:
+            rotation = side_data['rotation']
+    try:
+        return round(float(rotation or 0)) % 360
+    except ValueError:
+        return 0
+
+
+def scaled_size(width, height, max_size=None):
+    """
+    Limita el lado mayor de un tamaño manteniendo la relación de aspecto.
+
+    Args:
+        width: Ancho original
+        height: Alto original
+        max_size: Lado mayor máximo (None o 0: tamaño nativo)
+
+    Returns:
+        Tupla (ancho, alto)
+    """
+    if not max_size or max(width, height) <= max_size:
+        return width, height
+    scale = max_size / max(width, height)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def build_ffmpeg_frames_command(video_path, size, native_size, mode=KEYFRAME_MODE_KEYFRAMES,
+                                scene_threshold=DEFAULT_SCENE_THRESHOLD, threads=None):
+    """
+    Construye el comando ffmpeg que envía por stdout los frames seleccionados.
+
+    En modo keyframes el decodificador descarta todo lo que no es keyframe
+    (-skip_frame nokey), así que solo se decodifican los frames que se
+    usan. En modo scene se decodifica todo y se seleccionan el primer frame
+    y los cambios de escena por encima del umbral.
+
+    Args:
+        video_path: Ruta del video
+        size: Tamaño (ancho, alto) de salida
+        native_size: Tamaño (ancho, alto) del video ya rotado (probe_video_size)
+        mode: KEYFRAME_MODE_KEYFRAMES o KEYFRAME_MODE_SCENE
+        scene_threshold: Umbral de cambio de escena (0-1) del modo scene
+        threads: Hilos de decodificación y filtrado de ffmpeg (None: los que elija ffmpeg)
+
+    Returns:
+        Lista de argumentos
+    """
+    if mode not in KEYFRAME_MODES:
+        raise ValueError(f"Modo de extracción no válido: {mode}")
+
+    cmd = ['ffmpeg', '-loglevel', 'error']
+    if threads:
+        cmd += ['-threads', str(threads), '-filter_threads', str(threads)]
+    filters = []
+    if mode == KEYFRAME_MODE_KEYFRAMES:
+        cmd += ['-skip_frame', 'nokey']
+    else:
+        filters.append(f"select='eq(n\\,0)+gt(scene\\,{scene_threshold})'")
+    if size != native_size:
+        filters.append(f"scale={size[0]}:{size[1]}:flags=lanczos")
+
+    cmd += ['-i', video_path]
+    if filters:
+        cmd += ['-vf', ','.join(filters)]
+    cmd += ['-vsync', 'vfr', '-f', 'rawvideo', '-pix_fmt', 'rgb0', 'pipe:1']
+    return cmd
+
+
+def extract_webm_key_frames(webm_path, output_dir, hash_size=8, cutoff=5,
+                            max_workers=DEFAULT_WRITER_WORKERS, max_size=None,
+                            mode=KEYFRAME_MODE_KEYFRAMES, scene_threshold=DEFAULT_SCENE_THRESHOLD,
+                            threads=None, hash_store=None, save_frame=save_png_frame, extension='.png'):
     """
     Extrae keyframes únicos de un archivo WebM usando FFmpeg.
-    
+
+    FFmpeg envía los frames crudos por una tubería; se hashean en memoria
+    sobre una copia reducida y solo se codifican como PNG los que se
+    conservan, a la resolución de salida.
+
     Args:
         webm_path: Ruta del archivo WebM
         output_dir: Directorio de salida para los keyframes
         hash_size: Tamaño del hash (default: 8)
         cutoff: Umbral de diferencia para considerar frames únicos (default: 5)
+        max_workers: Hilos de codificación PNG
+        max_size: Lado mayor máximo de los frames guardados (None: nativo)
+        mode: KEYFRAME_MODE_KEYFRAMES (solo keyframes) o KEYFRAME_MODE_SCENE
+        scene_threshold: Umbral de cambio de escena (0-1) del modo scene
+        threads: Hilos de ffmpeg (None: los que elija ffmpeg)
+        hash_store: HashStore opcional para descartar también frames ya
+            extraídos de otras fuentes, incluidas las que se extraen a la vez;
+            su archivo se actualiza al terminar sin errores
+        save_frame: Función (imagen, ruta) que escribe cada frame (default: PNG)
+        extension: Extensión de los archivos de salida
+
+    Returns:
+        Lista de rutas de los keyframes guardados
     """
     logger.info(f"Extracting keyframes from WebM: {webm_path}")
-    temp_pattern = os.path.join(output_dir, "temp_%04d.png")
-    
-    cmd = [
-        'ffmpeg',
-        '-i', webm_path,
-        '-vf', "select='eq(pict_type\\,I)',scale=320:240,format=rgb24",
-        '-vsync', 'vfr',
-        '-frame_pts', 'true',
-        temp_pattern
-    ]
-    
+
+    hashes = _frame_index(hash_size, cutoff, hash_store)
+    base_name = frame_base_name(webm_path)
+    written = []
+
     try:
-        subprocess.run(cmd, check=True, capture_output=True)
-        logger.debug("FFmpeg extraction completed")
+        native_size = probe_video_size(webm_path)
+        width, height = scaled_size(*native_size, max_size)
+        cmd = build_ffmpeg_frames_command(
+            webm_path, (width, height), native_size, mode, scene_threshold, threads
+        )
+
+        batch_size = max(1, min(DEFAULT_HASH_BATCH, HASH_BATCH_BYTES // (width * height * 4)))
+        frames = iter_ffmpeg_frames(cmd, width, height, buffers=batch_size)
+        with FrameWriter(max_workers, save_frame) as writer, closing(frames):
+            for _, frame in select_unique_frames(frames, hashes, hash_size, batch_size, HASH_PREVIEW_SIZE):
+                output_path = os.path.join(output_dir, f"{base_name}_key_frame_{len(written)}{extension}")
+                writer.submit(frame.convert('RGB'), output_path)
+                written.append(output_path)
+
+        if hash_store is not None:
+            hashes.commit()
+        logger.info(f"Extracted {len(written)} unique keyframes from WebM")
+        return written
     except subprocess.CalledProcessError as e:
-        logger.error(f"FFmpeg error: {e.stderr.decode() if e.stderr else 'Unknown error'}")
+        stderr = e.stderr.decode(errors='replace') if isinstance(e.stderr, bytes) else e.stderr
+        logger.error(f"FFmpeg error: {stderr or 'Unknown error'}")
         raise
     except FileNotFoundError:
         logger.error("FFmpeg not found. Please install FFmpeg.")
         raise
-
-    hashes = []
-    i = 0
-    keyframe_count = 0
-
-    try:
-        while True:
-            temp_image_path = temp_pattern % i
-            if not os.path.exists(temp_image_path):
-                break
-            
-            with Image.open(temp_image_path) as img:
-                h = imagehash.dhash(img, hash_size)
-                if not any((h - other) < cutoff for other in hashes):
-                    output_path = os.path.join(
-                        output_dir,
-                        f"{os.path.splitext(os.path.basename(webm_path))[0]}_key_frame_{len(hashes)}.png"
-                    )
-                    img.save(output_path)
-                    hashes.append(h)
-                    keyframe_count += 1
-                    logger.debug(f"Saved keyframe {keyframe_count} to {output_path}")
-            os.remove(temp_image_path)
-            i += 1
-
-        logger.info(f"Extracted {keyframe_count} unique keyframes from WebM")
     except Exception as e:
         logger.error(f"Error processing extracted frames: {e}")
         raise
 
+
+def extract_keyframes(source_path, output_dir, hash_size=8, cutoff=5,
+                      max_workers=DEFAULT_WRITER_WORKERS, **video_options):
+    """
+    Extrae los frames únicos de una animación o un video según su extensión.
+
+    Args:
+        source_path: Ruta del GIF, APNG, WebM, MP4 o MKV
+        output_dir: Directorio de salida para los frames
+        hash_size: Tamaño del hash
+        cutoff: Umbral de diferencia para considerar frames únicos
+        max_workers: Hilos de codificación PNG
+        **video_options: Opciones de extract_webm_key_frames (max_size, mode, hash_store, ...)
+
+    Returns:
+        Lista de rutas de los frames guardados
+
+    Raises:
+        ValueError: Si la extensión no está soportada
+    """
+    ext = os.path.splitext(source_path)[1].lower()
+    if ext in ANIMATION_EXTENSIONS:
+        return extract_gif_frames(
+            source_path, output_dir, hash_size, cutoff, max_workers, video_options.get('hash_store')
+        )
+    if ext in VIDEO_EXTENSIONS:
+        return extract_webm_key_frames(source_path, output_dir, hash_size, cutoff, max_workers, **video_options)
+    raise ValueError(f"Unsupported format: {ext}")
+
+
+def list_keyframe_sources(folder):
+    """
+    Lista las animaciones y videos de una carpeta ordenados por nombre.
+
+    Args:
+        folder: Carpeta de origen
+
+    Returns:
+        Lista de nombres de archivo
+    """
+    return sorted(
+        entry.name for entry in os.scandir(folder)
+        if entry.is_file() and entry.name.lower().endswith(KEYFRAME_SOURCE_EXTENSIONS)
+    )
+
+
+def extract_keyframes_batch(source_folder, output_folder, max_jobs=None, progress_callback=None,
+                            cancel_event=None, resume=True, global_dedupe=False, **extract_options):
+    """
+    Extrae los keyframes de todas las animaciones y videos de una carpeta.
+
+    Se ejecutan hasta max_jobs extracciones a la vez y los núcleos se
+    reparten entre ellas (-threads de ffmpeg = núcleos / trabajos). Los
+    frames van a output_folder/Output y cada origen terminado se mueve a
+    output_folder/Success. Las fuentes que fallan se quedan en su sitio y
+    se registran en output_folder/keyframes_failed.json. Un diario marca
+    las fuentes terminadas, así que un lote interrumpido se reanuda sin
+    repetirlas aunque no llegaran a moverse. Con global_dedupe, los frames
+    casi iguales a cualquiera ya extraído en Output (en este lote o en
+    ejecuciones anteriores) se descartan.
+
+    Args:
+        source_folder: Carpeta con los GIF/APNG/WebM/MP4/MKV
+        output_folder: Carpeta donde se crean Output y Success
+        max_jobs: Extracciones simultáneas (default: núcleos disponibles)
+        progress_callback: Función (completados, total, nombre) llamada tras cada fuente
+        cancel_event: threading.Event que impide empezar nuevas fuentes al activarse
+        resume: Si True, reutiliza el diario de un lote interrumpido
+        global_dedupe: Si True, usa el almacén de hashes persistente de Output
+        **extract_options: Opciones de extract_keyframes (hash_size, cutoff, max_size, mode, ...)
+
+    Returns:
+        Diccionario con 'extracted' (fuentes), 'frames' (frames guardados),
+        'failed' ({nombre: error}) y 'cancelled' (bool)
+    """
+    output_dir = os.path.join(output_folder, "Output")
+    success_dir = os.path.join(output_folder, "Success")
+    ensure_dir(output_dir)
+    ensure_dir(success_dir)
+
+    cores = os.cpu_count() or 1
+    max_jobs = max(1, min(max_jobs or cores, cores))
+    extract_options.setdefault('max_workers', BATCH_WRITER_WORKERS)
+    extract_options.setdefault('threads', max(1, cores // max_jobs))
+
+    sources = list_keyframe_sources(source_folder)
+    params = {
+        'source_folder': os.path.abspath(source_folder),
+        'options': extract_options,
+        'global_dedupe': global_dedupe,
+    }
+    journal = JobJournal(output_folder, 'keyframes_batch', params, resume)
+    hash_store = None
+    if global_dedupe:
+        hash_size = extract_options.get('hash_size', 8)
+        hash_store = HashStore(
+            output_dir, extract_options.get('cutoff', DEFAULT_CUTOFF) - 1, hash_size * hash_size
+        )
+    failures_path = os.path.join(output_folder, BATCH_FAILURES_FILE)
+
+    total = len(sources)
+    results = {'extracted': 0, 'frames': 0, 'failed': {}, 'cancelled': False}
+    lock = threading.Lock()
+    done = 0
+    logger.info(
+        f"Batch keyframe extraction of {total} files from {source_folder} "
+        f"({max_jobs} jobs, {extract_options['threads']} ffmpeg threads each)"
+    )
+
+    def record_failures():
+        content = json.dumps(results['failed'], ensure_ascii=False, indent=2).encode('utf-8')
+        atomic_write(failures_path, lambda f: f.write(content))
+
+    def process(name):
+        nonlocal done
+        source_path = os.path.join(source_folder, name)
+        error = None
+        frames = 0
+        try:
+            if not journal.is_done(name):
+                if cancel_event is not None and cancel_event.is_set():
+                    return
+                frames = len(extract_keyframes(source_path, output_dir, hash_store=hash_store, **extract_options))
+                journal.mark_done(name)
+            shutil.move(source_path, os.path.join(success_dir, name))
+        except subprocess.CalledProcessError as e:
+            stderr = e.stderr.decode(errors='replace') if isinstance(e.stderr, bytes) else e.stderr
+            error = f"ffmpeg exited with status {e.returncode}: {(stderr or '').strip()}"
+        except Exception as e:
+            logger.error(f"Error extracting keyframes from {source_path}: {e}")
+            error = str(e) or type(e).__name__
+
+        with lock:
+            done += 1
+            if error is None:
+                results['extracted'] += 1
+                results['frames'] += frames
+            else:
+                results['failed'][name] = error
+                record_failures()
+            current = done
+        if progress_callback is not None:
+            progress_callback(current, total, name)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_jobs) as executor:
+            for name in sources:
+                executor.submit(process, name)
+    finally:
+        results['cancelled'] = cancel_event is not None and cancel_event.is_set()
+        journal.close(finished=not results['cancelled'])
+        if hash_store is not None:
+            hash_store.close()
+
+    if not results['failed'] and os.path.exists(failures_path):
+        os.remove(failures_path)
+    logger.info(
+        f"Batch keyframe extraction finished: {results['extracted']} files, "
+        f"{results['frames']} frames, {len(results['failed'])} failed"
+    )
+    return results
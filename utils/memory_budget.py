@@ -0,0 +1,207 @@
+"""
+Estimación de memoria y planificación de trabajos de imagen con presupuesto de memoria.
+"""
+import os
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Presupuesto por defecto: fracción de la memoria física disponible
+DEFAULT_BUDGET_FRACTION = 0.5
+# Presupuesto usado si no se puede consultar la memoria física (2 GiB)
+FALLBACK_BUDGET_BYTES = 2 * 1024 ** 3
+# Píxeles por franja al componer sobre un fondo
+COMPOSITE_STRIP_PIXELS = 1 << 18
+
+
+def bytes_per_pixel(mode):
+    """
+    Devuelve los bytes por píxel que Pillow reserva para un modo.
+
+    Pillow almacena las imágenes de varias bandas en píxeles de 32 bits
+    (incluidas RGB y LA), por lo que solo los modos de una banda son más
+    compactos.
+
+    Args:
+        mode: Modo de la imagen (p. ej. 'RGB', 'L', 'I;16')
+
+    Returns:
+        Bytes por píxel
+    """
+    if mode in ('1', 'L', 'P'):
+        return 1
+    if mode.startswith('I;16'):
+        return 2
+    return 4
+
+
+def estimate_peak_memory(width, height, mode, target_size=None, flatten=False, upscale_factor=1):
+    """
+    Estima el pico de memoria de procesar una imagen.
+
+    Args:
+        width: Ancho original
+        height: Alto original
+        mode: Modo de la imagen original
+        target_size: Tupla (ancho, alto) si se va a redimensionar
+        flatten: Si True, se compone sobre un fondo RGB
+        upscale_factor: Factor de un modelo de super-resolución previo al redimensionado
+
+    Returns:
+        Bytes estimados en el pico
+    """
+    decoded = width * height * bytes_per_pixel(mode)
+    peak = decoded
+    if upscale_factor > 1:
+        # Entrada RGB en NumPy, salida del modelo en NumPy y su copia PIL
+        peak += width * height * 3
+        peak += width * height * upscale_factor ** 2 * (3 + 4)
+    out_width, out_height = target_size or (width, height)
+    if target_size:
+        # Copia redimensionada, en el modo de la original
+        peak += out_width * out_height * bytes_per_pixel(mode)
+    if flatten:
+        # Lienzo RGB más los buffers de una franja de trabajo
+        peak += out_width * out_height * 4
+        peak += min(out_width * out_height, COMPOSITE_STRIP_PIXELS) * 12
+    return peak
+
+
+def estimate_image_file_memory(file_path, target_size_func=None, flatten=False, upscale_factor=1):
+    """
+    Estima el pico de memoria de un archivo leyendo solo su cabecera.
+
+    Args:
+        file_path: Ruta de la imagen
+        target_size_func: Función (ancho, alto) -> tamaño destino o None
+        flatten: Si True, se compone sobre un fondo RGB
+        upscale_factor: Factor de un modelo de super-resolución previo al redimensionado
+
+    Returns:
+        Bytes estimados, o 0 si no se puede leer la cabecera
+    """
+    try:
+        # Image.open solo lee la cabecera; los píxeles no se decodifican aquí
+        with Image.open(file_path) as img:
+            width, height = img.size
+            mode = img.mode
+    except Exception as e:
+        logger.debug(f"Could not read header of {file_path}: {e}")
+        return 0
+
+    target_size = target_size_func(width, height) if target_size_func else None
+    if not target_size or target_size[0] <= width:
+        upscale_factor = 1
+    return estimate_peak_memory(width, height, mode, target_size, flatten, upscale_factor)
+
+
+def default_memory_budget():
+    """
+    Calcula el presupuesto de memoria por defecto.
+
+    Returns:
+        Bytes disponibles para trabajos de imagen simultáneos
+    """
+    try:
+        total = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+        return int(total * DEFAULT_BUDGET_FRACTION)
+    except (AttributeError, ValueError, OSError):
+        return FALLBACK_BUDGET_BYTES
+
+
+class MemoryBudget:
+    """Contador de memoria reservada que bloquea mientras no haya hueco."""
+
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self._in_use = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, nbytes):
+        """
+        Reserva memoria, esperando a que haya suficiente libre.
+
+        Un trabajo mayor que el presupuesto completo se admite cuando no hay
+        ningún otro en curso, para que nunca quede bloqueado para siempre.
+
+        Args:
+            nbytes: Bytes a reservar
+
+        Returns:
+            Bytes realmente reservados (a pasar a release)
+        """
+        nbytes = min(nbytes, self.budget_bytes)
+        with self._condition:
+            while self._in_use and self._in_use + nbytes > self.budget_bytes:
+                self._condition.wait()
+            self._in_use += nbytes
+        return nbytes
+
+    def release(self, nbytes):
+        """
+        Libera memoria reservada previamente.
+
+        Args:
+            nbytes: Bytes devueltos por acquire
+        """
+        with self._condition:
+            self._in_use -= nbytes
+            self._condition.notify_all()
+
+
+def run_with_memory_budget(items, estimate, process, max_workers=None, budget_bytes=None,
+                           cancel_event=None):
+    """
+    Procesa elementos en un pool de hilos admitiendo cada uno según su memoria estimada.
+
+    Si se cancela, no se admiten más elementos y se espera a que terminen
+    los que ya estaban en curso.
+
+    Args:
+        items: Iterable de elementos a procesar
+        estimate: Función elemento -> bytes estimados en el pico
+        process: Función elemento -> resultado
+        max_workers: Número máximo de hilos (default: núcleos disponibles)
+        budget_bytes: Presupuesto total de memoria (default: default_memory_budget())
+        cancel_event: threading.Event opcional; si se activa se dejan de admitir elementos
+
+    Returns:
+        Lista de tuplas (elemento, resultado, excepción) en orden de finalización;
+        los elementos no admitidos por una cancelación no aparecen
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    budget = MemoryBudget(budget_bytes or default_memory_budget())
+    slots = threading.Semaphore(max_workers)
+    results = []
+    results_lock = threading.Lock()
+
+    logger.debug(
+        f"Memory budget {budget.budget_bytes / 1024 ** 2:.0f} MiB, {max_workers} workers"
+    )
+
+    def run(item, reserved):
+        try:
+            result, error = process(item), None
+        except Exception as e:
+            result, error = None, e
+        finally:
+            budget.release(reserved)
+            slots.release()
+        with results_lock:
+            results.append((item, result, error))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for item in items:
+            slots.acquire()
+            if cancel_event is not None and cancel_event.is_set():
+                slots.release()
+                logger.info("Cancelled; waiting for the items in progress")
+                break
+            reserved = budget.acquire(estimate(item))
+            executor.submit(run, item, reserved)
+
+    return results
@@ -0,0 +1,210 @@
+"""
+Planificación de emparejamientos entre listas de imágenes.
+
+Un plan genera sus combinaciones bajo demanda a partir del índice, sin
+duplicar las listas de archivos, y se puede serializar a JSON para
+repartirlo en shards entre procesos o máquinas.
+"""
+import sys
+import json
+import math
+import random
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Estrategias de emparejamiento
+STRATEGY_ZIP_WRAP = 'zip_wrap'
+STRATEGY_CARTESIAN = 'cartesian'
+STRATEGY_RANDOM_SAMPLE = 'random_sample'
+STRATEGY_BALANCED = 'balanced'
+STRATEGIES = (STRATEGY_ZIP_WRAP, STRATEGY_CARTESIAN, STRATEGY_RANDOM_SAMPLE, STRATEGY_BALANCED)
+
+PLAN_VERSION = 1
+
+
+class PairPlan:
+    """
+    Plan de combinaciones entre varias listas de archivos.
+
+    Estrategias:
+        zip_wrap: índice a índice, repitiendo las listas más cortas
+            (longitud = la de la lista más larga)
+        cartesian: todas las combinaciones posibles
+        random_sample: `count` combinaciones distintas del producto
+            cartesiano, elegidas con la semilla
+        balanced: como zip_wrap pero barajando cada vuelta de cada lista con
+            la semilla, de modo que cada imagen aparece el mismo número de
+            veces (±1) con compañeros distintos en cada vuelta
+    """
+
+    def __init__(self, sources, strategy=STRATEGY_ZIP_WRAP, count=None, seed=0):
+        """
+        Args:
+            sources: Lista de listas de nombres de archivo (una por directorio)
+            strategy: Estrategia de emparejamiento
+            count: Número de combinaciones (random_sample y balanced)
+            seed: Semilla de las estrategias aleatorias
+        """
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Estrategia de emparejamiento no válida: {strategy}")
+        if not sources or any(not files for files in sources):
+            raise ValueError("Todas las listas de origen deben tener al menos un archivo")
+
+        self.sources = [list(files) for files in sources]
+        self.strategy = strategy
+        self.seed = seed
+        self._lengths = [len(files) for files in self.sources]
+        self._product = math.prod(self._lengths)
+
+        if strategy == STRATEGY_ZIP_WRAP:
+            self.count = max(self._lengths)
+        elif strategy == STRATEGY_CARTESIAN:
+            self.count = self._product
+        elif strategy == STRATEGY_RANDOM_SAMPLE:
+            self.count = min(count or max(self._lengths), self._product)
+        else:
+            self.count = count or max(self._lengths)
+
+        self._sample = None
+        self._permutations = {}
+
+    def __len__(self):
+        return self.count
+
+    def indices(self, index):
+        """
+        Calcula los índices de archivo de la combinación `index`.
+
+        Args:
+            index: Posición en el plan (0 <= index < len(plan))
+
+        Returns:
+            Tupla con un índice por lista de origen
+        """
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+
+        if self.strategy == STRATEGY_ZIP_WRAP:
+            return tuple(index % length for length in self._lengths)
+
+        if self.strategy == STRATEGY_CARTESIAN:
+            return self._unrank(index)
+
+        if self.strategy == STRATEGY_RANDOM_SAMPLE:
+            if self._sample is None:
+                self._sample = self._draw_sample()
+            return self._unrank(self._sample[index])
+
+        return tuple(
+            self._permutation(k, index // length)[index % length]
+            for k, length in enumerate(self._lengths)
+        )
+
+    def _draw_sample(self):
+        """Elige con la semilla `count` índices distintos del producto cartesiano."""
+        rng = random.Random(self.seed)
+        if self._product <= sys.maxsize:
+            # random.sample sobre un range no materializa el producto
+            return rng.sample(range(self._product), self.count)
+
+        # len() de un range mayor que sys.maxsize desborda dentro de
+        # random.sample; con un producto tan grande casi no hay repeticiones
+        seen = set()
+        sample = []
+        while len(sample) < self.count:
+            rank = rng.randrange(self._product)
+            if rank not in seen:
+                seen.add(rank)
+                sample.append(rank)
+        return sample
+
+    def _unrank(self, rank):
+        """Convierte un índice del producto cartesiano en un índice por lista."""
+        result = []
+        for length in reversed(self._lengths):
+            rank, position = divmod(rank, length)
+            result.append(position)
+        return tuple(reversed(result))
+
+    def _permutation(self, source, cycle):
+        """Permutación determinista de la lista `source` para la vuelta `cycle`."""
+        key = (source, cycle)
+        permutation = self._permutations.get(key)
+        if permutation is None:
+            permutation = list(range(self._lengths[source]))
+            random.Random(f"{self.seed}:{source}:{cycle}").shuffle(permutation)
+            # Solo se consultan vueltas consecutivas; no hace falta guardar más
+            if len(self._permutations) >= 4 * len(self._lengths):
+                self._permutations.clear()
+            self._permutations[key] = permutation
+        return permutation
+
+    def files(self, index):
+        """
+        Devuelve los nombres de archivo de la combinación `index`.
+
+        Args:
+            index: Posición en el plan
+
+        Returns:
+            Tupla con un nombre de archivo por lista de origen
+        """
+        return tuple(self.sources[k][i] for k, i in enumerate(self.indices(index)))
+
+    def shard(self, shard_index=0, shard_count=1):
+        """
+        Recorre las posiciones del plan que corresponden a un shard.
+
+        Los shards se intercalan (index % shard_count == shard_index), por lo
+        que tienen tamaños equilibrados y no se solapan.
+
+        Args:
+            shard_index: Shard a recorrer (0 <= shard_index < shard_count)
+            shard_count: Número total de shards
+
+        Yields:
+            Posiciones del plan
+        """
+        if not 0 <= shard_index < shard_count:
+            raise ValueError(f"Shard {shard_index} fuera de rango para {shard_count} shards")
+        return iter(range(shard_index, self.count, shard_count))
+
+    def __iter__(self):
+        return (self.files(index) for index in range(self.count))
+
+    def to_dict(self):
+        """Serializa el plan a un diccionario compatible con JSON."""
+        return {
+            'version': PLAN_VERSION,
+            'strategy': self.strategy,
+            'count': self.count,
+            'seed': self.seed,
+            'sources': self.sources,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Reconstruye un plan serializado con to_dict.
+
+        Args:
+            data: Diccionario del plan
+
+        Returns:
+            PairPlan equivalente
+        """
+        if data.get('version') != PLAN_VERSION:
+            raise ValueError(f"Versión de plan no soportada: {data.get('version')}")
+        return cls(data['sources'], data['strategy'], data.get('count'), data.get('seed', 0))
+
+    def save(self, path):
+        """Guarda el plan como JSON."""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path):
+        """Carga un plan guardado con save."""
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
@@ -0,0 +1,211 @@
+"""
+Ejecución de comandos externos largos sin bloquear la interfaz.
+
+El comando se lanza en su propio grupo de procesos para poder terminar
+también los hijos que cree (accelerate lanza otro intérprete de Python),
+su salida se lee a medida que llega y las barras de tqdm se traducen en
+progreso con velocidad y tiempo restante.
+"""
+import os
+import re
+import time
+import signal
+import logging
+import threading
+import subprocess
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Barra de tqdm: " 45%|████▌     | 45/100 [00:10<00:12,  4.50it/s]"
+TQDM_PROGRESS_RE = re.compile(r'\|\s*(\d+)/(\d+)\s*\[')
+
+# Segundos que se espera tras SIGTERM antes de forzar con SIGKILL
+TERMINATE_TIMEOUT = 5.0
+
+# Líneas finales de la salida que se incluyen en el error
+OUTPUT_TAIL_LINES = 20
+
+
+def parse_tqdm_progress(line):
+    """
+    Extrae el progreso de una línea de tqdm.
+
+    Args:
+        line: Línea de salida
+
+    Returns:
+        Tupla (hechos, total) o None si la línea no es una barra de tqdm
+    """
+    match = TQDM_PROGRESS_RE.search(line)
+    if not match:
+        return None
+    return int(match.group(1)), int(match.group(2))
+
+
+def format_eta(seconds):
+    """
+    Formatea un tiempo restante como H:MM:SS o M:SS.
+
+    Args:
+        seconds: Segundos
+
+    Returns:
+        Cadena formateada
+    """
+    minutes, seconds = divmod(int(seconds + 0.5), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes}:{seconds:02d}"
+
+
+def terminate_process_tree(process, timeout=TERMINATE_TIMEOUT):
+    """
+    Termina un proceso lanzado con start_process y todos sus descendientes.
+
+    En POSIX se envía la señal al grupo completo, así que también alcanza a
+    los descendientes que sigan vivos aunque el proceso principal ya haya
+    terminado.
+
+    Args:
+        process: subprocess.Popen
+        timeout: Segundos de espera antes de forzar la terminación
+    """
+    if os.name == 'nt':
+        if process.poll() is None:
+            subprocess.run(
+                ['taskkill', '/F', '/T', '/PID', str(process.pid)],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+        return
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout)
+        # Los descendientes que ignoren SIGTERM no deben sobrevivir al grupo
+        os.killpg(process.pid, signal.SIGKILL)
+    except subprocess.TimeoutExpired:
+        logger.warning(f"Process group {process.pid} ignored SIGTERM; killing it")
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def start_process(cmd):
+    """
+    Lanza un comando en un grupo de procesos nuevo con stdout y stderr unidos.
+
+    Args:
+        cmd: Lista con el comando y sus argumentos
+
+    Returns:
+        subprocess.Popen
+
+    Raises:
+        FileNotFoundError: Si el ejecutable no existe
+    """
+    options = {}
+    if os.name == 'nt':
+        options['creationflags'] = subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        options['start_new_session'] = True
+    return subprocess.Popen(
+        cmd,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        env=dict(os.environ, PYTHONUNBUFFERED='1'),
+        **options
+    )
+
+
+def run_with_progress(cmd, progress_callback=None, output_callback=None, cancel_event=None):
+    """
+    Ejecuta un comando leyendo su salida en streaming.
+
+    tqdm reescribe la barra con retornos de carro, así que la salida se
+    corta tanto por '\\r' como por '\\n'. La velocidad se mide desde la
+    primera barra vista, para no contar la carga del modelo.
+
+    Args:
+        cmd: Lista con el comando y sus argumentos
+        progress_callback: Función opcional (hechos, total, por segundo, segundos restantes o None)
+        output_callback: Función opcional que recibe cada línea que no es una barra de progreso
+        cancel_event: threading.Event que termina el árbol de procesos al activarse
+
+    Returns:
+        True si terminó, False si se canceló
+
+    Raises:
+        FileNotFoundError: Si el ejecutable no existe
+        subprocess.CalledProcessError: Si el comando termina con error; output lleva las últimas líneas
+    """
+    process = start_process(cmd)
+    finished = threading.Event()
+
+    def watch():
+        while not finished.wait(0.2):
+            if cancel_event is not None and cancel_event.is_set():
+                logger.info(f"Terminating process tree {process.pid}")
+                terminate_process_tree(process)
+                return
+            if process.poll() is not None:
+                # Un descendiente que sobreviva al comando mantendría abierta la tubería
+                if not finished.wait(TERMINATE_TIMEOUT):
+                    logger.warning(f"Terminating processes left behind by {process.pid}")
+                    terminate_process_tree(process, timeout=0)
+                return
+
+    threading.Thread(target=watch, daemon=True).start()
+
+    tail = deque(maxlen=OUTPUT_TAIL_LINES)
+    first_seen = None
+
+    def handle_line(line):
+        nonlocal first_seen
+        progress = parse_tqdm_progress(line)
+        if progress is None:
+            tail.append(line)
+            if output_callback:
+                output_callback(line)
+            return
+        if not progress_callback:
+            return
+        done, total = progress
+        now = time.monotonic()
+        if first_seen is None or done < first_seen[1]:
+            # Primera barra o una barra nueva que empieza de cero
+            first_seen = (now, done)
+        elapsed = now - first_seen[0]
+        rate = (done - first_seen[1]) / elapsed if elapsed > 0 else 0.0
+        eta = (total - done) / rate if rate > 0 else None
+        progress_callback(done, total, rate, eta)
+
+    pending = b''
+    try:
+        while True:
+            chunk = process.stdout.read1(65536)
+            if not chunk:
+                break
+            parts = re.split(rb'[\r\n]', pending + chunk)
+            pending = parts.pop()
+            for part in parts:
+                line = part.decode('utf-8', errors='replace').strip()
+                if line:
+                    handle_line(line)
+        line = pending.decode('utf-8', errors='replace').strip()
+        if line:
+            handle_line(line)
+        returncode = process.wait()
+    finally:
+        finished.set()
+        process.stdout.close()
+        if process.poll() is None:
+            terminate_process_tree(process)
+            process.wait()
+
+    if cancel_event is not None and cancel_event.is_set():
+        return False
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, cmd, output='\n'.join(tail))
+    return True
@@ -0,0 +1,204 @@
+"""
+Super-resolución en CPU con modelos ONNX procesando la imagen por tiles.
+"""
+import os
+import time
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from utils.image_operations import has_alpha
+
+logger = logging.getLogger(__name__)
+
+# Tamaño por defecto del tile (sin contar el solape)
+DEFAULT_TILE_SIZE = 192
+# Píxeles de contexto que se añaden a cada lado del tile
+DEFAULT_TILE_OVERLAP = 16
+# Lado del tile de prueba para descubrir el factor de escala
+_PROBE_SIZE = 32
+
+
+class SuperResolutionUpscaler:
+    """
+    Ejecuta un modelo ONNX de super-resolución (entrada NCHW RGB en [0, 1]).
+
+    Cada tile se infiere en un hilo propio con una sesión configurada a un
+    solo hilo intra-op, de forma que el paralelismo lo decide el pool de
+    tiles. Solo hay 2 x max_workers tiles en vuelo a la vez.
+    """
+
+    def __init__(self, model_path=None, tile_size=DEFAULT_TILE_SIZE, overlap=DEFAULT_TILE_OVERLAP,
+                 max_workers=None, session=None):
+        """
+        Args:
+            model_path: Ruta del modelo .onnx (ignorada si se pasa session)
+            tile_size: Lado del tile sin solape
+            overlap: Contexto a cada lado del tile
+            max_workers: Hilos de inferencia (default: núcleos disponibles)
+            session: Sesión ya creada con la interfaz de onnxruntime.InferenceSession
+        """
+        if session is None:
+            session = self._create_session(model_path)
+        self.session = session
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.overlap = overlap
+
+        model_input = session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.input_dtype = np.float16 if model_input.type == 'tensor(float16)' else np.float32
+
+        # Modelos exportados con alto/ancho fijos imponen el tamaño del tile
+        static_height, static_width = model_input.shape[2], model_input.shape[3]
+        if isinstance(static_height, int) and isinstance(static_width, int):
+            self.window_shape = (static_height, static_width)
+            self.tile_size = min(static_height, static_width) - 2 * overlap
+            if self.tile_size <= 0:
+                raise ValueError(f"El solape {overlap} no cabe en la entrada fija del modelo")
+        else:
+            self.window_shape = None
+            self.tile_size = tile_size
+
+        self.scale = self._detect_scale()
+        self.tiles_processed = 0
+        self.inference_seconds = 0.0
+        self._stats_lock = threading.Lock()
+        logger.info(
+            f"Super-resolution model loaded: x{self.scale}, tile {self.tile_size}px, "
+            f"overlap {self.overlap}px, {self.max_workers} workers"
+        )
+
+    @staticmethod
+    def _create_session(model_path):
+        """Crea una sesión de onnxruntime en CPU de un solo hilo intra-op."""
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError(
+                "onnxruntime is required for super-resolution. Install it with: pip install onnxruntime"
+            ) from e
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = 1
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        return ort.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+
+    def _detect_scale(self):
+        """Descubre el factor de escala ejecutando el modelo sobre un tile de prueba."""
+        height, width = self.window_shape or (_PROBE_SIZE, _PROBE_SIZE)
+        probe = np.zeros((1, 3, height, width), dtype=self.input_dtype)
+        output = self.session.run(None, {self.input_name: probe})[0]
+        scale = output.shape[2] // height
+        if scale < 1 or output.shape[3] != width * scale:
+            raise ValueError(f"Salida del modelo inesperada: {output.shape}")
+        return scale
+
+    @property
+    def tiles_per_second(self):
+        """Tiles inferidos por segundo de pared, acumulado desde la creación."""
+        if not self.inference_seconds:
+            return 0.0
+        return self.tiles_processed / self.inference_seconds
+
+    def _run_tile(self, pixels, box, output):
+        """
+        Infiere un tile con su contexto y escribe su parte central en la salida.
+
+        Args:
+            pixels: Array HxWx3 uint8 de la imagen de entrada
+            box: Tupla (left, top, right, bottom) del tile sin solape
+            output: Array (H*s)x(W*s)x3 uint8 de salida
+        """
+        left, top, right, bottom = box
+        height, width = pixels.shape[:2]
+        window_left = max(left - self.overlap, 0)
+        window_top = max(top - self.overlap, 0)
+        window_right = min(right + self.overlap, width)
+        window_bottom = min(bottom + self.overlap, height)
+
+        window = pixels[window_top:window_bottom, window_left:window_right]
+        if self.window_shape:
+            pad_height = self.window_shape[0] - window.shape[0]
+            pad_width = self.window_shape[1] - window.shape[1]
+            window = np.pad(window, ((0, pad_height), (0, pad_width), (0, 0)), mode='edge')
+
+        tile_input = window.transpose(2, 0, 1)[None].astype(self.input_dtype) / 255
+        result = self.session.run(None, {self.input_name: tile_input})[0][0]
+
+        scale = self.scale
+        crop_top = (top - window_top) * scale
+        crop_left = (left - window_left) * scale
+        core = result[
+            :,
+            crop_top:crop_top + (bottom - top) * scale,
+            crop_left:crop_left + (right - left) * scale
+        ]
+        core = np.clip(core.transpose(1, 2, 0) * 255 + 0.5, 0, 255).astype(np.uint8)
+        output[top * scale:bottom * scale, left * scale:right * scale] = core
+
+    def upscale(self, img):
+        """
+        Aumenta la resolución de una imagen por el factor del modelo.
+
+        El canal alfa, si existe, se escala con LANCZOS.
+
+        Args:
+            img: Imagen PIL
+
+        Returns:
+            Imagen PIL (RGB o RGBA) de tamaño (ancho * escala, alto * escala)
+        """
+        alpha = img.getchannel('A') if 'A' in img.getbands() else None
+        if alpha is None and has_alpha(img):
+            alpha = img.convert('RGBA').getchannel('A')
+        pixels = np.asarray(img.convert('RGB'))
+        height, width = pixels.shape[:2]
+        scale = self.scale
+        output = np.empty((height * scale, width * scale, 3), dtype=np.uint8)
+
+        boxes = [
+            (left, top, min(left + self.tile_size, width), min(top + self.tile_size, height))
+            for top in range(0, height, self.tile_size)
+            for left in range(0, width, self.tile_size)
+        ]
+
+        in_flight = threading.Semaphore(2 * self.max_workers)
+        errors = []
+
+        def run(box):
+            try:
+                self._run_tile(pixels, box, output)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                in_flight.release()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for box in boxes:
+                in_flight.acquire()
+                if errors:
+                    in_flight.release()
+                    break
+                executor.submit(run, box)
+        elapsed = time.perf_counter() - start
+
+        if errors:
+            raise errors[0]
+
+        with self._stats_lock:
+            self.tiles_processed += len(boxes)
+            self.inference_seconds += elapsed
+        logger.debug(
+            f"Upscaled {width}x{height} -> {width * scale}x{height * scale} in {len(boxes)} tiles "
+            f"({len(boxes) / elapsed if elapsed else 0:.1f} tiles/s)"
+        )
+
+        upscaled = Image.fromarray(output)
+        if alpha is not None:
+            upscaled.putalpha(alpha.resize(upscaled.size, Image.LANCZOS))
+        return upscaled
@@ -0,0 +1,257 @@
+"""
+Probabilidades de tags guardadas junto al dataset y re-umbralizado de captions.
+
+El tagger escribe una fila float16 por imagen en un archivo binario
+(.tag_probs.f16) que se abre mapeado en memoria; un índice JSON guarda el
+modelo, los nombres y categorías de los tags y la fila de cada imagen.
+Con eso se pueden regenerar todos los captions con otros umbrales sin
+volver a ejecutar el modelo.
+"""
+import os
+import json
+import logging
+
+import numpy as np
+
+from utils.captions import write_caption
+from utils.job_journal import atomic_write
+
+logger = logging.getLogger(__name__)
+
+PROBABILITIES_FILE = '.tag_probs.f16'
+PROBABILITIES_INDEX_FILE = '.tag_probs.json'
+PROBABILITIES_VERSION = 1
+
+# Categorías de selected_tags.csv
+TAG_CATEGORY_GENERAL = 0
+TAG_CATEGORY_CHARACTER = 4
+TAG_CATEGORY_RATING = 9
+
+# Filas procesadas a la vez al re-umbralizar
+RETHRESHOLD_CHUNK_ROWS = 4096
+
+
+def select_tag_mask(probabilities, categories, general_threshold, character_threshold, top_k=None):
+    """
+    Decide qué tags lleva cada imagen.
+
+    Los tags generales y de personaje se eligen por umbral; con top_k, de
+    los generales solo se conservan los top_k más probables. Los tags de
+    rating nunca se eligen.
+
+    Args:
+        probabilities: Array (N, tags)
+        categories: Array (tags,) con la categoría de cada tag
+        general_threshold: Umbral de los tags generales
+        character_threshold: Umbral de los tags de personaje
+        top_k: Máximo de tags generales por imagen (None o 0 sin límite)
+
+    Returns:
+        Array bool (N, tags)
+    """
+    probabilities = np.asarray(probabilities, dtype=np.float32)
+    general = categories == TAG_CATEGORY_GENERAL
+    thresholds = np.full(len(categories), np.inf, dtype=np.float32)
+    thresholds[general] = general_threshold
+    thresholds[categories == TAG_CATEGORY_CHARACTER] = character_threshold
+    mask = probabilities >= thresholds
+
+    general_count = int(general.sum())
+    if top_k and top_k < general_count:
+        # argpartition elige exactamente top_k aunque haya empates (frecuentes en float16)
+        scores = np.where(mask & general, probabilities, -np.inf)
+        best = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+        keep = np.zeros_like(mask)
+        np.put_along_axis(keep, best, True, axis=1)
+        mask &= ~general | keep
+    return mask
+
+
+class ProbabilityStore:
+    """
+    Matriz de probabilidades float16 de una carpeta, ampliable por filas.
+
+    Al volver a etiquetar una imagen se añade una fila nueva y el índice
+    apunta a ella; las filas huérfanas se eliminan al guardar cuando ocupan
+    más de la mitad del archivo. Si el proceso muere antes de guardar el
+    índice, las filas añadidas desde el último guardado se ignoran.
+    """
+
+    def __init__(self, directory):
+        """
+        Args:
+            directory: Carpeta del dataset (las rutas se guardan relativas a ella)
+        """
+        self.directory = directory
+        self.data_path = os.path.join(directory, PROBABILITIES_FILE)
+        self.index_path = os.path.join(directory, PROBABILITIES_INDEX_FILE)
+        self.model = None
+        self.tag_names = []
+        self.tag_categories = np.zeros(0, dtype=np.int32)
+        self.rows = {}
+        self.row_count = 0
+        self._file = None
+        self._load_index()
+
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            if index.get('version') != PROBABILITIES_VERSION:
+                raise ValueError(f"unsupported version {index.get('version')}")
+            row_bytes = len(index['tags']) * 2
+            if os.path.getsize(self.data_path) < index['row_count'] * row_bytes:
+                raise ValueError("data file is shorter than the index")
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring tag probabilities in {self.directory}: {e}")
+            return
+        self.model = index['model']
+        self.tag_names = index['tags']
+        self.tag_categories = np.array(index['categories'], dtype=np.int32)
+        self.rows = index['rows']
+        self.row_count = index['row_count']
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return len(self.rows)
+
+    def append(self, paths, probabilities, model, tag_names, tag_categories):
+        """
+        Añade las probabilidades de varias imágenes.
+
+        Si el modelo o la lista de tags cambian, las filas anteriores se descartan.
+
+        Args:
+            paths: Rutas de las imágenes
+            probabilities: Array (N, tags)
+            model: Clave del modelo
+            tag_names: Nombres de los tags del modelo
+            tag_categories: Categorías de los tags del modelo
+        """
+        if model != self.model or list(tag_names) != self.tag_names:
+            if self.rows:
+                logger.info(f"Tagger model changed; discarding stored probabilities in {self.directory}")
+            # El índice viejo no debe apuntar a filas que se van a sobrescribir
+            if os.path.exists(self.index_path):
+                os.remove(self.index_path)
+            self.model = model
+            self.tag_names = list(tag_names)
+            self.tag_categories = np.asarray(tag_categories, dtype=np.int32)
+            self.rows = {}
+            self.row_count = 0
+
+        if self._file is None:
+            self._file = open(self.data_path, 'r+b' if os.path.exists(self.data_path) else 'w+b')
+        self._file.seek(self.row_count * len(self.tag_names) * 2)
+        self._file.write(np.ascontiguousarray(probabilities, dtype=np.float16).tobytes())
+        for path in paths:
+            self.rows[os.path.relpath(path, self.directory)] = self.row_count
+            self.row_count += 1
+
+    def matrix(self):
+        """
+        Devuelve la matriz de probabilidades mapeada en memoria (solo lectura).
+
+        Returns:
+            Array float16 (filas, tags)
+        """
+        if self._file is not None:
+            self._file.flush()
+        if not self.row_count:
+            return np.zeros((0, len(self.tag_names)), dtype=np.float16)
+        return np.memmap(
+            self.data_path, dtype=np.float16, mode='r', shape=(self.row_count, len(self.tag_names))
+        )
+
+    def save(self):
+        """Guarda el índice, compactando antes las filas huérfanas si abundan."""
+        if self._file is not None:
+            self._file.truncate(self.row_count * len(self.tag_names) * 2)
+            self._file.close()
+            self._file = None
+        if self.model is None:
+            return
+        if self.row_count > 2 * len(self.rows):
+            self._compact()
+        index = {
+            'version': PROBABILITIES_VERSION,
+            'model': self.model,
+            'tags': self.tag_names,
+            'categories': self.tag_categories.tolist(),
+            'row_count': self.row_count,
+            'rows': self.rows,
+        }
+        atomic_write(self.index_path, lambda f: f.write(json.dumps(index).encode('utf-8')))
+
+    def _compact(self):
+        """Reescribe la matriz con solo las filas a las que apunta el índice."""
+        items = sorted(self.rows.items(), key=lambda item: item[1])
+        matrix = self.matrix()
+        kept = matrix[[row for _, row in items]] if items else matrix[:0]
+        del matrix
+        atomic_write(self.data_path, lambda f: f.write(np.ascontiguousarray(kept).tobytes()))
+        self.rows = {path: row for row, (path, _) in enumerate(items)}
+        logger.info(f"Compacted tag probabilities from {self.row_count} to {len(items)} rows")
+        self.row_count = len(items)
+
+    def close(self):
+        """Guarda el índice y cierra el archivo de datos."""
+        self.save()
+
+
+def rethreshold_captions(directory, general_threshold, character_threshold, top_k=None,
+                         caption_extension='.txt', caption_separator=', ', progress_callback=None):
+    """
+    Regenera los captions de una carpeta a partir de las probabilidades guardadas.
+
+    Args:
+        directory: Carpeta del dataset
+        general_threshold: Umbral de los tags generales
+        character_threshold: Umbral de los tags de personaje
+        top_k: Máximo de tags generales por imagen (None o 0 sin límite)
+        caption_extension: Extensión de los captions
+        caption_separator: Separador entre tags
+        progress_callback: Función opcional (hechas, total)
+
+    Returns:
+        Diccionario con 'written' (captions escritos) y 'missing' (imágenes que ya no existen)
+
+    Raises:
+        ValueError: Si la carpeta no tiene probabilidades guardadas
+    """
+    store = ProbabilityStore(directory)
+    if not store.rows:
+        raise ValueError(f"No stored tag probabilities in {directory}. Tag the folder with the ONNX backend first.")
+
+    items = sorted(store.rows.items(), key=lambda item: item[1])
+    matrix = store.matrix()
+    names = np.array(store.tag_names, dtype=object)
+    summary = {'written': 0, 'missing': 0}
+    for start in range(0, len(items), RETHRESHOLD_CHUNK_ROWS):
+        chunk = items[start:start + RETHRESHOLD_CHUNK_ROWS]
+        mask = select_tag_mask(
+            matrix[[row for _, row in chunk]], store.tag_categories,
+            general_threshold, character_threshold, top_k
+        )
+        for (relative_path, _), selected in zip(chunk, mask):
+            path = os.path.join(directory, relative_path)
+            if not os.path.exists(path):
+                summary['missing'] += 1
+                continue
+            write_caption(path, names[selected].tolist(), caption_extension, caption_separator)
+            summary['written'] += 1
+        if progress_callback:
+            progress_callback(start + len(chunk), len(items))
+
+    logger.info(
+        f"Re-thresholded {summary['written']} captions in {directory} "
+        f"(general {general_threshold}, character {character_threshold}, top-k {top_k or 'off'})"
+    )
+    return summary
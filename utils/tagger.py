@@ -0,0 +1,666 @@
+"""
+Etiquetado de imágenes con modelos ONNX de tipo WD14 en un proceso persistente.
+
+El modelo se carga una sola vez en un proceso hijo que atiende peticiones
+mientras la aplicación siga abierta. Cada petición se procesa por lotes:
+un pool de hilos decodifica y preprocesa las imágenes del lote siguiente
+mientras el modelo infiere el actual.
+"""
+import os
+import csv
+import queue
+import sqlite3
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from utils.captions import write_caption
+from utils.dedupe import file_digest
+from utils.image_operations import flatten_alpha, has_alpha
+from utils.tag_probabilities import ProbabilityStore, select_tag_mask
+
+logger = logging.getLogger(__name__)
+
+# Modelo por defecto (Hugging Face) y archivos que lo componen
+DEFAULT_TAGGER_REPO = "SmilingWolf/wd-eva02-large-tagger-v3"
+TAGGER_MODEL_FILE = "model.onnx"
+TAGGER_TAGS_FILE = "selected_tags.csv"
+
+# Umbrales por defecto (los mismos que sd-scripts)
+DEFAULT_GENERAL_THRESHOLD = 0.35
+DEFAULT_CHARACTER_THRESHOLD = 0.35
+
+DEFAULT_BATCH_SIZE = 8
+DEFAULT_LOADER_WORKERS = 4
+
+# Extensiones que se etiquetan
+TAGGER_IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp', '.bmp')
+
+# Caché de tags por contenido dentro de la carpeta etiquetada
+TAG_CACHE_FILE = '.tag_cache.sqlite'
+
+
+def resolve_tagger_model(model, force_download=False):
+    """
+    Localiza el modelo y la lista de tags.
+
+    Args:
+        model: Carpeta local con model.onnx y selected_tags.csv, o repo_id de
+            Hugging Face (requiere huggingface_hub)
+        force_download: Si True, vuelve a descargar los archivos del repo
+
+    Returns:
+        Tupla (ruta del modelo, ruta del CSV de tags)
+    """
+    if os.path.isdir(model):
+        model_path = os.path.join(model, TAGGER_MODEL_FILE)
+        tags_path = os.path.join(model, TAGGER_TAGS_FILE)
+        for path in (model_path, tags_path):
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"Tagger file not found: {path}")
+        return model_path, tags_path
+
+    try:
+        from huggingface_hub import hf_hub_download
+    except ImportError as e:
+        raise ImportError(
+            "huggingface_hub is required to download tagger models. "
+            "Install it with: pip install huggingface_hub, or select a local model folder"
+        ) from e
+    return tuple(
+        hf_hub_download(model, name, force_download=force_download)
+        for name in (TAGGER_MODEL_FILE, TAGGER_TAGS_FILE)
+    )
+
+
+def load_tag_names(tags_path):
+    """
+    Lee selected_tags.csv.
+
+    Args:
+        tags_path: Ruta del CSV (columnas tag_id, name, category, count)
+
+    Returns:
+        Tupla (lista de nombres, array int de categorías)
+    """
+    with open(tags_path, 'r', encoding='utf-8', newline='') as f:
+        rows = list(csv.DictReader(f))
+    names = [row['name'] for row in rows]
+    categories = np.array([int(row['category']) for row in rows], dtype=np.int32)
+    return names, categories
+
+
+def list_images_to_tag(folder, recursive=False, caption_extension='.txt', skip_captioned=True):
+    """
+    Lista las imágenes de una carpeta que necesitan caption.
+
+    Cada directorio se recorre una vez con os.scandir; solo se consulta la
+    fecha de modificación de las imágenes que ya tienen caption y de sus
+    captions, de modo que una carpeta sin cambios no se lee entera.
+
+    Args:
+        folder: Carpeta de imágenes
+        recursive: Si True, incluye subcarpetas
+        caption_extension: Extensión de los captions
+        skip_captioned: Si True, omite las imágenes cuyo caption existe y es
+            posterior a la imagen
+
+    Returns:
+        Tupla (lista ordenada de rutas a etiquetar, número de imágenes omitidas)
+    """
+    images = []
+    skipped = 0
+    pending = [folder]
+    while pending:
+        directory = pending.pop()
+        image_entries = []
+        captions = {}
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if recursive:
+                        pending.append(entry.path)
+                    continue
+                ext = os.path.splitext(entry.name)[1].lower()
+                if ext in TAGGER_IMAGE_EXTENSIONS:
+                    image_entries.append(entry)
+                elif skip_captioned and entry.name.endswith(caption_extension):
+                    captions[entry.name] = entry
+
+        for entry in image_entries:
+            caption = captions.get(os.path.splitext(entry.name)[0] + caption_extension)
+            if caption is not None and caption.stat().st_mtime_ns >= entry.stat().st_mtime_ns:
+                skipped += 1
+            else:
+                images.append(entry.path)
+    images.sort()
+    return images, skipped
+
+
+def list_tagger_images(folder, recursive=False):
+    """
+    Lista todas las imágenes a etiquetar de una carpeta.
+
+    Args:
+        folder: Carpeta de imágenes
+        recursive: Si True, incluye subcarpetas
+
+    Returns:
+        Lista ordenada de rutas
+    """
+    return list_images_to_tag(folder, recursive, skip_captioned=False)[0]
+
+
+class TagCache:
+    """
+    Caché persistente de las salidas del modelo por contenido de imagen.
+
+    Cada fila guarda el vector de probabilidades en float16 de un digest
+    BLAKE2b del archivo y un modelo, así que una imagen copiada, renombrada
+    o con la fecha cambiada no vuelve a pasar por el modelo. Los tags se
+    eligen a partir de las probabilidades con la selección actual, de modo
+    que cambiar los umbrales o el top-k tampoco invalida la caché.
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path: Ruta del archivo SQLite
+        """
+        self.path = path
+        self._connection = sqlite3.connect(path)
+        columns = [row[1] for row in self._connection.execute("PRAGMA table_info(tags)")]
+        if columns and columns != ['digest', 'model', 'probabilities']:
+            # Caché de una versión que guardaba tags por umbrales: se descarta
+            self._connection.execute("DROP TABLE tags")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS tags ("
+            " digest BLOB NOT NULL, model TEXT NOT NULL, probabilities BLOB NOT NULL,"
+            " PRIMARY KEY (digest, model))"
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Confirma los cambios y cierra la base de datos."""
+        if self._connection is not None:
+            self._connection.commit()
+            self._connection.close()
+            self._connection = None
+
+    def lookup(self, digests, model):
+        """
+        Busca las probabilidades guardadas de varios digests.
+
+        Args:
+            digests: Digests de los archivos
+            model: Clave del modelo (TaggerModel.cache_key)
+
+        Returns:
+            Diccionario digest -> array float16 de probabilidades
+        """
+        digests = list(digests)
+        found = {}
+        # SQLite limita el número de parámetros por consulta
+        for start in range(0, len(digests), 500):
+            chunk = digests[start:start + 500]
+            rows = self._connection.execute(
+                "SELECT digest, probabilities FROM tags WHERE model = ?"
+                " AND digest IN (" + ",".join("?" * len(chunk)) + ")",
+                (model, *chunk)
+            )
+            for digest, probabilities in rows:
+                found[digest] = np.frombuffer(probabilities, dtype=np.float16)
+        return found
+
+    def store(self, model, entries):
+        """
+        Guarda las probabilidades de varios digests.
+
+        Args:
+            model: Clave del modelo
+            entries: Iterable de tuplas (digest, probabilidades)
+        """
+        self._connection.executemany(
+            "INSERT OR REPLACE INTO tags VALUES (?, ?, ?)",
+            [
+                (digest, model, np.ascontiguousarray(probabilities, dtype=np.float16).tobytes())
+                for digest, probabilities in entries
+            ]
+        )
+        self._connection.commit()
+
+
+def _safe_digest(path):
+    try:
+        return file_digest(path)
+    except OSError as e:
+        logger.warning(f"Error reading {path}: {e}")
+        return None
+
+
+def preprocess_image(path, size):
+    """
+    Prepara una imagen para el tagger.
+
+    La imagen se aplana sobre blanco, se rellena de blanco hasta ser
+    cuadrada y se escala a size x size; el resultado es BGR en float32
+    [0, 255], que es lo que esperan los modelos WD14.
+
+    Args:
+        path: Ruta de la imagen
+        size: Lado de la entrada del modelo
+
+    Returns:
+        Array float32 (size, size, 3)
+    """
+    with Image.open(path) as img:
+        img.draft('RGB', (size, size))
+        img = flatten_alpha(img) if has_alpha(img) else img.convert('RGB')
+    side = max(img.size)
+    if img.width != img.height:
+        square = Image.new('RGB', (side, side), (255, 255, 255))
+        square.paste(img, ((side - img.width) // 2, (side - img.height) // 2))
+        img = square
+    if side != size:
+        img = img.resize((size, size), Image.BICUBIC)
+    return np.asarray(img, dtype=np.float32)[:, :, ::-1]
+
+
+class TaggerModel:
+    """
+    Modelo de tagging ONNX con entrada NHWC y salida de probabilidades por tag.
+    """
+
+    def __init__(self, model_path, tags_path, session=None):
+        """
+        Args:
+            model_path: Ruta del modelo .onnx (ignorada si se pasa session)
+            tags_path: Ruta de selected_tags.csv
+            session: Sesión ya creada con la interfaz de onnxruntime.InferenceSession
+        """
+        if session is None:
+            session = self._create_session(model_path)
+        self.session = session
+        self.tag_names, self.tag_categories = load_tag_names(tags_path)
+        # Identifica el modelo en la caché de tags
+        self.cache_key = (
+            f"{os.path.abspath(model_path)}:{os.path.getsize(model_path)}" if model_path else "session"
+        )
+
+        model_input = session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.input_size = model_input.shape[1]
+        if not isinstance(self.input_size, int):
+            raise ValueError(f"Tagger input must have a fixed size, got {model_input.shape}")
+
+        output_size = session.get_outputs()[0].shape[-1]
+        if isinstance(output_size, int) and output_size != len(self.tag_names):
+            raise ValueError(
+                f"Model outputs {output_size} tags but {tags_path} lists {len(self.tag_names)}"
+            )
+        logger.info(f"Tagger model loaded: {len(self.tag_names)} tags, input {self.input_size}px")
+
+    @staticmethod
+    def _create_session(model_path):
+        """Crea una sesión de onnxruntime en CPU."""
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError(
+                "onnxruntime is required for the ONNX tagger. Install it with: pip install onnxruntime"
+            ) from e
+        return ort.InferenceSession(model_path, providers=['CPUExecutionProvider'])
+
+    def predict(self, batch):
+        """
+        Infiere un lote.
+
+        Args:
+            batch: Array float32 (N, size, size, 3)
+
+        Returns:
+            Array float32 (N, tags) de probabilidades
+        """
+        return self.session.run(None, {self.input_name: batch})[0]
+
+    def select_tags(self, probabilities, general_threshold=DEFAULT_GENERAL_THRESHOLD,
+                    character_threshold=DEFAULT_CHARACTER_THRESHOLD, top_k=None):
+        """
+        Elige los tags de cada imagen de un lote según los umbrales.
+
+        Los tags de rating no se incluyen.
+
+        Args:
+            probabilities: Array (N, tags)
+            general_threshold: Umbral de los tags generales
+            character_threshold: Umbral de los tags de personaje
+            top_k: Máximo de tags generales por imagen (None o 0 sin límite)
+
+        Returns:
+            Lista de listas de tags, en el orden del modelo
+        """
+        mask = select_tag_mask(
+            probabilities, self.tag_categories, general_threshold, character_threshold, top_k
+        )
+        return [[self.tag_names[i] for i in np.flatnonzero(row)] for row in mask]
+
+
+def tag_images(model, paths, caption_extension='.txt', caption_separator=', ',
+               general_threshold=DEFAULT_GENERAL_THRESHOLD,
+               character_threshold=DEFAULT_CHARACTER_THRESHOLD, top_k=None,
+               batch_size=DEFAULT_BATCH_SIZE, num_workers=DEFAULT_LOADER_WORKERS,
+               tag_cache=None, probability_dir=None, progress_callback=None, cancel_event=None):
+    """
+    Etiqueta imágenes y escribe un caption junto a cada una.
+
+    El pool de hilos va preprocesando el lote siguiente mientras se infiere
+    el actual; como mucho hay dos lotes decodificados en memoria. Con
+    tag_cache, las imágenes cuyo contenido ya pasó por el mismo modelo
+    reciben los tags elegidos con los umbrales actuales sobre las
+    probabilidades guardadas, sin pasar por el modelo.
+    Con probability_dir, las probabilidades de cada imagen (inferidas o
+    tomadas de la caché) se guardan en un ProbabilityStore para
+    re-umbralizar más tarde.
+
+    Args:
+        model: TaggerModel
+        paths: Rutas de las imágenes
+        caption_extension: Extensión de los captions (p. ej. '.txt')
+        caption_separator: Separador entre tags
+        general_threshold: Umbral de los tags generales
+        character_threshold: Umbral de los tags de personaje
+        top_k: Máximo de tags generales por imagen (None o 0 sin límite)
+        batch_size: Imágenes por inferencia
+        num_workers: Hilos de decodificación y preprocesado
+        tag_cache: Ruta opcional de la caché de tags (TagCache)
+        probability_dir: Carpeta opcional donde guardar las probabilidades
+        progress_callback: Función opcional (hechas, total)
+        cancel_event: Evento opcional; se comprueba entre lotes
+
+    Returns:
+        Diccionario con 'tagged', 'cached' (tags tomados de la caché),
+        'failed' (lista de rutas) y 'cancelled'
+    """
+    batch_size = max(1, batch_size)
+    total = len(paths)
+    summary = {'tagged': 0, 'cached': 0, 'failed': [], 'cancelled': False}
+    selection = (general_threshold, character_threshold, top_k or 0)
+    cache = TagCache(tag_cache) if tag_cache else None
+    store = ProbabilityStore(probability_dir) if probability_dir else None
+    digests = {}
+
+    def load(batch_paths):
+        futures = [executor.submit(preprocess_image, path, model.input_size) for path in batch_paths]
+        return batch_paths, futures
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, num_workers)) as executor:
+            if cache is not None:
+                digests = dict(zip(paths, executor.map(_safe_digest, paths)))
+                hits = cache.lookup(
+                    {digest for digest in digests.values() if digest is not None}, model.cache_key
+                )
+                cached_paths = [path for path in paths if digests[path] in hits]
+                if cached_paths:
+                    cached_probabilities = np.stack([hits[digests[path]] for path in cached_paths])
+                    tag_lists = model.select_tags(cached_probabilities, *selection)
+                    for path, tags in zip(cached_paths, tag_lists):
+                        write_caption(path, tags, caption_extension, caption_separator)
+                    if store is not None:
+                        store.append(
+                            cached_paths, cached_probabilities,
+                            model.cache_key, model.tag_names, model.tag_categories
+                        )
+                summary['cached'] = len(cached_paths)
+                paths = [path for path in paths if digests[path] not in hits]
+                logger.info(f"{summary['cached']} images tagged from the tag cache")
+
+            done = summary['cached']
+            if progress_callback:
+                progress_callback(done, total)
+            batches = [paths[i:i + batch_size] for i in range(0, len(paths), batch_size)]
+            pending = load(batches[0]) if batches else None
+            for i in range(len(batches)):
+                batch_paths, futures = pending
+                pending = load(batches[i + 1]) if i + 1 < len(batches) else None
+
+                pixels, loaded = [], []
+                for path, future in zip(batch_paths, futures):
+                    try:
+                        pixels.append(future.result())
+                        loaded.append(path)
+                    except Exception as e:
+                        logger.warning(f"Error loading {path}: {e}")
+                        summary['failed'].append(path)
+
+                if loaded:
+                    # Se eligen los tags sobre las probabilidades ya redondeadas a float16
+                    # para que re-umbralizar con los mismos ajustes dé los mismos captions
+                    probabilities = model.predict(np.stack(pixels)).astype(np.float16)
+                    tag_lists = model.select_tags(probabilities, *selection)
+                    for path, tags in zip(loaded, tag_lists):
+                        write_caption(path, tags, caption_extension, caption_separator)
+                    if store is not None:
+                        store.append(
+                            loaded, probabilities, model.cache_key, model.tag_names, model.tag_categories
+                        )
+                    if cache is not None:
+                        cache.store(model.cache_key, [
+                            (digests[path], row)
+                            for path, row in zip(loaded, probabilities)
+                            if digests[path] is not None
+                        ])
+                    summary['tagged'] += len(loaded)
+
+                done += len(batch_paths)
+                if progress_callback:
+                    progress_callback(done, total)
+                if cancel_event is not None and cancel_event.is_set():
+                    if pending is not None:
+                        for future in pending[1]:
+                            future.cancel()
+                    summary['cancelled'] = True
+                    logger.info(f"Tagging cancelled after {done} of {total} images")
+                    break
+    finally:
+        if cache is not None:
+            cache.close()
+        if store is not None:
+            store.close()
+    return summary
+
+
+def _service_main(model_path, tags_path, requests, responses, cancel_event):
+    """
+    Bucle del proceso del servicio: carga el modelo y atiende peticiones.
+
+    Mensajes recibidos: ('tag', paths, options) o None para terminar.
+    Mensajes enviados: ('ready', tags), ('progress', done, total),
+    ('done', summary) y ('error', mensaje).
+    """
+    try:
+        model = TaggerModel(model_path, tags_path)
+    except Exception as e:
+        responses.put(('error', f"Error loading tagger model: {e}"))
+        return
+    responses.put(('ready', len(model.tag_names)))
+
+    while True:
+        request = requests.get()
+        if request is None:
+            return
+        _, paths, options = request
+        try:
+            summary = tag_images(
+                model,
+                paths,
+                progress_callback=lambda done, total: responses.put(('progress', done, total)),
+                cancel_event=cancel_event,
+                **options
+            )
+            responses.put(('done', summary))
+        except Exception as e:
+            responses.put(('error', str(e)))
+
+
+class TaggerService:
+    """
+    Proceso persistente que mantiene un TaggerModel cargado.
+
+    La carga del modelo (segundos o minutos con modelos grandes) se paga una
+    vez por sesión de la aplicación en lugar de una vez por ejecución, y la
+    inferencia no compite por el GIL con la interfaz. Las peticiones se
+    atienden de una en una.
+    """
+
+    def __init__(self, model_path, tags_path):
+        """
+        Args:
+            model_path: Ruta del modelo .onnx
+            tags_path: Ruta de selected_tags.csv
+        """
+        self.model_path = model_path
+        self.tags_path = tags_path
+        self._context = multiprocessing.get_context('spawn')
+        self._process = None
+        self._requests = None
+        self._responses = None
+        self._cancel_event = self._context.Event()
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def running(self):
+        """True si el proceso del servicio está vivo."""
+        return self._process is not None and self._process.is_alive()
+
+    def start(self):
+        """
+        Arranca el proceso y espera a que el modelo esté cargado.
+
+        Raises:
+            RuntimeError: Si el modelo no se puede cargar
+        """
+        if self.running:
+            return
+        self._requests = self._context.Queue()
+        self._responses = self._context.Queue()
+        self._process = self._context.Process(
+            target=_service_main,
+            args=(self.model_path, self.tags_path, self._requests, self._responses, self._cancel_event),
+            daemon=True
+        )
+        self._process.start()
+        message = self._receive()
+        if message[0] != 'ready':
+            self.close()
+            raise RuntimeError(message[1])
+        logger.info(f"Tagger service started (pid {self._process.pid}, {message[1]} tags)")
+
+    def _receive(self, cancel_event=None):
+        """Espera el siguiente mensaje del proceso, vigilando que siga vivo."""
+        while True:
+            if cancel_event is not None and cancel_event.is_set():
+                self._cancel_event.set()
+            try:
+                return self._responses.get(timeout=0.1)
+            except queue.Empty:
+                if not self._process.is_alive():
+                    raise RuntimeError(
+                        f"Tagger service exited unexpectedly (exit code {self._process.exitcode})"
+                    )
+
+    def tag(self, paths, progress_callback=None, cancel_event=None, **options):
+        """
+        Etiqueta imágenes en el proceso del servicio.
+
+        Args:
+            paths: Rutas de las imágenes
+            progress_callback: Función opcional (hechas, total)
+            cancel_event: threading.Event opcional
+            **options: Opciones de tag_images (caption_extension,
+                caption_separator, umbrales, batch_size, num_workers)
+
+        Returns:
+            Resumen devuelto por tag_images
+        """
+        with self._lock:
+            self.start()
+            self._cancel_event.clear()
+            self._requests.put(('tag', list(paths), options))
+            while True:
+                message = self._receive(cancel_event)
+                if message[0] == 'progress':
+                    if progress_callback:
+                        progress_callback(message[1], message[2])
+                elif message[0] == 'done':
+                    return message[1]
+                else:
+                    raise RuntimeError(message[1])
+
+    def close(self):
+        """Detiene el proceso del servicio."""
+        if self._process is None:
+            return
+        if self._process.is_alive():
+            self._requests.put(None)
+            self._process.join(timeout=5)
+            if self._process.is_alive():
+                self._process.terminate()
+                self._process.join()
+        self._process = None
+        logger.info("Tagger service stopped")
+
+
+_shared_service = None
+_shared_service_lock = threading.Lock()
+
+
+def get_tagger_service(model_path, tags_path):
+    """
+    Devuelve el servicio compartido de la aplicación para un modelo.
+
+    Si el servicio activo usa otro modelo, se detiene y se crea uno nuevo;
+    el proceso se arranca en la primera petición.
+
+    Args:
+        model_path: Ruta del modelo .onnx
+        tags_path: Ruta de selected_tags.csv
+
+    Returns:
+        TaggerService
+    """
+    global _shared_service
+    with _shared_service_lock:
+        if _shared_service is not None and (
+            _shared_service.model_path, _shared_service.tags_path
+        ) != (model_path, tags_path):
+            _shared_service.close()
+            _shared_service = None
+        if _shared_service is None:
+            _shared_service = TaggerService(model_path, tags_path)
+        return _shared_service
+
+
+def shutdown_tagger_service():
+    """Detiene el servicio compartido, si existe."""
+    global _shared_service
+    with _shared_service_lock:
+        if _shared_service is not None:
+            _shared_service.close()
+            _shared_service = None